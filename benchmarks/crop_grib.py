@@ -0,0 +1,85 @@
+"""Benchmark cropping HRRR files with the single wgrib2 pass in
+`crop_grib` against the older two step crop, which crops every record
+to the domain with `small_grib` and then matches the WindNinja
+variables with a second wgrib2 call. Requires wgrib2.
+
+    python benchmarks/crop_grib.py -n 5 tests/Lakes/input/*/*.grib2
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import netCDF4 as nc
+
+from katana.grib_crop_wgrib2 import (WIND_NINJA_VARIABLES, call_wgrib2,
+                                     crop_grib, latlon_bounds, small_grib)
+
+
+def topo_bounds(topo_file, buff=6000, zone_letter='N', zone_number=11):
+    """Lat/lon bounds of a topo file"""
+
+    with nc.Dataset(topo_file) as t:
+        x = t.variables['x'][:]
+        y = t.variables['y'][:]
+
+    return latlon_bounds(x, y, buff=buff, zone_letter=zone_letter,
+                         zone_number=zone_number)
+
+
+def two_step(files, out_dir, bounds, logger):
+    tmp_grib = os.path.join(out_dir, 'tmp.grib2')
+    for idx, fp in enumerate(files):
+        small_grib(fp, tmp_grib, bounds, logger)
+        call_wgrib2(['wgrib2', tmp_grib, '-match', WIND_NINJA_VARIABLES,
+                     '-GRIB', os.path.join(
+                         out_dir, 'two_step_{}.grib2'.format(idx))],
+                    logger)
+        os.remove(tmp_grib)
+
+
+def single_pass(files, out_dir, bounds, logger, packing):
+    for idx, fp in enumerate(files):
+        crop_grib(fp, os.path.join(
+            out_dir, 'single_pass_{}.grib2'.format(idx)),
+            bounds, logger, packing=packing)
+
+
+def timeit(func, repeat, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('files', nargs='+', help='HRRR grib2 files')
+    p.add_argument('-n', '--repeat', type=int, default=3)
+    p.add_argument('--topo', default='tests/Lakes/topo/topo.nc')
+    p.add_argument('--packing', default='same')
+    args = p.parse_args()
+
+    logger = logging.getLogger('benchmark')
+    bounds = topo_bounds(args.topo)
+    out_dir = tempfile.mkdtemp()
+
+    try:
+        t_two = timeit(two_step, args.repeat,
+                       args.files, out_dir, bounds, logger)
+        t_one = timeit(single_pass, args.repeat,
+                       args.files, out_dir, bounds, logger, args.packing)
+    finally:
+        shutil.rmtree(out_dir)
+
+    n = len(args.files)
+    print('files: {}, best of {}'.format(n, args.repeat))
+    print('two step:    {:.3f} sec, {:.1f} files/sec'.format(t_two, n / t_two))
+    print('single pass: {:.3f} sec, {:.1f} files/sec ({} packing)'.format(
+        t_one, n / t_one, args.packing))
+    print('speedup:     {:.2f}x'.format(t_two / t_one))
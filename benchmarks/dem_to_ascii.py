@@ -0,0 +1,102 @@
+"""Benchmark writing the WindNinja ascii dem with the streaming
+`write_ascii_grid` against loading the whole dem and `np.savetxt`.
+A synthetic dem with masked cells is written to a temporary netCDF.
+
+    python benchmarks/dem_to_ascii.py -s 4000 -n 3
+
+The peak memory is traced in an extra run of each writer.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import netCDF4 as nc
+import numpy as np
+
+from katana.topo import write_ascii_grid
+
+FILLVAL = -9999
+HEADER = 'ncols {0}\nnrows {0}\nxllcorner 0\nyllcorner 0\ncellsize 10\n' \
+    'NODATA_value {1}'
+
+
+def make_dem(fp, size):
+    """Synthetic float32 dem with a masked corner"""
+
+    y, x = np.mgrid[0:size, 0:size]
+    dem = (2000 + 500 * np.sin(x / 300.) * np.cos(y / 200.)).astype('f4')
+    dem[0:size // 10, 0:size // 10] = FILLVAL
+
+    with nc.Dataset(fp, 'w') as ds:
+        ds.createDimension('y', size)
+        ds.createDimension('x', size)
+        v = ds.createVariable('dem', 'f4', ('y', 'x'), fill_value=FILLVAL)
+        v[:] = dem
+
+
+def savetxt(fp_nc, fp_asc, header):
+    with nc.Dataset(fp_nc, 'r') as ds:
+        dem = ds.variables['dem'][:]
+    np.savetxt(fp_asc, dem, header=header, comments='')
+
+
+def streaming(fp_nc, fp_asc, header):
+    with nc.Dataset(fp_nc, 'r') as ds:
+        write_ascii_grid(fp_asc, ds.variables['dem'], header, FILLVAL)
+
+
+def timeit(func, repeat, *args):
+    """Best time and the peak memory in MB of a function"""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    return min(times), peak
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('-s', '--size', type=int, default=2000,
+                   help='number of rows and columns of the dem')
+    p.add_argument('-n', '--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    fp_nc = os.path.join(tmp_dir, 'dem.nc')
+    header = HEADER.format(args.size, FILLVAL)
+
+    try:
+        make_dem(fp_nc, args.size)
+
+        t_stream, mem_stream = timeit(
+            streaming, args.repeat, fp_nc,
+            os.path.join(tmp_dir, 'stream.asc'), header)
+        t_savetxt, mem_savetxt = timeit(
+            savetxt, args.repeat, fp_nc,
+            os.path.join(tmp_dir, 'savetxt.asc'), header)
+
+        same = np.array_equal(
+            np.loadtxt(os.path.join(tmp_dir, 'stream.asc'), skiprows=6),
+            np.loadtxt(os.path.join(tmp_dir, 'savetxt.asc'), skiprows=6))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print('dem: {0}x{0}, best of {1}'.format(args.size, args.repeat))
+    print('np.savetxt: {:.3f} sec, peak memory {:.0f} MB'.format(
+        t_savetxt, mem_savetxt))
+    print('streaming:  {:.3f} sec, peak memory {:.0f} MB'.format(
+        t_stream, mem_stream))
+    print('speedup:    {:.2f}x, same values: {}'.format(
+        t_savetxt / t_stream, same))
@@ -0,0 +1,81 @@
+"""Benchmark the WindNinja elevation file as an ascii grid against a
+tiled and compressed GeoTIFF. The write time is the time to convert
+the netCDF dem. The load time is reading the file with GDAL the way
+WindNinja does on every run. Requires GDAL.
+
+    python benchmarks/elevation_file.py -n 3 tests/Lakes/topo/topo.nc
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from netCDF4 import Dataset
+
+from katana.topo import Topo
+from katana.topo_geotiff import gdal
+
+
+class BenchmarkTopo(Topo):
+    """Topo that writes to a temporary directory without a config"""
+
+    def __init__(self, topo_filename, out_dir):
+        self.topo_filename = topo_filename
+        self.windninja_topo = os.path.join(out_dir, 'topo.asc')
+        self.windninja_topo_prj = os.path.join(out_dir, 'topo.prj')
+        self.windninja_topo_tif = os.path.join(out_dir, 'topo.tif')
+        self._logger = logging.getLogger('benchmark')
+
+        with Dataset(topo_filename, 'r') as ds:
+            self.get_topo_stats(ds)
+
+
+def load(fp):
+    ds = gdal.Open(fp)
+    ds.GetRasterBand(1).ReadAsArray()
+    ds = None
+
+
+def timeit(func, repeat, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('topo', help='netCDF topo file')
+    p.add_argument('-n', '--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    out_dir = tempfile.mkdtemp()
+    topo = BenchmarkTopo(args.topo, out_dir)
+
+    try:
+        t_write_asc = timeit(topo.netcdf_dem_to_ascii, args.repeat)
+        t_write_tif = timeit(topo.netcdf_dem_to_geotiff, args.repeat)
+
+        t_load_asc = timeit(load, args.repeat, topo.windninja_topo)
+        t_load_tif = timeit(load, args.repeat, topo.windninja_topo_tif)
+
+        size_asc = os.path.getsize(topo.windninja_topo)
+        size_tif = os.path.getsize(topo.windninja_topo_tif)
+    finally:
+        shutil.rmtree(out_dir)
+
+    print('dem: {}x{}, best of {}'.format(
+        topo.topo_stats['nx'], topo.topo_stats['ny'], args.repeat))
+    print('          write      load       size')
+    print('ascii:    {:.3f} sec  {:.3f} sec  {:.1f} MB'.format(
+        t_write_asc, t_load_asc, size_asc / 2**20))
+    print('geotiff:  {:.3f} sec  {:.3f} sec  {:.1f} MB'.format(
+        t_write_tif, t_load_tif, size_tif / 2**20))
+    print('speedup:  {:.2f}x      {:.2f}x      {:.1f}x smaller'.format(
+        t_write_asc / t_write_tif, t_load_asc / t_load_tif,
+        size_asc / size_tif))
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+
+class CropCache():
+    """Cache of cropped HRRR files that is shared between runs. A crop
+    is stored under a key from the source file identity (path, size and
+    modification time), the lat/lon bounds of the buffered domain, the
+    grib variables, the packing and the crop backend. A hit is hard
+    linked into the run, or copied if the cache is on another file
+    system.
+
+    The cache is limited to `max_size` bytes, the least recently used
+    crops are removed first. The modification time of a cached file is
+    its last use.
+    """
+
+    SUFFIX = '.grib2'
+
+    def __init__(self, directory, max_size=None):
+        """Init the CropCache
+
+        Arguments:
+            directory {str} -- cache directory, created if needed
+
+        Keyword Arguments:
+            max_size {int} -- maximum bytes in the cache, no limit if
+                None (default: {None})
+        """
+
+        self._logger = logging.getLogger(__name__)
+
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(fp_in, bounds, variables, packing='same', backend='wgrib2',
+            window=None):
+        """Key of a crop
+
+        Arguments:
+            fp_in {str} -- source grib file
+            bounds {tuple} -- lat/lon bounds from `latlon_bounds`
+            variables {str} -- grib variables in the crop
+
+        Keyword Arguments:
+            packing {str} -- GRIB2 packing of the crop (default: {'same'})
+            backend {str} -- crop backend (default: {'wgrib2'})
+            window {tuple} -- i/j index window of the crop
+                (default: {None})
+
+        Returns:
+            str -- hex digest of the crop
+        """
+
+        stat = os.stat(fp_in)
+        identity = {
+            'path': os.path.abspath(fp_in),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'bounds': ['{:.6f}'.format(b) for b in bounds],
+            'variables': variables,
+            'packing': packing,
+            'backend': backend
+        }
+
+        # crops by lat/lon keep the keys they had before index windows
+        if window is not None:
+            identity['window'] = list(window)
+
+        return hashlib.sha256(
+            json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        """Path of a crop in the cache
+
+        Arguments:
+            key {str} -- crop key
+
+        Returns:
+            str -- file path
+        """
+
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def link(self, src, dst):
+        """Hard link a file to a new path, the file is copied if it
+        can not be linked. The new path is replaced if it exists.
+
+        Arguments:
+            src {str} -- existing file
+            dst {str} -- new path
+        """
+
+        tmp_file = '{}.{}.tmp'.format(dst, os.getpid())
+        try:
+            os.link(src, tmp_file)
+        except OSError:
+            shutil.copyfile(src, tmp_file)
+
+        os.replace(tmp_file, dst)
+
+    def fetch(self, key, fp_out):
+        """Put a cached crop in the run
+
+        Arguments:
+            key {str} -- crop key
+            fp_out {str} -- path of the crop in the run
+
+        Returns:
+            bool -- True if the crop was in the cache
+        """
+
+        cached = self.path(key)
+        try:
+            self.link(cached, fp_out)
+        except FileNotFoundError:
+            return False
+
+        # mark the crop as used
+        try:
+            os.utime(cached)
+        except FileNotFoundError:
+            pass
+
+        self._logger.debug('Using the cached crop {} for {}'.format(
+            cached, fp_out))
+
+        return True
+
+    def store(self, key, fp):
+        """Add a crop to the cache and evict old crops
+
+        Arguments:
+            key {str} -- crop key
+            fp {str} -- cropped file
+        """
+
+        self.link(fp, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used crops until the cache is
+        under `max_size`
+        """
+
+        if self.max_size is None:
+            return
+
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as files:
+            for entry in files:
+                if not entry.name.endswith(self.SUFFIX):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, fp in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            try:
+                os.remove(fp)
+            except FileNotFoundError:
+                pass
+
+            self._logger.debug('Evicted {} from the crop cache'.format(fp))
+            total -= size
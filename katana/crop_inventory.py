@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import struct
+import threading
+
+GRIB_MAGIC = b'GRIB'
+GRIB_END = b'7777'
+
+
+def grib_record_count(file_name):
+    """Count the records in a grib file by walking the message headers,
+    without decoding the data. GRIB1 and GRIB2 messages are supported.
+
+    Arguments:
+        file_name {str} -- path to the grib file
+
+    Returns:
+        int -- number of records or None if the file is truncated or
+            not a grib file
+    """
+
+    count = 0
+    with open(file_name, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+
+        while offset < size:
+            f.seek(offset)
+            header = f.read(16)
+            if len(header) < 8 or header[0:4] != GRIB_MAGIC:
+                return None
+
+            edition = header[7]
+            if edition == 2:
+                if len(header) < 16:
+                    return None
+                length = struct.unpack('>Q', header[8:16])[0]
+            elif edition == 1:
+                length = int.from_bytes(header[4:7], 'big')
+            else:
+                return None
+
+            if length < 16 or offset + length > size:
+                return None
+
+            f.seek(offset + length - 4)
+            if f.read(4) != GRIB_END:
+                return None
+
+            count += 1
+            offset += length
+
+    return count
+
+
+class CropInventory():
+    """Record of the cropped HRRR files for each day. The sidecar
+    `crop_inventory.json` next to the `hrrr.YYYYMMDD` folder has the
+    source file, bounds and packing of every crop with the size and
+    record count of the cropped file. An incremental run keeps the
+    crops that are still current and only crops the missing or stale
+    hours.
+    """
+
+    FILE_NAME = 'crop_inventory.json'
+
+    def __init__(self):
+        """Init the CropInventory
+        """
+
+        self._logger = logging.getLogger(__name__)
+
+        self.lock = threading.Lock()
+        self.days = {}
+
+    def sidecar(self, fp_out):
+        """Sidecar file for a cropped file
+
+        Arguments:
+            fp_out {str} -- cropped file
+
+        Returns:
+            str -- path to the sidecar
+        """
+
+        return os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(fp_out))),
+            self.FILE_NAME)
+
+    def load(self, sidecar):
+        """Crops in a sidecar, loaded once
+
+        Arguments:
+            sidecar {str} -- path to the sidecar
+
+        Returns:
+            dict -- crops by cropped file name
+        """
+
+        if sidecar not in self.days:
+            crops = {}
+            if os.path.isfile(sidecar):
+                try:
+                    with open(sidecar, 'r') as f:
+                        crops = json.load(f)
+                except ValueError:
+                    self._logger.warning(
+                        'Ignoring the unreadable crop inventory {}'.format(
+                            sidecar))
+
+            self.days[sidecar] = crops
+
+        return self.days[sidecar]
+
+    @staticmethod
+    def source(fp_in, bounds, packing='same', backend='wgrib2',
+               window=None):
+        """Identity of the source and options of a crop
+
+        Arguments:
+            fp_in {str} -- source grib file
+            bounds {tuple} -- lat/lon bounds from `latlon_bounds`
+
+        Keyword Arguments:
+            packing {str} -- GRIB2 packing of the crop (default: {'same'})
+            backend {str} -- crop backend (default: {'wgrib2'})
+            window {tuple} -- i/j index window of the crop
+                (default: {None})
+
+        Returns:
+            dict -- source file with its size and modification time,
+                the bounds, packing and backend
+        """
+
+        stat = os.stat(fp_in)
+        source = {
+            'file': os.path.abspath(fp_in),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'bounds': ['{:.6f}'.format(b) for b in bounds],
+            'packing': packing,
+            'backend': backend
+        }
+
+        if window is not None:
+            source['window'] = list(window)
+
+        return source
+
+    def is_current(self, fp_out, source):
+        """Check if a cropped file is still current. The source and
+        options must be the same as the recorded crop and the cropped
+        file must have the recorded size and record count.
+
+        Arguments:
+            fp_out {str} -- cropped file
+            source {dict} -- identity from `CropInventory.source`
+
+        Returns:
+            bool -- True if the crop does not need to be made again
+        """
+
+        with self.lock:
+            crop = self.load(self.sidecar(fp_out)).get(
+                os.path.basename(fp_out))
+
+        if crop is None or crop['source'] != source or not crop['records']:
+            return False
+
+        try:
+            if os.path.getsize(fp_out) != crop['size']:
+                return False
+            return grib_record_count(fp_out) == crop['records']
+        except FileNotFoundError:
+            return False
+
+    def record(self, fp_out, source):
+        """Record a new crop in the sidecar
+
+        Arguments:
+            fp_out {str} -- cropped file
+            source {dict} -- identity from `CropInventory.source`
+        """
+
+        crop = {
+            'source': source,
+            'size': os.path.getsize(fp_out),
+            'records': grib_record_count(fp_out)
+        }
+
+        sidecar = self.sidecar(fp_out)
+        with self.lock:
+            crops = self.load(sidecar)
+            crops[os.path.basename(fp_out)] = crop
+
+            tmp_file = '{}.tmp'.format(sidecar)
+            with open(tmp_file, 'w') as f:
+                json.dump(crops, f, indent=2)
+            os.replace(tmp_file, sidecar)
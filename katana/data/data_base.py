@@ -1,6 +1,9 @@
 import os
+from glob import glob
 
-from katana import utils
+from katana import execution, utils
+from katana.manifest import Manifest
+from katana.netcdf_cube import write_cube
 
 
 class BaseData():
@@ -17,6 +20,21 @@ class BaseData():
         self.start_date = self.config['time']['start_date']
         self.end_date = self.config['time']['end_date']
         self.out_dir = self.config['output']['out_location']
+        self.wn_cfg = self.config['output']['wn_cfg']
+        self.num_workers = self.config['execution']['num_workers']
+        self.total_cores = self.config['execution']['total_cores']
+        self.queue_size = self.config['execution']['pipeline_queue_size']
+        self.netcdf_cube = self.config['output']['netcdf_cube']
+        self.netcdf_cube_uv = self.config['output']['netcdf_cube_uv']
+        self.wn_options = execution.wind_ninja_options(self.config)
+
+        # split the total cores between concurrent runs and threads
+        self.scheduler = None
+        if self.total_cores is not None:
+            self.scheduler = execution.CoreScheduler.from_topo(
+                self.total_cores,
+                self.topo.topo_stats,
+                self.config['wind_ninja']['mesh_resolution'])
 
         # create an hourly time step between the start date and end date
         self.date_list = utils.daterange(self.start_date, self.end_date)
@@ -24,11 +42,111 @@ class BaseData():
         # create a daily list between the start and end date
         self.day_list = utils.daylist(self.start_date, self.end_date)
 
+        # record of the completed days
+        self.manifest = Manifest(self.out_dir, Manifest.hash_config(config))
+
     def initialize_data(self):
         """Initialize the data if needed
         """
         pass
 
+    def run_pipeline(self):
+        """Prepare the data and run WindNinja at the same time. Data
+        types that can't overlap the two just run them one after another.
+        """
+
+        self.initialize_data()
+        self.run()
+
+    def skip_completed_days(self):
+        """Remove the days that have already completed according to
+        the manifest from the day and date lists
+        """
+
+        completed = [day for day in self.day_list
+                     if self.manifest.is_complete(day, self.day_hours(day))]
+
+        for day in completed:
+            self._logger.info(
+                'Skipping {}, already completed in the manifest'.format(day))
+
+        self.day_list = [day for day in self.day_list
+                         if day not in completed]
+        self.date_list = [dt for dt in self.date_list
+                          if dt.date() not in completed]
+
+    def record_day(self, day, elapsed=None):
+        """Record a completed day in the manifest
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Keyword Arguments:
+            elapsed {float} -- seconds the day took to run
+                (default: {None})
+        """
+
+        self.manifest.record(
+            day,
+            self.day_hours(day),
+            self.day_inputs(day),
+            self.day_outputs(day),
+            elapsed=elapsed)
+
+    def day_inputs(self, day):
+        """Input files used by WindNinja for a day
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Returns:
+            list -- list of input file paths
+        """
+
+        return []
+
+    def day_outputs(self, day):
+        """WindNinja output files for a day
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Returns:
+            list -- list of output file paths
+        """
+
+        return [file_name for file_name in glob(os.path.join(
+            self.output_day_folder(day),
+            '{}*'.format(self.topo.windnina_filenames)))
+            if os.path.isfile(file_name)]
+
+    def day_hours(self, day):
+        """The hours in the date list for a given day
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Returns:
+            list -- list of datetimes in the day
+        """
+
+        return [dt for dt in self.date_list if dt.date() == day]
+
+    def wind_ninja_cfg_file(self, day=None):
+        """Path to the WindNinja config file. Concurrent runs write
+        a config file per day so they don't overwrite each other.
+
+        Keyword Arguments:
+            day {datetime} -- Datetime object for the day or None for
+                the `wn_cfg` from the config (default: {None})
+        """
+
+        if day is None:
+            return self.wn_cfg
+
+        base, ext = os.path.splitext(self.wn_cfg)
+        return '{}_{}{}'.format(base, day.strftime(self.DATE_FORMAT), ext)
+
     def output_day_folder(self, day):
         """Create a path to a folder for the given day
 
@@ -41,6 +159,41 @@ class BaseData():
                                 day.strftime(self.DATE_FORMAT)),
                             'wind_ninja_data')
 
+    def netcdf_cube_file(self, day):
+        """Path to the NetCDF file of the WindNinja outputs for a day
+
+        Arguments:
+            day {datetime} -- Datetime object for the day
+        """
+
+        day_str = day.strftime(self.DATE_FORMAT)
+        return os.path.join(self.out_dir, 'data{}'.format(day_str),
+                            'wind_ninja_{}.nc'.format(day_str))
+
+    def write_netcdf_cube(self, day):
+        """Write the WindNinja outputs of a finished day to a NetCDF
+        file when `netcdf_cube` is set
+
+        Arguments:
+            day {datetime} -- Datetime object for the day
+        """
+
+        if not self.netcdf_cube:
+            return
+
+        out_file = self.netcdf_cube_file(day)
+        num_times = write_cube(
+            out_file,
+            self.day_outputs(day),
+            self.topo.windnina_filenames,
+            self.topo.topo_stats,
+            speed_units=self.config['wind_ninja']['output_speed_units'],
+            time_zone=self.config['wind_ninja']['time_zone'],
+            uv=self.netcdf_cube_uv)
+
+        self._logger.info('Wrote {} WindNinja times to {}'.format(
+            num_times, out_file))
+
     def make_output_day_folder(self, day):
         """Make the output day folder
 
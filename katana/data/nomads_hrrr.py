@@ -1,10 +1,21 @@
 import logging
 import os
+import queue
+import threading
+from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime
+from glob import glob
 
+from katana import execution, grib_crop_eccodes
+from katana.crop_cache import CropCache
 from katana.data.data_base import BaseData
-from katana.grib_crop_wgrib2 import create_new_grib
+from katana.geometry import DomainGeometry
+from katana.grib_crop_wgrib2 import (create_new_grib, sub_crop_grib,
+                                     wind_ninja_output_dir)
+from katana.hrrr_archive import HRRRArchive
+from katana.mosaic import mosaic_outputs
+from katana.supervisor import supervisor
 from katana.wind_ninja import WindNinja
 
 
@@ -26,7 +37,45 @@ class NomadsHRRR(BaseData):
         self.buffer = self.config['input']['hrrr_buffer']
         self.directory = self.config['input']['hrrr_directory']
         self.make_new_gribs = self.config['output']['make_new_gribs']
+        self.incremental = self.config['output']['incremental_gribs']
         self.nthreads_w = self.config['input']['hrrr_num_wgrib_threads']
+        self.packing = self.config['input']['hrrr_grib_packing']
+        self.backend = self.config['input']['hrrr_crop_backend']
+
+        if self.backend == 'eccodes' and \
+                not grib_crop_eccodes.eccodes_available():
+            raise ImportError('hrrr_crop_backend is eccodes but the '
+                              'eccodes package is not installed')
+
+        # buffered domain and its index window on the HRRR grid
+        self.geometry = DomainGeometry.from_topo(topo, buff=self.buffer)
+        self.window = None
+        if self.config['input']['hrrr_crop_window'] == 'ij':
+            self.window = self.geometry.ij_window()
+
+        # index of the HRRR files to find the file for each hour
+        self.archive = HRRRArchive(
+            self.directory,
+            cache_file=self.config['input']['hrrr_index_file'])
+
+        # crops shared with other runs
+        self.crop_cache = None
+        if self.config['input']['hrrr_crop_cache'] is not None:
+            self.crop_cache = CropCache(
+                self.config['input']['hrrr_crop_cache'],
+                max_size=self.config['input']['hrrr_crop_cache_size'] * 2**20)
+
+        supervisor.set_limit(
+            'wgrib2', self.config['execution']['max_wgrib2_processes'])
+
+        # number of cropped files for each day
+        self.num_files = {}
+
+        # tiles of the dem that run separately and are mosaicked, with
+        # the run time of the finished tiles for each day
+        self.tiles = topo.tiles
+        self.tile_overlap = self.config['topo']['tile_overlap']
+        self.tiles_done = {}
 
         self._logger.debug('NomadsHRRR initialized')
 
@@ -34,47 +83,397 @@ class NomadsHRRR(BaseData):
         """Initialize the data if needed
         """
 
-        self.num_files = create_new_grib(
-            self.date_list,
+        self.num_files = self.crop_gribs(self.date_list)
+        self.crop_tiles(self.date_list)
+
+        self._logger.info('NomadsHRRR data initialized')
+
+    def crop_gribs(self, date_list):
+        """Crop the HRRR grib files to the topo domain
+
+        Arguments:
+            date_list {list} -- list of datetimes to crop
+
+        Returns:
+            dict -- number of cropped files for each day
+        """
+
+        return create_new_grib(
+            date_list,
             self.directory, self.out_dir,
             self.topo.x1, self.topo.y1, self._logger,
+            nthreads_w=self.nthreads_w,
+            make_new_gribs=self.make_new_gribs,
+            incremental=self.incremental,
+            bounds=self.latlon_bounds(),
+            window=self.window,
+            byte_ranges=self.config['input']['hrrr_byte_ranges'],
+            batch=self.config['input']['hrrr_batch_crop'],
+            packing=self.packing,
+            backend=self.backend,
+            archive=self.archive,
+            cache=self.crop_cache,
+            num_workers=self.config['execution']['max_wgrib2_processes'])
+
+    def crop_day(self, day):
+        """Crop the grib files for the hours of a single day
+
+        Arguments:
+            day {date} -- date object for the day
+        """
+
+        self._logger.info('Cropping grib files for {}'.format(day))
+        self.num_files.update(self.crop_gribs(self.day_hours(day)))
+        self.crop_tiles(self.day_hours(day))
+
+    def crop_tiles(self, date_list):
+        """Crop the grib files of each tile from the crop of the whole
+        domain
+
+        Arguments:
+            date_list {list} -- list of datetimes to crop
+        """
+
+        if not self.make_new_gribs:
+            return
+
+        for tile in self.tiles:
+            self._logger.debug('Cropping grib files for {}'.format(
+                tile.name))
+            sub_crop_grib(
+                date_list, self.out_dir, self.tile_dir(tile),
+                self.tile_bounds(tile), self._logger,
+                nthreads_w=self.nthreads_w,
+                backend=self.backend)
+
+    def tile_dir(self, tile):
+        """Output directory of a tile
+
+        Arguments:
+            tile {Tile} -- `katana.tiles.Tile` of the dem
+
+        Returns:
+            str -- path to the tile directory
+        """
+
+        return os.path.join(self.out_dir, 'tiles', tile.name)
+
+    def tile_bounds(self, tile):
+        """Lat/lon bounds of a buffered tile
+
+        Arguments:
+            tile {Tile} -- `katana.tiles.Tile` of the dem
+
+        Returns:
+            tuple -- west and east longitude, south and north latitude
+        """
+
+        return DomainGeometry(
+            tile.x, tile.y, self.topo.zone_number,
             zone_letter=self.topo.zone_letter,
-            zone_number=self.topo.zone_number,
-            buff=self.buffer,
+            buff=self.buffer).latlon_bounds
+
+    def latlon_bounds(self):
+        """Lat/lon bounds of the buffered topo domain
+
+        Returns:
+            tuple -- west and east longitude, south and north latitude
+        """
+
+        return self.geometry.latlon_bounds
+
+    def sub_crop_gribs(self, shared_dir):
+        """Crop the grib files from a shared crop of a larger domain
+        instead of the full HRRR files
+
+        Arguments:
+            shared_dir {str} -- output directory of the shared crop
+        """
+
+        self.num_files = sub_crop_grib(
+            self.date_list, shared_dir, self.out_dir,
+            self.latlon_bounds(), self._logger,
             nthreads_w=self.nthreads_w,
-            make_new_gribs=self.make_new_gribs)
+            backend=self.backend)
+        self.crop_tiles(self.date_list)
 
-        self._logger.info('NomadsHRRR data initialized')
+    def day_inputs(self, day):
+        """Cropped grib files used by WindNinja for a day
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Returns:
+            list -- list of input file paths
+        """
+
+        return glob(os.path.join(
+            wind_ninja_output_dir(self.out_dir, day), '*.grib2'))
+
+    def wind_ninja_config(self, day, tile=None):
+        """Create the WindNinja config options for a day
+
+        Arguments:
+            day {datetime} -- Datetime object for the day
+
+        Keyword Arguments:
+            tile {Tile} -- run WindNinja on a tile of the dem with the
+                tile's grib files and output folder (default: {None})
+
+        Returns:
+            dict -- dictionary of `wind_ninja` config options
+        """
+
+        if tile is None:
+            out_dir_day = self.make_output_day_folder(day)
+            elevation_file = self.topo.elevation_file
+        else:
+            out_dir_day = self.tile_day_folder(tile, day)
+            os.makedirs(out_dir_day, exist_ok=True)
+            elevation_file = tile.elevation_file
+
+        out_dir_wn = os.path.join(out_dir_day,
+                                  'hrrr.{}'.format(
+                                      day.strftime(self.DATE_FORMAT)))
+
+        wn_cfg = deepcopy(self.config['wind_ninja'])
+        wn_cfg['forecast_filename'] = out_dir_wn
+        wn_cfg['output_path'] = out_dir_day
+        wn_cfg['elevation_file'] = elevation_file
+
+        return wn_cfg
+
+    def tile_day_folder(self, tile, day):
+        """WindNinja output folder of a tile for a day
+
+        Arguments:
+            tile {Tile} -- `katana.tiles.Tile` of the dem
+            day {datetime} -- Datetime object for the day
+
+        Returns:
+            str -- path to the folder
+        """
+
+        return os.path.dirname(
+            wind_ninja_output_dir(self.tile_dir(tile), day))
+
+    def day_tasks(self, day, wn_cfg_file):
+        """WindNinja tasks for a day, one for each tile if the dem is
+        split into tiles
+
+        Arguments:
+            day {date} -- date object for the day
+            wn_cfg_file {str} -- WindNinja config file for the day
+
+        Returns:
+            list -- list of the label and a tuple of (wn_cfg,
+                wn_cfg_file), the label is the day or the day and the
+                tile name
+        """
+
+        if not self.tiles:
+            return [(day, (self.wind_ninja_config(day), wn_cfg_file))]
+
+        base, ext = os.path.splitext(wn_cfg_file)
+        return [((day, tile.name), (
+            self.wind_ninja_config(day, tile),
+            '{}_{}{}'.format(base, tile.name, ext)))
+            for tile in self.tiles]
+
+    def task_complete(self, label, elapsed=None):
+        """Record a finished WindNinja task. A day with tiles is
+        mosaicked and recorded once all of its tiles have finished. The
+        NetCDF file of a day is written before the day is recorded.
+
+        Arguments:
+            label {date or tuple} -- day or day and tile name from
+                `day_tasks`
+
+        Keyword Arguments:
+            elapsed {float} -- seconds the task took to run
+                (default: {None})
+        """
+
+        if not self.tiles:
+            self.write_netcdf_cube(label)
+            self.record_day(label, elapsed)
+            return
+
+        day, name = label
+        done = self.tiles_done.setdefault(day, {})
+        done[name] = elapsed or 0
+
+        if len(done) == len(self.tiles):
+            self.mosaic_day(day)
+            self.write_netcdf_cube(day)
+            self.record_day(day, sum(done.values()))
+
+    def mosaic_day(self, day):
+        """Mosaic the WindNinja outputs of the tiles into the day
+        folder with the names of the whole domain
+
+        Arguments:
+            day {date} -- date object for the day
+        """
+
+        self._logger.info('Mosaicking {} tiles for {}'.format(
+            len(self.tiles), day))
+
+        mosaic_outputs(
+            self.tiles,
+            [self.tile_day_folder(tile, day) for tile in self.tiles],
+            self.make_output_day_folder(day),
+            self.topo.windnina_filenames,
+            self.tile_overlap,
+            nodata=self.topo.FILLVAL)
 
     def run(self):
         """Run the WindNinja simulation for NormadsHRRR
         """
 
+        # the tiles of a day run at the same time
+        if self.num_workers > 1 or self.scheduler is not None or \
+                self.tiles:
+            self.run_concurrent()
+            return
+
         # make config, run wind ninja, make netcdf
         for idd, day in enumerate(self.day_list):
-            self._logger.info('Running WindNinja for day {}'.format(day))
-            self._logger.debug(
-                '{} input files will be ran'.format(self.num_files[day]))
+            self.run_day(day)
 
-            start_time = datetime.now()
+    def run_day(self, day, wn_cfg_file=None):
+        """Run WindNinja for a single day and record it in the manifest
 
-            out_dir_day = self.make_output_day_folder(day)
+        Arguments:
+            day {date} -- date object for the day
+
+        Keyword Arguments:
+            wn_cfg_file {str} -- WindNinja config file to write, defaults
+                to the `wn_cfg` from the config (default: {None})
+        """
 
-            out_dir_wn = os.path.join(out_dir_day,
-                                      'hrrr.{}'.format(
-                                          day.strftime(self.DATE_FORMAT)))
+        self._logger.info('Running WindNinja for day {}'.format(day))
+        self._logger.debug(
+            '{} input files will be ran'.format(self.num_files[day]))
 
-            # run WindNinja_cli
-            wn_cfg = deepcopy(self.config['wind_ninja'])
-            wn_cfg['forecast_filename'] = out_dir_wn
-            wn_cfg['output_path'] = out_dir_day
-            wn_cfg['elevation_file'] = self.topo.windninja_topo
+        if wn_cfg_file is None:
+            wn_cfg_file = self.wind_ninja_cfg_file()
 
-            wn = WindNinja(
-                wn_cfg,
-                self.config['output']['wn_cfg'])
+        start_time = datetime.now()
+
+        # run WindNinja_cli for the day or each tile
+        for _, (wn_cfg, cfg_file) in self.day_tasks(day, wn_cfg_file):
+            wn = WindNinja(wn_cfg, cfg_file, **self.wn_options)
             wn.run_wind_ninja()
 
-            telapsed = datetime.now() - start_time
-            self._logger.debug('Running day took {} sec'.format(
-                telapsed.total_seconds()))
+        if self.tiles:
+            self.mosaic_day(day)
+
+        self.write_netcdf_cube(day)
+
+        telapsed = datetime.now() - start_time
+        self._logger.debug('Running day took {} sec'.format(
+            telapsed.total_seconds()))
+
+        self.record_day(day, telapsed.total_seconds())
+
+    def run_concurrent(self):
+        """Run the WindNinja simulation for multiple days at once. Each
+        day gets its own WindNinja config file and any failed days are
+        reported after all days have ran.
+        """
+
+        tasks = self.wind_ninja_tasks()
+
+        failures = execution.run_concurrent(
+            tasks, self.num_workers, self._logger, scheduler=self.scheduler,
+            on_complete=self.task_complete, wn_options=self.wn_options)
+        execution.check_failures(failures, len(tasks), self._logger)
+
+    def wind_ninja_tasks(self):
+        """WindNinja tasks for all days, see `execution.run_concurrent`
+
+        Returns:
+            OrderedDict -- dictionary of the label from `day_tasks` to
+                (wn_cfg, wn_cfg_file)
+        """
+
+        tasks = OrderedDict()
+        for day in self.day_list:
+            self._logger.debug('{} input files will be ran for {}'.format(
+                self.num_files[day], day))
+            tasks.update(self.day_tasks(day, self.wind_ninja_cfg_file(day)))
+
+        return tasks
+
+    def run_pipeline(self):
+        """Crop the grib files and run WindNinja at the same time. A
+        thread crops the grib files one day at a time and queues the
+        day for WindNinja as soon as all of the day's hours are cropped.
+        The queue is bounded so cropping can only get `queue_size` days
+        ahead of WindNinja.
+        """
+
+        day_queue = queue.Queue(maxsize=self.queue_size)
+
+        producer = threading.Thread(
+            target=self.crop_days, args=(day_queue,), daemon=True)
+        producer.start()
+
+        num_tasks = len(self.day_list) * max(1, len(self.tiles))
+        failures = execution.run_concurrent(
+            self.queued_tasks(day_queue), self.num_workers, self._logger,
+            scheduler=self.scheduler, num_tasks=num_tasks,
+            on_complete=self.task_complete, wn_options=self.wn_options)
+
+        producer.join()
+        execution.check_failures(failures, num_tasks, self._logger)
+
+    def crop_days(self, day_queue):
+        """Crop the grib files one day at a time and put each day on the
+        queue when done. Any exception is put on the queue to be raised
+        by the consumer and `None` marks the end of the days.
+
+        Arguments:
+            day_queue {Queue} -- queue of cropped days
+        """
+
+        try:
+            for day in self.day_list:
+                self.crop_day(day)
+                day_queue.put(day)
+
+        except Exception as e:
+            day_queue.put(e)
+            return
+
+        day_queue.put(None)
+
+    def queued_tasks(self, day_queue):
+        """Generate WindNinja tasks for the days as they are cropped
+
+        Arguments:
+            day_queue {Queue} -- queue of cropped days
+
+        Raises:
+            Exception: if cropping the grib files failed
+
+        Yields:
+            tuple -- label from `day_tasks` and a tuple of (wn_cfg,
+                wn_cfg_file)
+        """
+
+        while True:
+            day = day_queue.get()
+
+            if day is None:
+                return
+
+            if isinstance(day, Exception):
+                raise day
+
+            self._logger.debug('{} input files will be ran for {}'.format(
+                self.num_files[day], day))
+
+            for task in self.day_tasks(day, self.wind_ninja_cfg_file(day)):
+                yield task
@@ -1,17 +1,80 @@
 import logging
 import os
 import shutil
+from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime
 from glob import glob
 
 import netCDF4 as nc
+import numpy as np
 import pytz
 
-from katana import utils
+from katana import execution, utils
 from katana.data.data_base import BaseData
 from katana.wind_ninja import WindNinja
 
+# variables that WindNinja reads from a wrfout surface file
+WRF_VARIABLES = ['Times', 'XLAT', 'XLONG', 'T2', 'U10', 'V10', 'QCLOUD']
+
+
+def slice_wrf_file(wrf_filename, out_filename, start, end,
+                   variables=WRF_VARIABLES):
+    """Write a slice of a wrfout file along the `Time` dimension to
+    a new NetCDF file. The global attributes are kept as WindNinja uses
+    them to identify the file and the projection.
+
+    Arguments:
+        wrf_filename {str} -- wrfout file to slice
+        out_filename {str} -- NetCDF file to write
+        start {int} -- first time index of the slice
+        end {int} -- time index after the end of the slice
+
+    Keyword Arguments:
+        variables {list} -- variables to keep if they are in the file
+            (default: {WRF_VARIABLES})
+    """
+
+    with nc.Dataset(wrf_filename, 'r') as src, \
+            nc.Dataset(out_filename, 'w', format=src.data_model) as dst:
+
+        dst.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+
+        keep = [v for v in variables if v in src.variables]
+
+        # dimensions used by the variables
+        dims = []
+        for v in keep:
+            dims.extend([d for d in src.variables[v].dimensions
+                         if d not in dims])
+
+        for d in dims:
+            if d == 'Time':
+                size = None if src.dimensions[d].isunlimited() \
+                    else end - start
+            else:
+                size = len(src.dimensions[d])
+            dst.createDimension(d, size)
+
+        for v in keep:
+            var = src.variables[v]
+            attrs = {k: var.getncattr(k) for k in var.ncattrs()}
+            fill_value = attrs.pop('_FillValue', None)
+
+            out = dst.createVariable(
+                v, var.dtype, var.dimensions, fill_value=fill_value)
+            out.setncatts(attrs)
+
+            var.set_auto_maskandscale(False)
+            out.set_auto_maskandscale(False)
+
+            if 'Time' in var.dimensions:
+                index = [slice(None)] * len(var.dimensions)
+                index[var.dimensions.index('Time')] = slice(start, end)
+                out[:] = var[tuple(index)]
+            else:
+                out[:] = var[:]
+
 
 class WRFout(BaseData):
 
@@ -32,8 +95,13 @@ class WRFout(BaseData):
 
         super().__init__(config, topo)
 
+        if topo.tiles:
+            self._logger.warning('tile_size is only used with HRRR, '
+                                 'WindNinja will run on the whole domain')
+
         # WRF file information
         self.wrf_filename = self.config['input']['wrf_filename']
+        self.num_chunks = self.config['input']['wrf_num_chunks']
         self.get_wrf_time_info()
 
         self.out_dir_tmp = os.path.join(self.out_dir, 'tmp')
@@ -97,6 +165,32 @@ class WRFout(BaseData):
                                  "simulations for all times in file".format(
                                      num_wrf - num_list))
 
+    def skip_completed_days(self):
+        """The whole WRF file is ran at once, so only skip the run
+        when all of the days have completed
+        """
+
+        completed = [self.manifest.is_complete(day, self.day_hours(day))
+                     for day in self.day_list]
+
+        if all(completed):
+            self._logger.info(
+                'Skipping WRF file, all days completed in the manifest')
+            self.day_list = []
+            self.date_list = []
+
+    def day_inputs(self, day):
+        """The WRF file is the input for every day
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Returns:
+            list -- list of input file paths
+        """
+
+        return [self.wrf_filename]
+
     def run(self):
         """Run the WindNinja simulation for WRFout
 
@@ -110,6 +204,9 @@ class WRFout(BaseData):
         date and will be able to handle multiple days.
         """
 
+        if len(self.day_list) == 0:
+            return
+
         # make config, run wind ninja, make netcdf
         self._logger.info(
             'Running WindNinja for WRF file {}'.format(self.wrf_filename))
@@ -119,16 +216,23 @@ class WRFout(BaseData):
         if not os.path.isdir(self.out_dir_tmp):
             os.makedirs(self.out_dir_tmp)
 
-        # run WindNinja_cli
-        wn_cfg = deepcopy(self.config['wind_ninja'])
-        wn_cfg['forecast_filename'] = self.wrf_filename
-        wn_cfg['elevation_file'] = self.topo.windninja_topo
-        wn_cfg['output_path'] = self.out_dir_tmp
+        if self.num_chunks > 1:
+            self.run_chunks()
+
+        else:
+            # run WindNinja_cli
+            wn_cfg = self.wind_ninja_config(
+                self.wrf_filename, self.out_dir_tmp)
 
-        wn = WindNinja(
-            wn_cfg,
-            self.config['output']['wn_cfg'])
-        wn.run_wind_ninja()
+            # a single WindNinja run gets the whole core budget
+            if self.total_cores is not None:
+                wn_cfg['num_threads'] = self.total_cores
+
+            wn = WindNinja(
+                wn_cfg,
+                self.config['output']['wn_cfg'],
+                **self.wn_options)
+            wn.run_wind_ninja()
 
         # move files to where then need to go
         self.organize_outputs()
@@ -137,9 +241,85 @@ class WRFout(BaseData):
         self._logger.debug('Total elapsed time for WRFout: {} sec'.format(
             telapsed.total_seconds()))
 
+        for day in self.day_list:
+            self.record_day(
+                day, telapsed.total_seconds() / len(self.day_list))
+
+    def wind_ninja_config(self, forecast_filename, output_path):
+        """Create the WindNinja config options for a WRF file
+
+        Arguments:
+            forecast_filename {str} -- WRF file for WindNinja
+            output_path {str} -- directory for the WindNinja output
+
+        Returns:
+            dict -- dictionary of `wind_ninja` config options
+        """
+
+        wn_cfg = deepcopy(self.config['wind_ninja'])
+        wn_cfg['forecast_filename'] = forecast_filename
+        wn_cfg['elevation_file'] = self.topo.elevation_file
+        wn_cfg['output_path'] = output_path
+
+        return wn_cfg
+
+    def split_wrf_file(self):
+        """Split the WRF file along the `Time` dimension into
+        `wrf_num_chunks` files in the temporary directory
+
+        Returns:
+            list -- list of the chunk file names
+        """
+
+        num_times = len(self.wrf_times)
+        chunks = [c for c in np.array_split(np.arange(num_times),
+                                            self.num_chunks) if len(c) > 0]
+
+        self._logger.info('Splitting {} WRF times into {} chunks'.format(
+            num_times, len(chunks)))
+
+        chunk_files = []
+        for idx, chunk in enumerate(chunks):
+            chunk_file = os.path.join(
+                self.out_dir_tmp, 'wrfout_chunk{}.nc'.format(idx))
+            slice_wrf_file(self.wrf_filename, chunk_file,
+                           chunk[0], chunk[-1] + 1)
+            chunk_files.append(chunk_file)
+
+        return chunk_files
+
+    def run_chunks(self):
+        """Run WindNinja for the chunks of the WRF file at the same time
+        on up to `num_workers` processes, or as many as the core budget
+        allows with `total_cores`. Each chunk outputs to its own folder
+        in the temporary directory.
+        """
+
+        base, ext = os.path.splitext(self.config['output']['wn_cfg'])
+
+        tasks = OrderedDict()
+        for idx, chunk_file in enumerate(self.split_wrf_file()):
+            out_dir_chunk = os.path.join(
+                self.out_dir_tmp, 'chunk{}'.format(idx))
+
+            # outputs left by an interrupted run would be moved to the
+            # day folders with the new ones
+            if os.path.isdir(out_dir_chunk):
+                shutil.rmtree(out_dir_chunk)
+            os.makedirs(out_dir_chunk)
+
+            tasks['chunk {}'.format(idx)] = (
+                self.wind_ninja_config(chunk_file, out_dir_chunk),
+                '{}_chunk{}{}'.format(base, idx, ext))
+
+        failures = execution.run_concurrent(
+            tasks, self.num_workers, self._logger, scheduler=self.scheduler,
+            wn_options=self.wn_options)
+        execution.check_failures(failures, len(tasks), self._logger)
+
     def organize_outputs(self):
         """Organize the WRF outputs from the temporary directory
-        to the day folders
+        to the day folders and write the NetCDF file of each day
         """
 
         self._logger.info('Moving output files to day directories')
@@ -149,10 +329,12 @@ class WRFout(BaseData):
         for day in self.day_list:
             self.make_output_day_folder(day)
 
+        # chunked runs output to a folder for each chunk
         file_names = glob(
             os.path.join(
-                self.out_dir_tmp, '{}*'.format(self.topo.windnina_filenames)
-            ))
+                self.out_dir_tmp, '**',
+                '{}*'.format(self.topo.windnina_filenames)
+            ), recursive=True)
 
         # go through each file and decode the date
         # then put into the right place
@@ -171,3 +353,6 @@ class WRFout(BaseData):
 
         # remove the tmp dir and anything left in it
         shutil.rmtree(self.out_dir_tmp)
+
+        for day in self.day_list:
+            self.write_netcdf_cube(day)
@@ -0,0 +1,256 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from copy import deepcopy
+from datetime import datetime
+
+import numpy as np
+
+from katana.wind_ninja import WindNinja
+
+
+def run_wind_ninja(wn_cfg, wn_cfg_file, wn_options=None):
+    """Run a single WindNinja simulation. This is a module level
+    function so that it can be sent to a worker process.
+
+    Arguments:
+        wn_cfg {dict} -- dictionary of `wind_ninja` config options
+        wn_cfg_file {str} -- WindNinja config file to write
+
+    Keyword Arguments:
+        wn_options {dict} -- timeout and retry options for `WindNinja`,
+            see `wind_ninja_options` (default: {None})
+
+    Returns:
+        bool -- True if WindNinja ran successfully
+    """
+
+    wn = WindNinja(wn_cfg, wn_cfg_file, **(wn_options or {}))
+    return wn.run_wind_ninja()
+
+
+def wind_ninja_options(config):
+    """Timeout and retry options for `WindNinja` from the
+    `execution` section
+
+    Arguments:
+        config {dict} -- dictionary of configuration options
+
+    Returns:
+        dict -- keyword arguments for `WindNinja`
+    """
+
+    return {
+        'timeout': config['execution']['wind_ninja_timeout'],
+        'idle_timeout': config['execution']['wind_ninja_idle_timeout'],
+        'attempts': config['execution']['wind_ninja_attempts'],
+        'retry_delay': config['execution']['wind_ninja_retry_delay'],
+        'retry_reduce_threads': config['execution'][
+            'wind_ninja_retry_reduce_threads']
+    }
+
+
+class CoreScheduler():
+    """Split a total core budget between the number of WindNinja
+    processes running at once and the threads given to each process.
+    """
+
+    # WindNinja threading stops paying off when each thread has
+    # fewer mesh cells than this to work on
+    MESH_CELLS_PER_THREAD = 20000
+
+    def __init__(self, total_cores, mesh_cells):
+        """Init the CoreScheduler
+
+        Arguments:
+            total_cores {int} -- total number of cores to use
+            mesh_cells {float} -- number of horizontal WindNinja
+                mesh cells in the domain
+        """
+
+        self.total_cores = max(1, int(total_cores))
+        self.mesh_cells = mesh_cells
+
+        # most threads a single WindNinja run can make use of
+        self.max_threads = int(np.clip(
+            mesh_cells // self.MESH_CELLS_PER_THREAD,
+            1, self.total_cores))
+
+        # most WindNinja processes that will run at once
+        self.max_workers = max(1, self.total_cores // self.max_threads)
+
+    @classmethod
+    def from_topo(cls, total_cores, topo_stats, mesh_resolution):
+        """Create a CoreScheduler from the topo and WindNinja mesh
+
+        Arguments:
+            total_cores {int} -- total number of cores to use
+            topo_stats {dict} -- `Topo.topo_stats` dictionary
+            mesh_resolution {float} -- WindNinja mesh resolution
+
+        Returns:
+            CoreScheduler -- scheduler for the domain
+        """
+
+        width = topo_stats['nx'] * np.abs(topo_stats['dv'])
+        height = topo_stats['ny'] * np.abs(topo_stats['du'])
+        mesh_cells = width * height / mesh_resolution**2
+
+        return cls(total_cores, mesh_cells)
+
+    def allocate(self, num_remaining):
+        """Determine the number of WindNinja processes and the threads
+        for each based on the number of tasks left to run. Near the
+        end of a run there are fewer tasks than workers so the pool
+        shrinks and each of the remaining tasks gets more threads.
+
+        Arguments:
+            num_remaining {int} -- number of tasks that are running
+                or waiting to run
+
+        Returns:
+            tuple -- number of workers, number of threads per worker
+        """
+
+        num_workers = max(1, min(self.max_workers, num_remaining))
+        num_threads = max(1, self.total_cores // num_workers)
+
+        return num_workers, num_threads
+
+
+def run_concurrent(tasks, num_workers, logger, scheduler=None,
+                   num_tasks=None, on_complete=None, wn_options=None):
+    """Run WindNinja tasks concurrently in a process pool. A failed
+    task does not stop the other tasks, the failures are collected
+    and returned once all tasks have finished.
+
+    The tasks can be a dictionary or an iterator that yields tasks as
+    they become available, e.g. when the input data is still being
+    prepared. The iterator is only advanced when a worker is free.
+
+    Arguments:
+        tasks {dict} -- dictionary of task label to a tuple of
+            (wn_cfg, wn_cfg_file), see `run_wind_ninja`. Can also be
+            an iterator of (label, (wn_cfg, wn_cfg_file)).
+        num_workers {int} -- number of concurrent WindNinja processes
+        logger {logger} -- logger instance
+
+    Keyword Arguments:
+        scheduler {CoreScheduler} -- if provided, the scheduler picks
+            the number of workers and the `num_threads` for each
+            task instead of `num_workers` (default: {None})
+        num_tasks {int} -- total number of tasks when `tasks` is an
+            iterator (default: {None})
+        on_complete {function} -- called with the task label and the
+            elapsed seconds when a task succeeds (default: {None})
+        wn_options {dict} -- timeout and retry options for each
+            WindNinja run (default: {None})
+
+    Returns:
+        dict -- dictionary of task label to the exception raised
+    """
+
+    if isinstance(tasks, dict):
+        num_tasks = len(tasks)
+        tasks = iter(tasks.items())
+
+    num_submitted = 0
+    running = {}
+    failures = {}
+
+    if scheduler is not None:
+        max_workers = min(scheduler.max_workers, num_tasks)
+        logger.info(('Running {} WindNinja tasks with up to {} workers '
+                     'for {} cores').format(
+                         num_tasks, max_workers, scheduler.total_cores))
+    else:
+        max_workers = num_workers
+        logger.info('Running {} WindNinja tasks with {} workers'.format(
+            num_tasks, num_workers))
+
+    with ProcessPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # a task is only taken from the iterator once a worker is free,
+        # so a queue behind the iterator is not drained early and the
+        # finished tasks are handled while waiting for the next one
+        next_task = None
+        exhausted = False
+
+        while not exhausted or next_task is not None or running:
+
+            # keep the pool full
+            while len(running) < max(1, max_workers):
+                if next_task is None:
+                    next_task = next(tasks, None)
+                    if next_task is None:
+                        exhausted = True
+                        break
+
+                label, (wn_cfg, wn_cfg_file) = next_task
+
+                if scheduler is not None:
+                    workers, threads = scheduler.allocate(
+                        num_tasks - num_submitted + len(running))
+                    free_cores = scheduler.total_cores - sum(
+                        [r[2] for r in running.values()])
+
+                    if len(running) >= workers or free_cores < 1:
+                        break
+
+                    wn_cfg = deepcopy(wn_cfg)
+                    wn_cfg['num_threads'] = min(threads, free_cores)
+
+                num_threads = wn_cfg.get('num_threads', 1)
+                logger.info('Submitting WindNinja for {} with {} '
+                            'threads'.format(label, num_threads))
+                future = executor.submit(
+                    run_wind_ninja, wn_cfg, wn_cfg_file, wn_options)
+                running[future] = (label, datetime.now(), num_threads)
+                num_submitted += 1
+
+                next_task = None
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                label, start_time, _ = running.pop(future)
+                telapsed = datetime.now() - start_time
+
+                try:
+                    future.result()
+                    logger.debug('WindNinja for {} took {} sec'.format(
+                        label, telapsed.total_seconds()))
+
+                    if on_complete is not None:
+                        on_complete(label, telapsed.total_seconds())
+
+                except Exception as e:
+                    logger.error('WindNinja for {} failed: {}'.format(
+                        label, e))
+                    failures[label] = e
+
+    return failures
+
+
+def check_failures(failures, num_tasks, logger):
+    """Report the failed tasks from `run_concurrent` and raise
+    an exception if there were any
+
+    Arguments:
+        failures {dict} -- dictionary of task label to exception
+        num_tasks {int} -- total number of tasks that were ran
+        logger {logger} -- logger instance
+
+    Raises:
+        Exception: if any of the tasks failed
+    """
+
+    if not failures:
+        return
+
+    for label, e in failures.items():
+        logger.error('{} failed with: {}'.format(label, e))
+
+    raise Exception('{} of {} WindNinja tasks failed: {}'.format(
+        len(failures), num_tasks,
+        '; '.join(['{} - {}'.format(label, e)
+                   for label, e in failures.items()])))
@@ -1,18 +1,28 @@
 import argparse
+import contextlib
+import json
 import logging
 import os
+import shutil
+import sys
+import time
+from collections import OrderedDict
 from datetime import datetime
 
 import coloredlogs
+import numpy as np
 import pytz
 from inicheck.config import UserConfig
 from inicheck.output import print_config_report
-from inicheck.tools import check_config, get_user_config
+from inicheck.tools import cast_all_variables, check_config, get_user_config
 
-from katana import utils
+from katana import execution, plan, utils
 from katana.data.nomads_hrrr import NomadsHRRR
 from katana.data.wrf_out import WRFout
+from katana.grib_crop_wgrib2 import create_new_grib
+from katana.supervisor import supervisor
 from katana.topo import Topo
+from katana.work_queue import WorkQueue
 
 
 def cli():
@@ -25,21 +35,78 @@ def cli():
     p = argparse.ArgumentParser(
         description='Run Katana, the WindNinja wrapper.')
 
-    p.add_argument('cfg', type=str,
-                   help='Path to config file')
+    p.add_argument('cfg', type=str, nargs='+',
+                   help=('Path to config file, multiple config files for '
+                         'different topo domains will share the HRRR crops '
+                         'and WindNinja workers'))
+
+    p.add_argument('--force-day', type=str, action='append', default=[],
+                   dest='force_days', metavar='YYYYMMDD',
+                   help=('Run the day again even if it completed in a '
+                         'previous run, can be given multiple times'))
+
+    p.add_argument('--worker', action='store_true',
+                   help=('Run as one of several workers that share the days '
+                         'through lock files in the out_location, workers '
+                         'can run on any node that sees the out_location'))
+
+    p.add_argument('--run-id', type=str, default=None,
+                   help=('Name shared by the workers of one run, such as the '
+                         'job id of a batch scheduler. Needed by --worker '
+                         'with --force-day or resume set to False'))
+
+    p.add_argument('--plan', type=str, default=None, metavar='FILE',
+                   help=('Do not run anything, write the planned tasks with '
+                         'the resolved HRRR files and a wall time estimate '
+                         'as JSON to FILE, use - for stdout'))
 
     args = p.parse_args()
 
+    force_days = [utils.parse_date(day).date() for day in args.force_days]
+
     # run the katana framework
-    with Katana(args.cfg) as k:
-        k.run_katana()
+    if args.plan == '-':
+        if len(args.cfg) != 1:
+            p.error('--plan - takes a single config file')
+
+        # stdout only has the plan, the config report goes to stderr
+        stdout = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            with Katana(args.cfg[0], force_days=force_days) as k:
+                k.plan(stream=stdout)
+
+    elif args.plan is not None:
+        for cfg in args.cfg:
+            with Katana(cfg, force_days=force_days) as k:
+                k.plan(args.plan)
+
+    elif args.worker:
+        if len(args.cfg) != 1:
+            p.error('--worker takes a single config file')
+
+        with Katana(args.cfg[0], force_days=force_days) as k:
+            k.run_worker(args.run_id)
+
+    elif len(args.cfg) == 1:
+        with Katana(args.cfg[0], force_days=force_days) as k:
+            k.run_katana()
+
+    else:
+        with KatanaBatch(args.cfg, force_days=force_days) as k:
+            k.run_katana()
 
 
 class Katana():
 
     DATE_FORMAT = '%Y%m%d'
 
-    def __init__(self, config):
+    # sections that do not have to be in the users config
+    OPTIONAL_SECTIONS = ['execution']
+
+    # work queue directory in the out_location for worker mode
+    QUEUE_DIRECTORY = 'katana_queue'
+
+    def __init__(self, config, force_days=None):
         """Katana class created to wrap all functionality needed to run
         WindNinja in the context of the USDA ARS snow-water supply
         modeling workflow
@@ -47,6 +114,10 @@ class Katana():
         Arguments:
             config {string} -- path to the config file or an
                                 inicheck UserConfig object
+
+        Keyword Arguments:
+            force_days {list} -- list of dates to run again even if
+                they have already completed (default: {None})
         """
 
         if isinstance(config, str):
@@ -72,6 +143,7 @@ class Katana():
                     UserConfig instance')
 
         self.config_file = self.ucfg.filename
+        self.add_optional_sections()
 
         warnings, errors = check_config(self.ucfg)
         print_config_report(warnings, errors)
@@ -102,8 +174,27 @@ class Katana():
         ################################################
         self.initialize_input_data()
 
+        self.force_days = force_days or []
+        if self.force_days:
+            self.input_data.manifest.force(self.force_days)
+
         self._logger.debug('Katana initialized')
 
+    def add_optional_sections(self):
+        """Add any optional sections missing from the users config so
+        that the defaults for the section are applied
+        """
+
+        missing = [section for section in self.OPTIONAL_SECTIONS
+                   if section not in self.ucfg.raw_cfg.keys()]
+
+        if len(missing) > 0:
+            for section in missing:
+                self.ucfg.raw_cfg[section] = OrderedDict()
+
+            self.ucfg.apply_recipes()
+            self.ucfg = cast_all_variables(self.ucfg, self.ucfg.mcfg)
+
     def parse_config(self):
         """Parse the config file variables for running katana
 
@@ -207,11 +298,194 @@ class Katana():
         Function to crop grib files, create WindNinja config, and run WindNinja
         """
 
-        # initialize the data in preparation for WindNinja simulation
-        self.input_data.initialize_data()
+        if self.config['output']['resume']:
+            self.input_data.skip_completed_days()
+
+        scheduler = self.input_data.scheduler
+        if scheduler is not None:
+            self._logger.info(
+                ('Core budget of {} cores, up to {} WindNinja runs at once '
+                 'with {} threads each').format(
+                     scheduler.total_cores,
+                     scheduler.max_workers,
+                     scheduler.max_threads))
+
+        if self.config['execution']['pipeline']:
+            # prepare the data and run WindNinja at the same time
+            self.input_data.run_pipeline()
 
-        # run WindNinja
-        self.input_data.run()
+        else:
+            # initialize the data in preparation for WindNinja simulation
+            self.input_data.initialize_data()
+
+            # run WindNinja
+            self.input_data.run()
+
+        self.run_time()
+        return True
+
+    def plan(self, plan_file=None, stream=None):
+        """Build the task graph for the run without running anything
+        and write it as JSON, see `katana.plan.build_plan`
+
+        Keyword Arguments:
+            plan_file {str} -- file to write the plan to or None to
+                print the plan (default: {None})
+            stream {file} -- where to print the plan without a
+                `plan_file`, defaults to stdout (default: {None})
+
+        Returns:
+            dict -- the plan
+        """
+
+        task_plan = plan.build_plan(self)
+        totals = task_plan['totals']
+
+        self._logger.info(
+            ('Plan: {} WindNinja runs for {} hours with {} workers, '
+             'estimated wall time {:.0f} sec').format(
+                 totals['wind_ninja_runs'], totals['hours'],
+                 task_plan['execution']['num_workers'],
+                 totals['estimated_wall_seconds']))
+
+        for day in task_plan['days']:
+            for hour in day.get('missing_hours', []):
+                self._logger.warning('No HRRR file for {}'.format(hour))
+
+        if plan_file is None:
+            print(json.dumps(task_plan, indent=2),
+                  file=stream or sys.stdout)
+        else:
+            with open(plan_file, 'w') as f:
+                json.dump(task_plan, f, indent=2)
+            self._logger.info('Plan written to {}'.format(plan_file))
+
+        return task_plan
+
+    def run_worker(self, run_id=None):
+        """Run as one of several workers that share the days through a
+        work queue of lock files in the output directory. The worker
+        claims a day, crops the grib files and runs WindNinja for it,
+        then looks for the next day. Days claimed by a worker that
+        stopped sending a heartbeat are taken over. The queue is kept
+        per config hash so a changed config starts a new queue.
+
+        The finished days of an earlier run are cleared from the queue
+        when `resume` is off and the forced days are cleared always. The
+        workers of a run share the `run_id` so only the first one to
+        start clears the days, a worker that starts later must not clear
+        a day that another worker already finished. The days that failed
+        in a run with another `run_id` are ran again.
+
+        A worker that finds its day was taken over by another worker
+        stops the wgrib2 and WindNinja processes of the day and leaves
+        the day to the new owner.
+
+        Keyword Arguments:
+            run_id {str} -- name shared by the workers of one run,
+                needed to clear the days and to run the failed days
+                again (default: {None})
+
+        Raises:
+            Exception: if any of the days failed
+        """
+
+        if self.data_type != 'hrrr':
+            raise Exception(
+                'Worker mode only supports HRRR, {} uses {}'.format(
+                    self.config_file, self.data_type))
+
+        resume = self.config['output']['resume']
+        if run_id is None and (not resume or self.force_days):
+            raise Exception(
+                'Worker mode needs a run id shared by the workers to run '
+                'forced days or with resume set to False')
+
+        input_data = self.input_data
+        if resume:
+            input_data.skip_completed_days()
+
+        def lost(task):
+            self._logger.warning(
+                'Day {} was taken over by another worker, stopping its '
+                'processes'.format(task))
+            supervisor.cancel_all()
+
+        work_queue = WorkQueue(
+            os.path.join(self.out_dir, self.QUEUE_DIRECTORY,
+                         input_data.manifest.config_hash[:16]),
+            heartbeat_timeout=self.config['execution'][
+                'queue_heartbeat_timeout'],
+            run_id=run_id, on_lost=lost)
+        poll_interval = self.config['execution']['queue_poll_interval']
+
+        tasks = OrderedDict([(day.strftime(self.DATE_FORMAT), day)
+                             for day in input_data.day_list])
+
+        reset_tasks = [day.strftime(self.DATE_FORMAT)
+                       for day in self.force_days]
+        if not resume:
+            reset_tasks = list(tasks)
+
+        self._logger.info('Worker {} starting with {} days'.format(
+            work_queue.worker_id, len(tasks)))
+
+        def reset():
+            for task in reset_tasks:
+                work_queue.reset(task)
+
+        with work_queue:
+            if reset_tasks:
+                work_queue.run_once('reset-{}'.format(run_id), reset,
+                                    poll_interval=poll_interval)
+
+            while True:
+                remaining = [task for task in tasks
+                             if not work_queue.is_finished(task)]
+                if len(remaining) == 0:
+                    break
+
+                claimed = False
+                for task in remaining:
+                    if not work_queue.claim(task):
+                        continue
+
+                    claimed = True
+                    day = tasks[task]
+                    try:
+                        input_data.crop_day(day)
+                        input_data.run_day(
+                            day, input_data.wind_ninja_cfg_file(day))
+
+                    except Exception as e:
+                        if task in work_queue.lost:
+                            continue
+                        self._logger.error('Day {} failed: {}'.format(
+                            day, e))
+                        work_queue.fail(task, str(e))
+
+                    else:
+                        if task in work_queue.lost or \
+                                not work_queue.owns(task):
+                            self._logger.warning(
+                                'Day {} finished after it was taken over, '
+                                'leaving it to the new owner'.format(day))
+                            work_queue.release(task)
+                            continue
+                        work_queue.complete(task)
+
+                if not claimed:
+                    self._logger.debug(
+                        'All remaining days are claimed, waiting')
+                    time.sleep(poll_interval)
+
+        failures = OrderedDict()
+        for task in tasks:
+            error = work_queue.failure(task)
+            if error is not None:
+                failures[task] = error
+
+        execution.check_failures(failures, len(tasks), self._logger)
 
         self.run_time()
         return True
@@ -229,3 +503,198 @@ class Katana():
         run_timing = datetime.now() - self.start_timing
         self._logger.info('Katana ran in: {}'.format(run_timing))
         self._logger.info('Katana closed --> {}'.format(datetime.now()))
+
+
+class KatanaBatch():
+    """Run Katana for multiple topo domains off the same HRRR archive.
+    Each HRRR hour is cropped once to the bounding box of all domains,
+    that crop is then cropped again for each domain and the WindNinja
+    days for all domains run on one shared worker pool.
+    """
+
+    SHARED_DIRECTORY = 'shared_hrrr'
+
+    def __init__(self, configs, force_days=None):
+        """Init the KatanaBatch class
+
+        Arguments:
+            configs {list} -- list of config file paths or inicheck
+                UserConfig objects, one for each domain
+
+        Keyword Arguments:
+            force_days {list} -- list of dates to run again even if
+                they have already completed (default: {None})
+        """
+
+        self.start_timing = datetime.now()
+
+        self.domains = [Katana(config, force_days=force_days)
+                        for config in configs]
+
+        self._logger = logging.getLogger(__name__)
+
+        self.check_domains()
+
+        # the first domain sets the batch options
+        first = self.domains[0]
+        self.config = first.config
+        self.shared_dir = os.path.join(first.out_dir, self.SHARED_DIRECTORY)
+
+        self._logger.debug('KatanaBatch initialized with {} domains'.format(
+            len(self.domains)))
+
+    def check_domains(self):
+        """Check that the domains can share the HRRR crops
+
+        Raises:
+            Exception: if the domains can't be ran together
+        """
+
+        first = self.domains[0]
+
+        for k in self.domains:
+            if k.data_type != 'hrrr':
+                raise Exception(
+                    'Batch mode only supports HRRR, {} uses {}'.format(
+                        k.config_file, k.data_type))
+
+            if os.path.abspath(k.config['input']['hrrr_directory']) != \
+                    os.path.abspath(first.config['input']['hrrr_directory']):
+                raise Exception(
+                    'All domains must use the same hrrr_directory')
+
+            if k.start_date != first.start_date or \
+                    k.end_date != first.end_date:
+                raise Exception(
+                    'All domains must have the same start and end date')
+
+        for option in ['out_location', 'wn_cfg']:
+            paths = [os.path.abspath(k.config['output'][option])
+                     for k in self.domains]
+            if len(set(paths)) != len(paths):
+                raise Exception(
+                    'Each domain must have its own output {}'.format(option))
+
+    def union_bounds(self):
+        """Lat/lon bounds that cover all the domains
+
+        Returns:
+            tuple -- west and east longitude, south and north latitude
+        """
+
+        bounds = np.array([k.input_data.latlon_bounds()
+                           for k in self.domains])
+
+        return (np.min(bounds[:, 0]), np.max(bounds[:, 1]),
+                np.min(bounds[:, 2]), np.max(bounds[:, 3]))
+
+    def crop_gribs(self):
+        """Crop the HRRR files once to the union of the domains, then
+        crop that for each domain
+        """
+
+        date_list = sorted(set(
+            [dt for k in self.domains for dt in k.input_data.date_list]))
+
+        if len(date_list) == 0 or \
+                not self.config['output']['make_new_gribs']:
+            for k in self.domains:
+                k.input_data.initialize_data()
+            return
+
+        self._logger.info('Cropping HRRR to the union of {} domains'.format(
+            len(self.domains)))
+
+        create_new_grib(
+            date_list,
+            self.config['input']['hrrr_directory'], self.shared_dir,
+            None, None, self._logger,
+            nthreads_w=self.config['input']['hrrr_num_wgrib_threads'],
+            bounds=self.union_bounds(),
+            packing=self.config['input']['hrrr_grib_packing'],
+            backend=self.config['input']['hrrr_crop_backend'],
+            archive=self.domains[0].input_data.archive,
+            cache=self.domains[0].input_data.crop_cache,
+            num_workers=self.config['execution']['max_wgrib2_processes'])
+
+        for k in self.domains:
+            self._logger.info('Cropping HRRR for {}'.format(k.config_file))
+            k.input_data.sub_crop_gribs(self.shared_dir)
+
+        shutil.rmtree(self.shared_dir)
+
+    def scheduler(self):
+        """Core scheduler for all the domains. The largest domain
+        sets the number of threads for each WindNinja run.
+
+        Returns:
+            CoreScheduler -- scheduler or None without a core budget
+        """
+
+        total_cores = self.config['execution']['total_cores']
+        if total_cores is None:
+            return None
+
+        mesh_cells = [execution.CoreScheduler.from_topo(
+            total_cores, k.topo.topo_stats,
+            k.config['wind_ninja']['mesh_resolution']).mesh_cells
+            for k in self.domains]
+
+        return execution.CoreScheduler(total_cores, np.max(mesh_cells))
+
+    def run_katana(self):
+        """Crop the grib files for all domains and run WindNinja for all
+        domains on one worker pool
+        """
+
+        if self.config['output']['resume']:
+            for k in self.domains:
+                k.input_data.skip_completed_days()
+
+        self.crop_gribs()
+
+        tasks = OrderedDict()
+        self.task_days = {}
+        for k in self.domains:
+            for day, task in k.input_data.wind_ninja_tasks().items():
+                label = '{} {}'.format(k.out_dir, day)
+                tasks[label] = task
+                self.task_days[label] = (k, day)
+
+        failures = execution.run_concurrent(
+            tasks,
+            self.config['execution']['num_workers'],
+            self._logger,
+            scheduler=self.scheduler(),
+            on_complete=self.record_day,
+            wn_options=self.domains[0].input_data.wn_options)
+        execution.check_failures(failures, len(tasks), self._logger)
+
+        self.run_time()
+        return True
+
+    def record_day(self, label, elapsed):
+        """Record a completed task in the domain, a day is recorded in
+        the domain's manifest when all of its tiles are done
+
+        Arguments:
+            label {str} -- task label
+            elapsed {float} -- seconds the task took to run
+        """
+
+        k, day = self.task_days[label]
+        k.input_data.task_complete(day, elapsed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        pass
+
+    def run_time(self):
+        """
+        Provide some logging info about when KatanaBatch was closed
+        """
+        run_timing = datetime.now() - self.start_timing
+        self._logger.info('KatanaBatch ran in: {}'.format(run_timing))
+        self._logger.info('KatanaBatch closed --> {}'.format(datetime.now()))
@@ -0,0 +1,258 @@
+import numpy as np
+
+# WGS84 constants for the inverse UTM projection, the same series as
+# `utm.to_latlon` evaluated on numpy arrays
+K0 = 0.9996
+E = 0.00669438
+E2 = E * E
+E3 = E2 * E
+E_P2 = E / (1.0 - E)
+R_WGS84 = 6378137
+
+SQRT_E = np.sqrt(1 - E)
+_E = (1 - SQRT_E) / (1 + SQRT_E)
+M1 = 1 - E / 4 - 3 * E2 / 64 - 5 * E3 / 256
+P2 = 3. / 2 * _E - 27. / 32 * _E**3 + 269. / 512 * _E**5
+P3 = 21. / 16 * _E**2 - 55. / 32 * _E**4
+P4 = 151. / 96 * _E**3 - 417. / 128 * _E**5
+P5 = 1097. / 512 * _E**4
+
+# OGC WKT of a WGS84 UTM zone, the same as GDAL writes for EPSG 326xx
+# and 327xx
+UTM_WKT = (
+    'PROJCS["WGS 84 / UTM zone {zone}{hemisphere}",'
+    'GEOGCS["WGS 84",DATUM["WGS_1984",'
+    'SPHEROID["WGS 84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],'
+    'AUTHORITY["EPSG","6326"]],'
+    'PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],'
+    'UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+    'AUTHORITY["EPSG","4326"]],'
+    'PROJECTION["Transverse_Mercator"],'
+    'PARAMETER["latitude_of_origin",0],'
+    'PARAMETER["central_meridian",{central_meridian}],'
+    'PARAMETER["scale_factor",0.9996],'
+    'PARAMETER["false_easting",500000],'
+    'PARAMETER["false_northing",{false_northing}],'
+    'UNIT["metre",1,AUTHORITY["EPSG","9001"]],'
+    'AXIS["Easting",EAST],AXIS["Northing",NORTH],'
+    'AUTHORITY["EPSG","{epsg}"]]'
+)
+
+# Lambert conformal grid of the HRRR CONUS files
+HRRR_GRID = {
+    'nx': 1799,
+    'ny': 1059,
+    'la1': 21.138123,
+    'lo1': 237.280472,
+    'lov': 262.5,
+    'latin': 38.5,
+    'dx': 3000.0,
+    'dy': 3000.0,
+    'radius': 6371229.0
+}
+
+
+def utm_to_latlon(easting, northing, zone_number, zone_letter='N'):
+    """Convert UTM coordinates to latitude and longitude for arrays
+    of points at once
+
+    Arguments:
+        easting {array} -- UTM easting in meters
+        northing {array} -- UTM northing in meters
+        zone_number {int} -- UTM zone number
+
+    Keyword Arguments:
+        zone_letter {str} -- UTM zone letter (default: {'N'})
+
+    Returns:
+        tuple -- arrays of latitude and longitude in degrees
+    """
+
+    x = np.asarray(easting, dtype=float) - 500000
+    y = np.asarray(northing, dtype=float)
+
+    if zone_letter.upper() < 'N':
+        y = y - 10000000
+
+    mu = y / K0 / (R_WGS84 * M1)
+    p_rad = mu + P2 * np.sin(2 * mu) + P3 * np.sin(4 * mu) + \
+        P4 * np.sin(6 * mu) + P5 * np.sin(8 * mu)
+
+    p_sin = np.sin(p_rad)
+    p_cos = np.cos(p_rad)
+    p_tan = p_sin / p_cos
+    p_tan2 = p_tan * p_tan
+    p_tan4 = p_tan2 * p_tan2
+
+    ep_sin = 1 - E * p_sin * p_sin
+    n = R_WGS84 / np.sqrt(ep_sin)
+    r = (1 - E) / ep_sin
+
+    c = _E * p_cos**2
+    c2 = c * c
+
+    d = x / (n * K0)
+    d2 = d * d
+    d4 = d2 * d2
+    d6 = d4 * d2
+
+    latitude = p_rad - (p_tan / r) * (
+        d2 / 2 -
+        d4 / 24 * (5 + 3 * p_tan2 + 10 * c - 4 * c2 - 9 * E_P2)) + \
+        d6 / 720 * (61 + 90 * p_tan2 + 298 * c + 45 * p_tan4 -
+                    252 * E_P2 - 3 * c2)
+
+    longitude = (d - d2 * d / 6 * (1 + 2 * p_tan2 + c) +
+                 d4 * d / 120 * (5 - 2 * c + 28 * p_tan2 - 3 * c2 +
+                                 8 * E_P2 + 24 * p_tan4)) / p_cos
+
+    central_longitude = (zone_number - 1) * 6 - 180 + 3
+
+    return np.degrees(latitude), np.degrees(longitude) + central_longitude
+
+
+def utm_wkt(zone_number, zone_letter='N'):
+    """WKT of the WGS84 projection of a UTM zone
+
+    Arguments:
+        zone_number {int} -- UTM zone number
+
+    Keyword Arguments:
+        zone_letter {str} -- UTM zone letter (default: {'N'})
+
+    Returns:
+        str -- WKT of the projection
+    """
+
+    zone_number = int(zone_number)
+    south = zone_letter.upper() < 'N'
+
+    return UTM_WKT.format(
+        zone=zone_number,
+        hemisphere='S' if south else 'N',
+        central_meridian=(zone_number - 1) * 6 - 180 + 3,
+        false_northing=10000000 if south else 0,
+        epsg=(32700 if south else 32600) + zone_number)
+
+
+def lcc_ij(lat, lon, grid=HRRR_GRID):
+    """Grid indices of latitude and longitude points on a Lambert
+    conformal grid with one standard parallel and a spherical earth
+
+    Arguments:
+        lat {array} -- latitude in degrees
+        lon {array} -- longitude in degrees
+
+    Keyword Arguments:
+        grid {dict} -- grid definition (default: {HRRR_GRID})
+
+    Returns:
+        tuple -- arrays of the fractional zero based i and j indices
+    """
+
+    latin = np.radians(grid['latin'])
+    n = np.sin(latin)
+    f = np.cos(latin) * np.tan(np.pi / 4 + latin / 2)**n / n
+    lov = np.radians(grid['lov'])
+
+    def project(lat, lon):
+        rho = grid['radius'] * f / \
+            np.tan(np.pi / 4 + np.radians(lat) / 2)**n
+        theta = n * (np.radians(np.mod(lon, 360)) - lov)
+        return rho * np.sin(theta), -rho * np.cos(theta)
+
+    x0, y0 = project(grid['la1'], grid['lo1'])
+    x, y = project(np.asarray(lat), np.asarray(lon))
+
+    return (x - x0) / grid['dx'], (y - y0) / grid['dy']
+
+
+class DomainGeometry():
+    """Geometry of the buffered topo domain, computed once for a run.
+    The whole boundary of the buffered domain is converted to lat/lon
+    so the lat/lon box covers the domain at any latitude, not only the
+    corners. The index window of the domain on a grid is cached so a
+    crop can extract it by index.
+    """
+
+    def __init__(self, x, y, zone_number, zone_letter='N', buff=6000):
+        """Init the DomainGeometry
+
+        Arguments:
+            x {array} -- UTM x coordinates of the domain
+            y {array} -- UTM y coordinates of the domain
+            zone_number {int} -- UTM zone number
+
+        Keyword Arguments:
+            zone_letter {str} -- UTM zone letter (default: {'N'})
+            buff {float} -- buffer in meters around the domain
+                (default: {6000})
+        """
+
+        self.zone_number = zone_number
+        self.zone_letter = zone_letter
+        self.buff = buff
+
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        # boundary of the buffered domain at the domain spacing
+        xb = np.unique(np.concatenate(
+            [[np.min(x) - buff, np.max(x) + buff], x]))
+        yb = np.unique(np.concatenate(
+            [[np.min(y) - buff, np.max(y) + buff], y]))
+
+        bx = np.concatenate([xb, xb, np.full(len(yb), xb[0]),
+                             np.full(len(yb), xb[-1])])
+        by = np.concatenate([np.full(len(xb), yb[0]),
+                             np.full(len(xb), yb[-1]), yb, yb])
+
+        self.lat, self.lon = utm_to_latlon(bx, by, zone_number, zone_letter)
+
+        self.latlon_bounds = (float(np.min(self.lon)),
+                              float(np.max(self.lon)),
+                              float(np.min(self.lat)),
+                              float(np.max(self.lat)))
+
+        self._windows = {}
+
+    @classmethod
+    def from_topo(cls, topo, buff=6000):
+        """Geometry of a topo domain
+
+        Arguments:
+            topo {Topo} -- katana.topo.Topo instance
+
+        Keyword Arguments:
+            buff {float} -- buffer in meters (default: {6000})
+
+        Returns:
+            DomainGeometry -- geometry of the domain
+        """
+
+        return cls(topo.x1, topo.y1, topo.zone_number,
+                   zone_letter=topo.zone_letter, buff=buff)
+
+    def ij_window(self, grid=HRRR_GRID):
+        """Index window of the buffered domain on a grid, in the one
+        based and inclusive form of wgrib2 -ijsmall_grib
+
+        Keyword Arguments:
+            grid {dict} -- grid definition (default: {HRRR_GRID})
+
+        Returns:
+            tuple -- first and last i and j index
+        """
+
+        key = tuple(sorted(grid.items()))
+        if key not in self._windows:
+            i, j = lcc_ij(self.lat, self.lon, grid)
+
+            i1 = int(np.clip(np.floor(np.min(i)), 0, grid['nx'] - 1))
+            i2 = int(np.clip(np.ceil(np.max(i)), 0, grid['nx'] - 1))
+            j1 = int(np.clip(np.floor(np.min(j)), 0, grid['ny'] - 1))
+            j2 = int(np.clip(np.ceil(np.max(j)), 0, grid['ny'] - 1))
+
+            self._windows[key] = (i1 + 1, i2 + 1, j1 + 1, j2 + 1)
+
+        return self._windows[key]
@@ -0,0 +1,240 @@
+"""
+Crop HRRR grib files in process with eccodes instead of wgrib2. Each
+file is read once, only the messages WindNinja needs are decoded and
+their values are subset to the index window that covers the domain.
+
+eccodes is an optional dependency, install it with
+`pip install katana[eccodes]`.
+"""
+
+import os
+
+import numpy as np
+
+try:
+    import eccodes
+except ImportError:
+    eccodes = None
+
+# grib messages that WindNinja needs from the HRRR files, the same
+# records as `grib_crop_wgrib2.WIND_NINJA_VARIABLES`. Each is the
+# discipline, category and number of the parameter with the type and
+# value of the level or None for any level.
+WIND_NINJA_MESSAGES = [
+    (0, 0, 0, 103, 2),      # TMP:2 m above ground
+    (0, 2, 2, 103, 10),     # UGRD:10 m above ground
+    (0, 2, 3, 103, 10),     # VGRD:10 m above ground
+    (0, 6, 1, None, None),  # TCDC
+]
+
+# eccodes packing types for the wgrib2 -set_grib_type names
+PACKING_TYPES = {
+    'simple': ('grid_simple', None),
+    'complex1': ('grid_complex', None),
+    'complex2': ('grid_complex_spatial_differencing', 1),
+    'complex3': ('grid_complex_spatial_differencing', 2),
+    'jpeg': ('grid_jpeg', None),
+    'ieee': ('grid_ieee', None),
+}
+
+# index windows for the grids that have been seen
+_windows = {}
+
+
+def eccodes_available():
+    """eccodes can be imported
+
+    Returns:
+        bool -- True if eccodes is installed
+    """
+
+    return eccodes is not None
+
+
+def is_wind_ninja_message(gid):
+    """Check if a grib message is one of `WIND_NINJA_MESSAGES`
+
+    Arguments:
+        gid {int} -- eccodes message handle
+
+    Returns:
+        bool -- True if WindNinja needs the message
+    """
+
+    key = (eccodes.codes_get(gid, 'discipline'),
+           eccodes.codes_get(gid, 'parameterCategory'),
+           eccodes.codes_get(gid, 'parameterNumber'))
+
+    for discipline, category, number, level_type, level in \
+            WIND_NINJA_MESSAGES:
+        if key != (discipline, category, number):
+            continue
+
+        if level_type is None:
+            return True
+
+        if eccodes.codes_get(gid, 'typeOfFirstFixedSurface') == level_type \
+                and eccodes.codes_get(gid, 'level') == level:
+            return True
+
+    return False
+
+
+def index_window(gid, bounds, window=None):
+    """Index window of the grid that covers the lat/lon bounds. The
+    window is cached by the grid definition as all HRRR files share it.
+
+    Arguments:
+        gid {int} -- eccodes message handle
+        bounds {tuple} -- tuple of lat/lon bounds from `latlon_bounds`
+
+    Keyword Arguments:
+        window {tuple} -- one based i/j window from
+            `DomainGeometry.ij_window` to use instead of searching
+            the bounds (default: {None})
+
+    Returns:
+        tuple -- first and last row and column of the window or None
+            if no grid points are in the bounds
+    """
+
+    key = (eccodes.codes_get(gid, 'md5Section3'), tuple(bounds), window)
+    if key in _windows:
+        return _windows[key]
+
+    nx = eccodes.codes_get(gid, 'Nx')
+    ny = eccodes.codes_get(gid, 'Ny')
+    lats = eccodes.codes_get_array(gid, 'latitudes').reshape(ny, nx)
+    lons = eccodes.codes_get_array(gid, 'longitudes').reshape(ny, nx)
+    lons = np.where(lons > 180, lons - 360, lons)
+
+    if window is None:
+        lonw, lone, lats_min, latn = bounds
+        inside = (lons >= lonw) & (lons <= lone) & \
+            (lats >= lats_min) & (lats <= latn)
+
+        rows = np.flatnonzero(inside.any(axis=1))
+        cols = np.flatnonzero(inside.any(axis=0))
+    else:
+        i1, i2, j1, j2 = window
+        rows = np.arange(j1 - 1, min(j2, ny))
+        cols = np.arange(i1 - 1, min(i2, nx))
+
+    window = None
+    if len(rows) > 0 and len(cols) > 0:
+        window = (int(rows[0]), int(rows[-1]), int(cols[0]), int(cols[-1]),
+                  float(lats[rows[0], cols[0]]),
+                  float(lons[rows[0], cols[0]]) % 360)
+
+    _windows[key] = window
+    return window
+
+
+def subset_message(gid, window, packing='same'):
+    """Create a new message with the values in the index window
+
+    Arguments:
+        gid {int} -- eccodes message handle
+        window {tuple} -- index window from `index_window`
+
+    Keyword Arguments:
+        packing {str} -- wgrib2 name of the packing (default: {'same'})
+
+    Returns:
+        int -- handle of the new message
+    """
+
+    j0, j1, i0, i1, lat0, lon0 = window
+
+    nx = eccodes.codes_get(gid, 'Nx')
+    ny = eccodes.codes_get(gid, 'Ny')
+    values = eccodes.codes_get_values(gid).reshape(ny, nx)
+    values = values[j0:j1 + 1, i0:i1 + 1]
+
+    clone = eccodes.codes_clone(gid)
+    eccodes.codes_set(clone, 'Nx', values.shape[1])
+    eccodes.codes_set(clone, 'Ny', values.shape[0])
+    eccodes.codes_set(clone, 'latitudeOfFirstGridPointInDegrees', lat0)
+    eccodes.codes_set(clone, 'longitudeOfFirstGridPointInDegrees', lon0)
+
+    if packing != 'same':
+        packing_type, order = PACKING_TYPES[packing]
+        eccodes.codes_set(clone, 'packingType', packing_type)
+        if order is not None:
+            eccodes.codes_set(clone, 'orderOfSpatialDifferencing', order)
+
+    eccodes.codes_set_values(clone, values.ravel())
+
+    return clone
+
+
+def crop_grib(fp_in, fp_out, bounds, logger, nthreads_w=1, packing='same',
+              window=None):
+    """Crop a HRRR grib file to the variables WindNinja needs and the
+    lat/lon bounds with eccodes. Has the same interface as
+    `grib_crop_wgrib2.crop_grib`.
+
+    Args:
+        fp_in:      grib file path
+        fp_out:     cropped grib file path
+        bounds:     tuple of lat/lon bounds from `latlon_bounds`
+        logger:     instance of logger
+        nthreads_w: not used, for the same interface as wgrib2
+        packing:    GRIB2 packing of the output
+        window:     i/j index window from `DomainGeometry.ij_window`,
+                    crops by index instead of the lat/lon bounds
+
+    Returns:
+        True if the crop was succesful
+    """
+
+    if eccodes is None:
+        raise ImportError(
+            'The eccodes crop backend requires the eccodes package')
+
+    if not os.path.isfile(fp_in):
+        logger.debug('{} does not exist'.format(fp_in))
+        return False
+
+    tmp_grib = '{}.tmp'.format(fp_out)
+    num_messages = 0
+
+    try:
+        with open(fp_in, 'rb') as f_in, open(tmp_grib, 'wb') as f_out:
+            while True:
+                gid = eccodes.codes_grib_new_from_file(f_in)
+                if gid is None:
+                    break
+
+                try:
+                    if not is_wind_ninja_message(gid):
+                        continue
+
+                    subset = index_window(gid, bounds, window)
+                    if subset is None:
+                        raise ValueError(
+                            'No grid points within the domain bounds')
+
+                    clone = subset_message(gid, subset, packing)
+                    try:
+                        eccodes.codes_write(clone, f_out)
+                    finally:
+                        eccodes.codes_release(clone)
+
+                    num_messages += 1
+
+                finally:
+                    eccodes.codes_release(gid)
+
+        if num_messages != len(WIND_NINJA_MESSAGES):
+            raise ValueError('Found {} of the {} messages'.format(
+                num_messages, len(WIND_NINJA_MESSAGES)))
+
+    except Exception as e:
+        logger.warning('Could not crop {} with eccodes: {}'.format(fp_in, e))
+        if os.path.isfile(tmp_grib):
+            os.remove(tmp_grib)
+        return False
+
+    os.replace(tmp_grib, fp_out)
+    return True
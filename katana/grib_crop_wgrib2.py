@@ -1,15 +1,23 @@
 import datetime
 import glob
 import os
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 import dateparser
-import numpy as np
-import utm
+from katana import grib_crop_eccodes
+from katana.crop_inventory import CropInventory, grib_record_count
+from katana.geometry import DomainGeometry
+from katana.grib_index import extract_records, record_ranges
+from katana.hrrr_archive import HRRRArchive
+from katana.supervisor import supervisor
 
 fmt1 = '%Y%m%d'
 fmt2 = '%H'
 
+# grib records that WindNinja needs from the HRRR files
+WIND_NINJA_VARIABLES = 'TMP:2 m|UGRD:10 m|VGRD:10 m|TCDC:'
+WIND_NINJA_RECORDS = len(WIND_NINJA_VARIABLES.split('|'))
+
 
 def wind_ninja_output_dir(out_dir, file_datetime):
     """Create the wind ninja output directory for HRRR files
@@ -27,147 +35,226 @@ def wind_ninja_output_dir(out_dir, file_datetime):
                         'hrrr.{}'.format(file_datetime.strftime(fmt1)))
 
 
-def call_wgrib2(action, logger):
+def call_wgrib2(action, logger, input_files=None):
     """Execute a wgrib2 command
 
     Arguments:
-        action {str} -- command for wgrib2 to execute
+        action {list} -- wgrib2 arguments, starting with `wgrib2`
         logger {logger} -- logger instance
 
+    Keyword Arguments:
+        input_files {list} -- files streamed to wgrib2 when the input
+            file is `-`, see `ProcessSupervisor.submit` (default: {None})
+
     Returns:
-        Boolean -- True if call succeeds
+        int -- return code of wgrib2, 0 if the call succeeds
     """
 
-    # run command line using Popen
-    logger.debug('Running "{}"'.format(action))
-
-    with subprocess.Popen(
-        action,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True
-    ) as s:
-
-        # stream the output of WindNinja to the logger
-        return_code = s.wait()
-        if return_code:
-            for line in s.stdout:
-                logger.warning(line.rstrip())
-            logger.warning("An error occured while running wgrib2 action")
-        else:
-            for line in s.stdout:
-                logger.debug(line.rstrip())
+    # run wgrib2 through the process supervisor, the output is
+    # streamed to the debug log
+    return_code, output = supervisor.run(
+        action, logger, input_files=input_files)
 
-        return return_code
+    if return_code:
+        for line in output:
+            logger.warning(line)
+        logger.warning("An error occured while running wgrib2 action")
 
+    return return_code
 
-def grib_to_small_grib(fp_in, out_dir, file_dt, x, y, logger,
-                       buff=6000, zone_letter='N', zone_number=11,
-                       nthreads_w=1):
-    """
-    Function to write 4 bands from grib2 to cropped grib2
+
+def latlon_bounds(x, y, buff=6000, zone_letter='N', zone_number=11):
+    """Find the lat/lon bounds of a UTM domain with a buffer. The whole
+    boundary of the buffered domain is converted, see `DomainGeometry`
 
     Args:
-            fp_in: grib file path
-            out_dir: output directory to write hrrr data
-            file_dt: time stamp of file
-            x: x coords in utm of new domain
-            y: y coords in utm of new domain
-            logger: instance of logger
+            x: x coords in utm of the domain
+            y: y coords in utm of the domain
             buff: buffer in meters for buffering domain
             zone_letter: UTM zone letter (N)
             zone_number: UTM zone number
-            nthreads_w:  number of threads for wgrib2 commands
 
     Returns:
-            not fatl:   True if the run was succesful
-            tmp_grib:   File pointer to temporary grib file
-            fp_out:     File pointer to final grib file
-
+            tuple of the west and east longitude, south and north latitude
     """
-    # date format for files
-    # fmt = '%Y%m%d-%H-%M'
-    dir1 = wind_ninja_output_dir(out_dir, file_dt)
 
-    # make file names
-    tmp_grib = os.path.join(dir1, 'tmp.grib2')
-    fp_out = os.path.join(dir1,
-                          'hrrr.t{}z.wrfsfcf00.grib2'.format(
-                              file_dt.strftime(fmt2)))
+    return DomainGeometry(x, y, zone_number, zone_letter=zone_letter,
+                          buff=buff).latlon_bounds
 
-    # create directory if needed
-    if not os.path.isdir(dir1):
-        os.makedirs(dir1)
-
-    # find bounds (to_latlon returns (LATITUDE, LONGITUDE).)
-    ur = np.array(utm.to_latlon(np.max(x)+buff, np.max(y) +
-                                buff, zone_number, zone_letter))
-    ll = np.array(utm.to_latlon(np.min(x)-buff, np.min(y) -
-                                buff, zone_number, zone_letter))
-    # get latlon bounds
-    lats = ll[0]
-    latn = ur[0]
-    lonw = ll[1]
-    lone = ur[1]
+
+def small_grib(fp_in, fp_out, bounds, logger, nthreads_w=1):
+    """Crop a grib file to the lat/lon bounds
+
+    Args:
+        fp_in:      grib file path
+        fp_out:     cropped grib file path
+        bounds:     tuple of lat/lon bounds from `latlon_bounds`
+        logger:     instance of logger
+        nthreads_w: number of threads for wgrib2 commands
+
+    Returns:
+        True if the crop was succesful
+    """
+
+    lonw, lone, lats, latn = bounds
 
     # call to crop grid
-    action = 'wgrib2 {} -ncpu {} -small_grib {}:{} {}:{} {}'.format(
-        fp_in, nthreads_w,
-        lonw, lone,
-        lats, latn, tmp_grib)
+    action = ['wgrib2', fp_in, '-ncpu', nthreads_w,
+              '-small_grib', '{}:{}'.format(lonw, lone),
+              '{}:{}'.format(lats, latn), fp_out]
+
+    return not call_wgrib2(action, logger)
 
-    # # run commands
-    # logger.debug('Running command "{}"'.format(action))
-    # s = Popen(action, shell=True, stdout=PIPE, stderr=PIPE)
+
+def crop_grib(fp_in, fp_out, bounds, logger, nthreads_w=1, packing='same',
+              window=None):
+    """Crop a HRRR grib file to the variables WindNinja needs and the
+    lat/lon bounds in a single wgrib2 pass. The records are matched
+    first so only those are cropped and no intermediate file is written.
+
+    Args:
+        fp_in:      grib file path
+        fp_out:     cropped grib file path
+        bounds:     tuple of lat/lon bounds from `latlon_bounds`
+        logger:     instance of logger
+        nthreads_w: number of threads for wgrib2 commands
+        packing:    GRIB2 packing of the output, see wgrib2
+                    -set_grib_type
+        window:     i/j index window from `DomainGeometry.ij_window`,
+                    crops by index instead of the lat/lon bounds
+
+    Returns:
+        True if the crop was succesful
+    """
+
+    # wgrib2 writes to a temporary file for this output so a partial
+    # file never has the final name
+    tmp_grib = '{}.tmp'.format(fp_out)
+
+    action = ['wgrib2', fp_in, '-ncpu', nthreads_w,
+              '-match', WIND_NINJA_VARIABLES,
+              '-set_grib_type', packing] + \
+        crop_options(bounds, window) + [tmp_grib]
 
     fatl = call_wgrib2(action, logger)
 
-    # trying to find better grib file
     if fatl:
-        os.remove(tmp_grib)
-        logger.warning(
-            'Creating small grib did not work, trying a forecast hour')
+        # remove anything left from the failed crop
+        if os.path.isfile(tmp_grib):
+            os.remove(tmp_grib)
+    else:
+        os.replace(tmp_grib, fp_out)
 
-    return not fatl, tmp_grib, fp_out
+    return not fatl
 
 
-def sgrib_variable_crop(tmp_grib, nthreads_w, fp_out, logger):
-    """
-    Take the small grib file from grib_to_small_grib and cut it down
-    to the variables we need
+def crop_options(bounds, window=None):
+    """wgrib2 options to crop to the lat/lon bounds or the index window
 
     Args:
-        tmp_grib:   File path to small grib2 file
-        nthreads_w: Number of threads for running wgrib2 commands
-        fp_out:     Path for outputting final grib2 file
+        bounds:     tuple of lat/lon bounds from `latlon_bounds`
+        window:     i/j index window from `DomainGeometry.ij_window`
 
     Returns:
+        list of wgrib2 options without the output file
+    """
+
+    if window is None:
+        lonw, lone, lats, latn = bounds
+        return ['-small_grib', '{}:{}'.format(lonw, lone),
+                '{}:{}'.format(lats, latn)]
 
+    return ['-ijsmall_grib', '{}:{}'.format(*window[0:2]),
+            '{}:{}'.format(*window[2:4])]
+
+
+def hour_match(dt, fx_hr):
+    """wgrib2 regular expression for the records of the HRRR file of
+    an hour from a forecast hour
+
+    Args:
+        dt:         datetime that the file is used for
+        fx_hr:      forecast hour
+
+    Returns:
+        regular expression for the inventory lines
     """
 
-    # call to grab correct variables
-    action2 = "wgrib2 {} -ncpu {} -match \
-        'TMP:2 m|UGRD:10 m|VGRD:10 m|TCDC:' -GRIB {}"
-    action2 = action2.format(tmp_grib,
-                             nthreads_w,
-                             fp_out)
+    cycle = datetime.datetime(dt.year, dt.month, dt.day, dt.hour) - \
+        datetime.timedelta(hours=fx_hr)
+    forecast = 'anl' if fx_hr == 0 else '{} hour fcst'.format(fx_hr)
 
-    fatl = call_wgrib2(action2, logger)
+    return ':d={}:[^:]*:[^:]*:{}:'.format(
+        cycle.strftime('%Y%m%d%H'), forecast)
 
-    if fatl:
-        logger.warning(
-            'Cutting variables from grib did not work')
 
-    os.remove(tmp_grib)
+def batch_crop(hours, bounds, logger, nthreads_w=1, packing='same',
+               window=None, byte_ranges=False):
+    """
+    Crop the HRRR files for many hours with a single wgrib2 process.
+    The files are streamed one after the other to wgrib2 and an `-if`
+    block for each hour writes its records to the cropped file.
 
-    return not fatl
+    Args:
+        hours:          list of datetime, forecast hour, HRRR file and
+                        cropped file tuples
+        bounds:         tuple of lat/lon bounds from `latlon_bounds`
+        logger:         Instance of logger
+        nthreads_w:     number of threads for wgrib2 commands
+        packing:        GRIB2 packing of the cropped files
+        window:         i/j index window on the HRRR grid to crop by
+                        index instead of the lat/lon bounds
+        byte_ranges:    stream only the needed records of the HRRR
+                        files using their `.idx` inventories
+
+    Returns:
+        list of the hours that were cropped
+    """
+
+    if len(hours) == 0:
+        return []
+
+    action = ['wgrib2', '-', '-ncpu', nthreads_w,
+              '-match', WIND_NINJA_VARIABLES,
+              '-set_grib_type', packing]
+    input_files = []
+
+    for dt, fx_hr, fp, fp_out in hours:
+        action += ['-if', hour_match(dt, fx_hr)] + \
+            crop_options(bounds, window) + \
+            ['{}.tmp'.format(fp_out), '-endif']
+
+        ranges = None
+        if byte_ranges:
+            ranges = record_ranges(fp, WIND_NINJA_VARIABLES, logger)
+        input_files.append(fp if ranges is None else (fp, ranges))
+
+    logger.info('Cropping {} hours with one wgrib2 process'.format(
+        len(hours)))
+    fatl = call_wgrib2(action, logger, input_files=input_files)
+
+    cropped = []
+    for hour in hours:
+        tmp_grib = '{}.tmp'.format(hour[3])
+        if not os.path.isfile(tmp_grib):
+            continue
+
+        if not fatl and grib_record_count(tmp_grib) == WIND_NINJA_RECORDS:
+            os.replace(tmp_grib, hour[3])
+            cropped.append(hour)
+        else:
+            os.remove(tmp_grib)
+
+    return cropped
 
 
 def create_new_grib(date_list, directory, out_dir,
                     x1, y1, logger,
                     zone_letter='N', zone_number=11, buff=6000,
-                    nthreads_w=1, make_new_gribs=True):
+                    nthreads_w=1, make_new_gribs=True, bounds=None,
+                    packing='same', num_workers=1, backend='wgrib2',
+                    archive=None, cache=None, incremental=False,
+                    window=None, byte_ranges=False, batch=False):
     """
     Function to iterate through the dates and create new, cropped grib files
     needed to run WindNinja
@@ -187,6 +274,22 @@ def create_new_grib(date_list, directory, out_dir,
         nthreads_w:     number of threads for wgrib2 commands
         make_new_gribs: actually make the new gribs or just count
                         how many we would make
+        bounds:         tuple of lat/lon bounds from `latlon_bounds`,
+                        if provided x1, y1, buff and zone are not used
+        packing:        GRIB2 packing of the cropped files
+        num_workers:    number of hours to crop at the same time
+        backend:        crop with `wgrib2` or in process with `eccodes`
+        archive:        `HRRRArchive` index of the directory, one is
+                        created if not provided
+        cache:          `CropCache` to reuse crops from other runs
+        incremental:    keep the cropped files that are still current
+                        and only crop the missing or stale hours
+        window:         i/j index window on the HRRR grid to crop by
+                        index instead of the lat/lon bounds
+        byte_ranges:    read only the needed records of the HRRR files
+                        using their `.idx` inventories
+        batch:          crop all the hours of a day with a single
+                        wgrib2 process
 
     Returns:
         date_list:      list of datetime days that are converted
@@ -196,10 +299,12 @@ def create_new_grib(date_list, directory, out_dir,
         outputs new hrrr grib2 files in out_dir
     """
 
-    fx_start_hour = 0
-
     logger.info('Creating new gribs for topo domain')
 
+    if bounds is None:
+        bounds = latlon_bounds(x1, y1, buff=buff, zone_letter=zone_letter,
+                               zone_number=zone_number)
+
     # create a datelist dict to hold the files
     out_files = {}
     for dt in date_list:
@@ -209,40 +314,57 @@ def create_new_grib(date_list, directory, out_dir,
     # option to cut down on already completed work
     if make_new_gribs:
 
-        # loop through dates
-        for idt, dt in enumerate(date_list):
-            logger.info('Working on grib file for {}'.format(dt))
-
-            # try different forecast hours to get a working file
-            for fx_hr in range(fx_start_hour, fx_start_hour+8):
-                fp = hrrr_file_name_finder(directory, dt, fx_hr)
-
-                # convert grib to smaller gribs with only the needed
-                # variables for WindNinjaS
-                sgrib, tmp_grib, fp_out = grib_to_small_grib(
-                    fp,
-                    out_dir,
-                    dt,
-                    x1, y1,
-                    logger,
-                    buff=buff,
-                    zone_letter=zone_letter,
-                    zone_number=zone_number,
-                    nthreads_w=nthreads_w)
-
-                # proceed and break when we get a good file
-                if sgrib:
-                    # grab just the variables we need
-                    status = sgrib_variable_crop(tmp_grib, nthreads_w,
-                                                 fp_out, logger)
-                    if status:
-                        out_files[dt.date()] += 1
-                        break
-
-                # kill job if we didn't find a good file
-                if fx_hr == 6:
-                    raise IOError('No good grib file for {}'.format(
-                        dt.strftime('%Y-%m-%d %H')))
+        if archive is None:
+            archive = HRRRArchive(directory)
+
+        # report every hour without a HRRR file before cropping any
+        missing = archive.missing_hours(date_list)
+        if len(missing) > 0:
+            hours = [dt.strftime('%Y-%m-%d %H') for dt in missing]
+            logger.error('No HRRR files in {} for {}'.format(
+                directory, ', '.join(hours)))
+            raise IOError('No good grib file for {}'.format(
+                ', '.join(hours)))
+
+        inventory = CropInventory()
+
+        # crop the hours on a pool of workers, each hour keeps
+        # trying forecast hours until it gets a good file
+        executor = ThreadPoolExecutor(max_workers=max(1, num_workers))
+        options = dict(nthreads_w=nthreads_w, packing=packing,
+                       archive=archive, cache=cache, inventory=inventory,
+                       incremental=incremental, window=window,
+                       byte_ranges=byte_ranges)
+
+        # the eccodes backend crops in process and gains nothing from
+        # batching the hours of a day
+        if batch and backend == 'wgrib2':
+            days = {}
+            for dt in date_list:
+                days.setdefault(dt.date(), []).append(dt)
+
+            futures = [(hours[0], len(hours), executor.submit(
+                crop_day, hours, directory, out_dir, bounds, logger,
+                **options)) for hours in days.values()]
+        else:
+            futures = [(dt, 1, executor.submit(
+                crop_hour, dt, directory, out_dir, bounds, logger,
+                backend=backend, **options)) for dt in date_list]
+
+        try:
+            for dt, num_hours, future in futures:
+                future.result()
+                out_files[dt.date()] += num_hours
+
+        except BaseException:
+            # cancel the crops that have not started, cancel_futures
+            # needs Python 3.9
+            for _, _, future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            raise
+
+        executor.shutdown()
 
     else:
         logger.info(("Make new gribs set to False,"
@@ -256,6 +378,301 @@ def create_new_grib(date_list, directory, out_dir,
     return out_files
 
 
+def crop_day(date_list, directory, out_dir, bounds, logger,
+             nthreads_w=1, packing='same', archive=None, cache=None,
+             inventory=None, incremental=False, window=None,
+             byte_ranges=False):
+    """
+    Crop the HRRR files for the hours of a day with a single wgrib2
+    process. The batch uses the first file in the archive for each
+    hour, the hours that are current or in the cache are not part of
+    the batch. Every hour is then finished by `crop_hour`, which keeps
+    the batch crops and tries the other forecast hours for any hour
+    the batch could not crop.
+
+    Args:
+        date_list:      list of datetime hours of the day
+        directory:      directory storing the individual day
+                        directories for hrrr files
+        out_dir:        output directory for new hrrr files
+        bounds:         tuple of lat/lon bounds from `latlon_bounds`
+        logger:         Instance of logger
+        nthreads_w:     number of threads for wgrib2 commands
+        packing:        GRIB2 packing of the cropped files
+        archive:        `HRRRArchive` index of the directory, one is
+                        created if not provided
+        cache:          `CropCache` to reuse crops from other runs
+        inventory:      `CropInventory` to record the crops in, one is
+                        created if not provided
+        incremental:    keep the cropped files that are still current
+        window:         i/j index window on the HRRR grid to crop by
+                        index instead of the lat/lon bounds
+        byte_ranges:    stream only the needed records of the HRRR
+                        files using their `.idx` inventories
+
+    Returns:
+        list of the paths to the cropped files
+    """
+
+    if archive is None:
+        archive = HRRRArchive(directory)
+
+    if inventory is None:
+        inventory = CropInventory()
+
+    hours = []
+    for dt in date_list:
+        candidates = archive.candidates(dt)
+        if len(candidates) == 0:
+            continue
+
+        fx_hr, fp = candidates[0]
+        fp_out = hour_file(out_dir, dt)
+
+        source = inventory.source(fp, bounds, packing=packing,
+                                  window=window)
+        if incremental and inventory.is_current(fp_out, source):
+            continue
+
+        if cache is not None and os.path.isfile(cache.path(cache.key(
+                fp, bounds, WIND_NINJA_VARIABLES, packing=packing,
+                window=window))):
+            continue
+
+        hours.append((dt, fx_hr, fp, fp_out))
+
+    for dt, fx_hr, fp, fp_out in batch_crop(
+            hours, bounds, logger, nthreads_w=nthreads_w, packing=packing,
+            window=window, byte_ranges=byte_ranges):
+
+        if cache is not None:
+            cache.store(cache.key(fp, bounds, WIND_NINJA_VARIABLES,
+                                  packing=packing, window=window), fp_out)
+
+        inventory.record(fp_out, inventory.source(
+            fp, bounds, packing=packing, window=window))
+
+    # the batch crops are current in the inventory and are kept
+    return [crop_hour(dt, directory, out_dir, bounds, logger,
+                      nthreads_w=nthreads_w, packing=packing,
+                      archive=archive, cache=cache, inventory=inventory,
+                      incremental=True, window=window,
+                      byte_ranges=byte_ranges) for dt in date_list]
+
+
+def hour_file(out_dir, dt):
+    """Path of the cropped file for an hour, the day directory is
+    created if needed
+
+    Args:
+        out_dir:        output directory for new hrrr files
+        dt:             datetime of the hour
+
+    Returns:
+        path to the cropped file
+    """
+
+    dir1 = wind_ninja_output_dir(out_dir, dt)
+    if not os.path.isdir(dir1):
+        os.makedirs(dir1, exist_ok=True)
+
+    return os.path.join(
+        dir1, 'hrrr.t{}z.wrfsfcf00.grib2'.format(dt.strftime(fmt2)))
+
+
+def crop_hour(dt, directory, out_dir, bounds, logger,
+              nthreads_w=1, packing='same', backend='wgrib2',
+              archive=None, cache=None, inventory=None, incremental=False,
+              window=None, byte_ranges=False):
+    """
+    Crop the HRRR file for a single hour, trying the files in the
+    archive for the forecast hours in order until one can be cropped
+
+    Args:
+        dt:             datetime of the hour
+        directory:      directory storing the individual day
+                        directories for hrrr files
+        out_dir:        output directory for new hrrr files
+        bounds:         tuple of lat/lon bounds from `latlon_bounds`
+        logger:         Instance of logger
+        nthreads_w:     number of threads for wgrib2 commands
+        packing:        GRIB2 packing of the cropped file
+        backend:        crop with `wgrib2` or in process with `eccodes`
+        archive:        `HRRRArchive` index of the directory, one is
+                        created if not provided
+        cache:          `CropCache` to reuse crops from other runs
+        inventory:      `CropInventory` to record the crop in
+        incremental:    keep the cropped file if the inventory shows
+                        it is current
+        window:         i/j index window on the HRRR grid to crop by
+                        index instead of the lat/lon bounds
+        byte_ranges:    read only the needed records of the HRRR file
+                        using its `.idx` inventory
+
+    Returns:
+        fp_out:         path to the cropped file
+    """
+
+    logger.info('Working on grib file for {}'.format(dt))
+
+    fp_out = hour_file(out_dir, dt)
+
+    crop = crop_function(backend)
+
+    if archive is None:
+        archive = HRRRArchive(directory)
+
+    candidates = archive.candidates(dt)
+
+    # keep the crop if it was made from the file that would be used
+    if incremental and inventory is not None and len(candidates) > 0:
+        source = inventory.source(candidates[0][1], bounds,
+                                  packing=packing, backend=backend,
+                                  window=window)
+        if inventory.is_current(fp_out, source):
+            logger.debug('Keeping the current crop {}'.format(fp_out))
+            return fp_out
+
+    # try the files for the forecast hours to get a working file
+    for fx_hr, fp in candidates:
+
+        cropped = False
+        if cache is not None:
+            key = cache.key(fp, bounds, WIND_NINJA_VARIABLES,
+                            packing=packing, backend=backend,
+                            window=window)
+            cropped = cache.fetch(key, fp_out)
+
+        # crop to the domain and the needed variables for
+        # WindNinja, proceed and break when we get a good file
+        if not cropped:
+            cropped = crop_source(crop, fp, fp_out, bounds, logger,
+                                  byte_ranges=byte_ranges,
+                                  nthreads_w=nthreads_w, packing=packing,
+                                  window=window)
+            if cropped and cache is not None:
+                cache.store(key, fp_out)
+
+        if cropped:
+            if inventory is not None:
+                inventory.record(fp_out, inventory.source(
+                    fp, bounds, packing=packing, backend=backend,
+                    window=window))
+            return fp_out
+
+        logger.warning(
+            'Creating small grib did not work, trying a forecast hour')
+
+    # kill job if we didn't find a good file
+    raise IOError('No good grib file for {}'.format(
+        dt.strftime('%Y-%m-%d %H')))
+
+
+def crop_source(crop, fp, fp_out, bounds, logger, byte_ranges=False,
+                **kwargs):
+    """
+    Crop a HRRR file, optionally from only the byte ranges of the
+    needed records. The records are copied to a small temporary file
+    next to the output so the whole HRRR file is never read.
+
+    Args:
+        crop:           crop function from `crop_function`
+        fp:             HRRR file
+        fp_out:         cropped file path
+        bounds:         tuple of lat/lon bounds from `latlon_bounds`
+        logger:         Instance of logger
+        byte_ranges:    read only the records from the `.idx`
+                        inventory, the whole file is used if there
+                        is no usable inventory
+        kwargs:         passed to the crop function
+
+    Returns:
+        True if the crop was succesful
+    """
+
+    if not byte_ranges:
+        return crop(fp, fp_out, bounds, logger, **kwargs)
+
+    fp_src = '{}.src'.format(fp_out)
+    if not extract_records(fp, fp_src, WIND_NINJA_VARIABLES, logger):
+        return crop(fp, fp_out, bounds, logger, **kwargs)
+
+    try:
+        return crop(fp_src, fp_out, bounds, logger, **kwargs)
+    finally:
+        os.remove(fp_src)
+
+
+def crop_function(backend):
+    """Crop function for a backend, both have the interface of
+    `crop_grib`
+
+    Args:
+        backend:    `wgrib2` or `eccodes`
+
+    Returns:
+        function to crop a HRRR file
+    """
+
+    if backend == 'eccodes':
+        if not grib_crop_eccodes.eccodes_available():
+            raise ImportError(
+                'The eccodes crop backend requires the eccodes package')
+        return grib_crop_eccodes.crop_grib
+
+    return crop_grib
+
+
+def sub_crop_grib(date_list, in_dir, out_dir, bounds, logger, nthreads_w=1,
+                  backend='wgrib2'):
+    """
+    Crop grib files that were already cropped by `create_new_grib` to a
+    larger domain down to a smaller domain inside of it. Used when
+    multiple domains share one crop of the HRRR files.
+
+    Args:
+        date_list:      list of datetimes to crop
+        in_dir:         output directory of `create_new_grib` for
+                        the larger domain
+        out_dir:        output directory for the smaller domain
+        bounds:         tuple of lat/lon bounds from `latlon_bounds`
+        logger:         Instance of logger
+        nthreads_w:     number of threads for wgrib2 commands
+        backend:        crop with `wgrib2` or in process with `eccodes`
+
+    Returns:
+        num_list:       number of run hours per day
+    """
+
+    # the cropped files only have the WindNinja variables so the
+    # eccodes crop can be used directly
+    if backend == 'eccodes':
+        crop = crop_function(backend)
+    else:
+        crop = small_grib
+
+    out_files = {}
+    for dt in date_list:
+        if dt.date() not in out_files.keys():
+            out_files[dt.date()] = 0
+
+    for dt in date_list:
+        file_name = 'hrrr.t{}z.wrfsfcf00.grib2'.format(dt.strftime(fmt2))
+        fp_in = os.path.join(wind_ninja_output_dir(in_dir, dt), file_name)
+
+        dir1 = wind_ninja_output_dir(out_dir, dt)
+        if not os.path.isdir(dir1):
+            os.makedirs(dir1)
+
+        if not crop(fp_in, os.path.join(dir1, file_name),
+                    bounds, logger, nthreads_w):
+            raise IOError('Could not crop {}'.format(fp_in))
+
+        out_files[dt.date()] += 1
+
+    return out_files
+
+
 def hrrr_file_name_finder(base_path, date, fx_hr=0):
     """
     Find the file pointer for a hrrr file with a specific forecast hour
@@ -0,0 +1,185 @@
+import os
+import re
+
+from katana.crop_inventory import GRIB_END, GRIB_MAGIC
+from katana.supervisor import supervisor
+
+INDEX_SUFFIX = '.idx'
+
+# record number and byte offset at the start of an inventory line
+RECORD_PATTERN = re.compile(r'^\d+(?:\.\d+)?:(\d+):')
+
+
+def index_file(fp_in):
+    """Path of the wgrib2 inventory next to a grib file
+
+    Arguments:
+        fp_in {str} -- grib file
+
+    Returns:
+        str -- path to the `.idx` file
+    """
+
+    return fp_in + INDEX_SUFFIX
+
+
+def index_current(fp_in):
+    """The `.idx` inventory next to a grib file is newer than the file
+
+    Arguments:
+        fp_in {str} -- grib file
+
+    Returns:
+        bool -- True if the inventory can be used
+    """
+
+    fp_idx = index_file(fp_in)
+    return os.path.isfile(fp_idx) and \
+        os.path.getmtime(fp_idx) >= os.path.getmtime(fp_in)
+
+
+def parse_index(lines, size):
+    """Parse a wgrib2 `-s` inventory into the byte range of each record.
+    Each line starts with the record number and the byte offset, a
+    record ends where the next one starts or at the end of the file.
+    Lines that are not records are skipped.
+
+    Arguments:
+        lines {list} -- inventory lines
+        size {int} -- size of the grib file in bytes
+
+    Returns:
+        list -- list of inventory line, offset and length tuples
+    """
+
+    records = []
+    for line in lines:
+        match = RECORD_PATTERN.match(line)
+        if match is None:
+            continue
+
+        offset = int(match.group(1))
+
+        # sub messages share the offset of their message
+        if len(records) > 0 and records[-1][1] == offset:
+            records[-1][0] += '\n' + line.strip()
+            continue
+
+        records.append([line.strip(), offset, None])
+
+    for n, record in enumerate(records):
+        end = records[n + 1][1] if n + 1 < len(records) else size
+        record[2] = end - record[1]
+
+    return [tuple(record) for record in records]
+
+
+def load_index(fp_in, logger):
+    """Load the inventory of a grib file. An `.idx` file that is newer
+    than the grib file is used, otherwise one is made with `wgrib2 -s`
+    and saved next to the grib file if the directory is writable.
+
+    Arguments:
+        fp_in {str} -- grib file
+        logger {logger} -- logger instance
+
+    Returns:
+        list -- records from `parse_index` or None if there is no
+            inventory
+    """
+
+    fp_idx = index_file(fp_in)
+    size = os.path.getsize(fp_in)
+
+    if index_current(fp_in):
+        with open(fp_idx, 'r') as f:
+            return parse_index(f.readlines(), size)
+
+    return_code, output = supervisor.run(['wgrib2', fp_in, '-s'], logger)
+    if return_code:
+        logger.warning('Could not make an inventory of {}'.format(fp_in))
+        return None
+
+    tmp_idx = '{}.{}.tmp'.format(fp_idx, os.getpid())
+    try:
+        with open(tmp_idx, 'w') as f:
+            f.write('\n'.join(output) + '\n')
+        os.replace(tmp_idx, fp_idx)
+    except OSError:
+        logger.debug('Could not save the inventory {}'.format(fp_idx))
+        if os.path.isfile(tmp_idx):
+            os.remove(tmp_idx)
+
+    return parse_index(output, size)
+
+
+def record_ranges(fp_in, match, logger):
+    """Byte ranges of the records in a grib file that match a wgrib2
+    style regular expression. Each range is checked against the grib
+    message header so a stale inventory is not used.
+
+    Arguments:
+        fp_in {str} -- grib file
+        match {str} -- regular expression for the inventory lines
+        logger {logger} -- logger instance
+
+    Returns:
+        list -- offset and length of the matching messages or None if
+            there is no usable inventory and the whole file has to be
+            read
+    """
+
+    records = load_index(fp_in, logger)
+    if records is None:
+        return None
+
+    pattern = re.compile(match)
+    ranges = [(offset, length) for line, offset, length in records
+              if pattern.search(line)]
+
+    if len(ranges) == 0:
+        return None
+
+    with open(fp_in, 'rb') as f:
+        for offset, length in ranges:
+            f.seek(offset)
+            header = f.read(16)
+            f.seek(offset + length - 4)
+            end = f.read(4)
+
+            if header[0:4] != GRIB_MAGIC or end != GRIB_END or \
+                    (header[7] == 2 and
+                     int.from_bytes(header[8:16], 'big') != length):
+                logger.warning(
+                    'The inventory of {} does not match the file'.format(
+                        fp_in))
+                return None
+
+    return ranges
+
+
+def extract_records(fp_in, fp_out, match, logger):
+    """Copy only the records that match a wgrib2 style regular
+    expression from a grib file, reading just their byte ranges
+
+    Arguments:
+        fp_in {str} -- grib file
+        fp_out {str} -- file for the matching records
+        match {str} -- regular expression for the inventory lines
+        logger {logger} -- logger instance
+
+    Returns:
+        bool -- True if the records were copied, False if there is no
+            usable inventory and the whole file has to be read
+    """
+
+    ranges = record_ranges(fp_in, match, logger)
+    if ranges is None:
+        return False
+
+    with open(fp_in, 'rb') as f_in, open(fp_out, 'wb') as f_out:
+        for offset, length in ranges:
+            f_in.seek(offset)
+            f_out.write(f_in.read(length))
+
+    return True
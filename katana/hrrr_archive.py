@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+# forecast hours that can stand in for a missing analysis hour
+MAX_FORECAST_HOUR = 7
+
+DAY_FORMAT = '%Y%m%d'
+FILE_PATTERN = re.compile(r'^hrrr\.t(\d{2})z\.wrfsfcf(\d{2})\.grib2$')
+
+
+class HRRRArchive():
+    """Index of the HRRR files in `hrrr_directory`. Each `hrrr.YYYYMMDD`
+    folder is scanned once with `os.scandir` into the cycle hour and
+    forecast hour of every file with its path and size. The file for an
+    hour and the forecast hour fallbacks are then found without checking
+    each candidate path or running wgrib2 on missing files.
+
+    A folder is scanned again when its modification time changes, so
+    files that arrive during a run are found. The index can be kept in
+    a JSON cache file between runs.
+    """
+
+    def __init__(self, directory, cache_file=None):
+        """Init the HRRRArchive
+
+        Arguments:
+            directory {str} -- HRRR archive directory with the
+                `hrrr.YYYYMMDD` folders
+
+        Keyword Arguments:
+            cache_file {str} -- JSON file to keep the index between
+                runs (default: {None})
+        """
+
+        self._logger = logging.getLogger(__name__)
+
+        self.directory = os.path.abspath(directory)
+        self.cache_file = cache_file
+        self.folders = {}
+        self.lock = threading.Lock()
+
+        if self.cache_file is not None:
+            self.load()
+
+    def load(self):
+        """Load the folder indexes from the cache file
+        """
+
+        if not os.path.isfile(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r') as f:
+                cache = json.load(f)
+        except ValueError:
+            self._logger.warning(
+                'Ignoring the unreadable HRRR index {}'.format(
+                    self.cache_file))
+            return
+
+        if cache.get('directory') == self.directory:
+            self.folders = cache['folders']
+
+    def save(self):
+        """Write the folder indexes to the cache file
+        """
+
+        tmp_file = '{}.tmp'.format(self.cache_file)
+        with open(tmp_file, 'w') as f:
+            json.dump({'directory': self.directory,
+                       'folders': self.folders}, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def folder(self, day):
+        """Index of the files in the folder for a day, the folder is
+        scanned if it has changed since the last scan
+
+        Arguments:
+            day {date} -- day of the HRRR cycles
+
+        Returns:
+            dict -- file name and size by `HH:FF` cycle and forecast hour
+        """
+
+        name = 'hrrr.{}'.format(day.strftime(DAY_FORMAT))
+        path = os.path.join(self.directory, name)
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        with self.lock:
+            index = self.folders.get(name)
+            if index is not None and index['mtime'] == mtime:
+                return index['files']
+
+            files = {}
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    match = FILE_PATTERN.match(entry.name)
+                    if match is None or not entry.is_file():
+                        continue
+
+                    files['{}:{}'.format(*match.groups())] = \
+                        [entry.name, entry.stat().st_size]
+
+            self._logger.debug('Indexed {} HRRR files in {}'.format(
+                len(files), path))
+
+            self.folders[name] = {'mtime': mtime, 'files': files}
+
+            if self.cache_file is not None:
+                self.save()
+
+        return files
+
+    def lookup(self, dt, fx_hr):
+        """HRRR file for an hour from a forecast hour, see
+        `grib_crop_wgrib2.hrrr_file_name_finder` for the naming
+
+        Arguments:
+            dt {datetime} -- hour that the file is used for
+            fx_hr {int} -- forecast hour
+
+        Returns:
+            tuple -- path and size of the file or None if the file is
+                not in the archive
+        """
+
+        cycle = datetime(dt.year, dt.month, dt.day, dt.hour) - \
+            timedelta(hours=fx_hr)
+
+        entry = self.folder(cycle.date()).get(
+            '{:02d}:{:02d}'.format(cycle.hour, fx_hr))
+        if entry is None:
+            return None
+
+        name, size = entry
+        path = os.path.join(
+            self.directory, 'hrrr.{}'.format(cycle.strftime(DAY_FORMAT)),
+            name)
+
+        return path, size
+
+    def candidates(self, dt):
+        """Files that can be used for an hour in the order to try them,
+        the analysis file first then the forecast hours. Empty files
+        are skipped.
+
+        Arguments:
+            dt {datetime} -- hour that the file is used for
+
+        Returns:
+            list -- list of forecast hour and path tuples
+        """
+
+        files = []
+        for fx_hr in range(MAX_FORECAST_HOUR + 1):
+            entry = self.lookup(dt, fx_hr)
+            if entry is not None and entry[1] > 0:
+                files.append((fx_hr, entry[0]))
+
+        return files
+
+    def resolve(self, dt):
+        """First file that can be used for an hour
+
+        Arguments:
+            dt {datetime} -- hour that the file is used for
+
+        Returns:
+            tuple -- forecast hour and file path or None and None if
+                there is no file for the hour
+        """
+
+        files = self.candidates(dt)
+        if len(files) == 0:
+            return None, None
+
+        return files[0]
+
+    def missing_hours(self, date_list):
+        """Hours without any file in the archive
+
+        Arguments:
+            date_list {list} -- list of datetimes
+
+        Returns:
+            list -- datetimes without a file
+        """
+
+        return [dt for dt in date_list if len(self.candidates(dt)) == 0]
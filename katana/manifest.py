@@ -0,0 +1,250 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+
+def file_checksum(file_name, block_size=2**20):
+    """Calculate the sha256 checksum of a file
+
+    Arguments:
+        file_name {str} -- path to the file
+
+    Keyword Arguments:
+        block_size {int} -- bytes to read at a time (default: {2**20})
+
+    Returns:
+        str -- hex digest of the file
+    """
+
+    sha = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+class Manifest():
+    """Record of the days that Katana has completed. Each day has a
+    JSON file under `out_location` with the hours, the config hash,
+    the input files and the output files with their sizes and checksums.
+    A rerun can verify the record and skip the days that completed.
+    """
+
+    DATE_FORMAT = '%Y%m%d'
+    DIRECTORY = 'katana_manifest'
+
+    # sections that change the WindNinja output or the products
+    # written for a day
+    HASH_SECTIONS = ['topo', 'input', 'wind_ninja', 'output']
+
+    # options that do not change the output
+    HASH_IGNORE = ['num_threads', 'hrrr_num_wgrib_threads',
+                   'hrrr_index_file', 'hrrr_crop_cache',
+                   'hrrr_crop_cache_size', 'hrrr_byte_ranges',
+                   'hrrr_batch_crop', 'out_location', 'wn_cfg',
+                   'make_new_gribs', 'incremental_gribs', 'resume']
+
+    def __init__(self, out_dir, config_hash):
+        """Init the Manifest
+
+        Arguments:
+            out_dir {str} -- Katana output directory
+            config_hash {str} -- hash of the configuration, see
+                `Manifest.hash_config`
+        """
+
+        self._logger = logging.getLogger(__name__)
+
+        self.out_dir = out_dir
+        self.config_hash = config_hash
+        self.directory = os.path.join(out_dir, self.DIRECTORY)
+        self.forced_days = set()
+
+    @classmethod
+    def hash_config(cls, config):
+        """Hash the config options that change the output. The topo file
+        size and modification time are included so a new DEM with the
+        same file name will change the hash.
+
+        Arguments:
+            config {dict} -- dictionary of configuration options
+
+        Returns:
+            str -- hex digest of the config
+        """
+
+        options = {}
+        for section in cls.HASH_SECTIONS:
+            options[section] = {
+                k: str(v) for k, v in config[section].items()
+                if k not in cls.HASH_IGNORE}
+
+        topo_file = config['topo']['filename']
+        if os.path.isfile(topo_file):
+            stat = os.stat(topo_file)
+            options['topo_file'] = [stat.st_size, stat.st_mtime]
+
+        return hashlib.sha256(
+            json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+    def day_file(self, day):
+        """Path to the manifest file for a day
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Returns:
+            str -- path to the day's manifest file
+        """
+
+        return os.path.join(self.directory, '{}.json'.format(
+            day.strftime(self.DATE_FORMAT)))
+
+    def force(self, days):
+        """Days that will be ran again even if they completed
+
+        Arguments:
+            days {list} -- list of date objects
+        """
+
+        self.forced_days.update(days)
+
+    def record(self, day, hours, inputs, outputs, elapsed=None):
+        """Record a completed day. The day's file is written to a
+        temporary file first and then moved into place.
+
+        Arguments:
+            day {date} -- date object for the day
+            hours {list} -- datetimes that were ran for the day
+            inputs {list} -- input file paths used for the day
+            outputs {list} -- output file paths produced for the day
+
+        Keyword Arguments:
+            elapsed {float} -- seconds the day took to run
+                (default: {None})
+        """
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        entry = {
+            'day': day.strftime(self.DATE_FORMAT),
+            'config_hash': self.config_hash,
+            'hours': [str(hour) for hour in hours],
+            'inputs': [{
+                'path': os.path.abspath(file_name),
+                'size': os.path.getsize(file_name)
+            } for file_name in sorted(inputs)],
+            'outputs': [{
+                'path': os.path.relpath(file_name, self.out_dir),
+                'size': os.path.getsize(file_name),
+                'sha256': file_checksum(file_name)
+            } for file_name in sorted(outputs)],
+            'elapsed': elapsed,
+            'completed': datetime.now().isoformat()
+        }
+
+        day_file = self.day_file(day)
+        tmp_file = '{}.{}.tmp'.format(day_file, os.getpid())
+        with open(tmp_file, 'w') as f:
+            json.dump(entry, f, indent=2)
+
+        os.replace(tmp_file, day_file)
+
+    def load(self, day):
+        """Load the manifest entry for a day
+
+        Arguments:
+            day {date} -- date object for the day
+
+        Returns:
+            dict -- manifest entry or None if there isn't one
+        """
+
+        day_file = self.day_file(day)
+        if not os.path.isfile(day_file):
+            return None
+
+        try:
+            with open(day_file, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            self._logger.warning(
+                'Could not read manifest file {}'.format(day_file))
+            return None
+
+    def entries(self):
+        """Load all the manifest entries
+
+        Returns:
+            list -- list of the manifest entries for all days
+        """
+
+        if not os.path.isdir(self.directory):
+            return []
+
+        entries = []
+        for file_name in sorted(os.listdir(self.directory)):
+            if not file_name.endswith('.json'):
+                continue
+
+            day = datetime.strptime(file_name[:-5], self.DATE_FORMAT)
+            entry = self.load(day)
+            if entry is not None:
+                entries.append(entry)
+
+        return entries
+
+    def is_complete(self, day, hours):
+        """Verify that a day has completed with the current config. The
+        config hash and hours must match, the input files must have the
+        same size and the output files the same size and checksum.
+
+        Arguments:
+            day {date} -- date object for the day
+            hours {list} -- datetimes that will be ran for the day
+
+        Returns:
+            bool -- True if the day does not need to be ran again
+        """
+
+        if day in self.forced_days:
+            return False
+
+        entry = self.load(day)
+        if entry is None:
+            return False
+
+        if entry['config_hash'] != self.config_hash:
+            self._logger.debug(
+                'Config has changed since {} was ran'.format(day))
+            return False
+
+        if entry['hours'] != [str(hour) for hour in hours]:
+            self._logger.debug(
+                'Hours have changed since {} was ran'.format(day))
+            return False
+
+        if len(entry['outputs']) == 0:
+            return False
+
+        for f in entry['inputs']:
+            if not os.path.isfile(f['path']) or \
+                    os.path.getsize(f['path']) != f['size']:
+                self._logger.debug('Input file {} has changed'.format(
+                    f['path']))
+                return False
+
+        for f in entry['outputs']:
+            file_name = os.path.join(self.out_dir, f['path'])
+            if not os.path.isfile(file_name) or \
+                    os.path.getsize(file_name) != f['size'] or \
+                    file_checksum(file_name) != f['sha256']:
+                self._logger.debug('Output file {} has changed'.format(
+                    file_name))
+                return False
+
+        return True
@@ -0,0 +1,180 @@
+import logging
+import os
+import re
+import shutil
+from glob import glob
+
+import numpy as np
+
+from katana.topo import write_ascii_grid
+
+# WindNinja outputs with an angle in degrees, blended as unit vectors
+ANGLE_PATTERN = re.compile(r'_ang\.asc$')
+
+
+def read_ascii_header(fp):
+    """Read the header of an ascii grid without the grid
+
+    Arguments:
+        fp {str} -- path to the ascii grid
+
+    Returns:
+        dict -- header with lower case keys
+    """
+
+    header = {}
+    with open(fp, 'r') as f:
+        for _ in range(6):
+            key, value = f.readline().split()
+            header[key.lower()] = float(value)
+
+    return header
+
+
+def read_ascii_grid(fp):
+    """Read an ascii grid
+
+    Arguments:
+        fp {str} -- path to the ascii grid
+
+    Returns:
+        tuple -- header dictionary and the masked grid
+    """
+
+    header = read_ascii_header(fp)
+
+    data = np.loadtxt(fp, skiprows=6, ndmin=2)
+    data = np.ma.masked_values(data, header['nodata_value'])
+
+    return header, data
+
+
+def blend(grids, weights, angle=False):
+    """Weighted blend of grids, masked cells are not used
+
+    Arguments:
+        grids {list} -- masked grids of the same shape
+        weights {list} -- weights for each grid
+
+    Keyword Arguments:
+        angle {bool} -- blend angles in degrees as unit vectors
+            (default: {False})
+
+    Returns:
+        numpy.ma.MaskedArray -- blended grid
+    """
+
+    total = np.zeros(grids[0].shape)
+    total_sin = np.zeros(grids[0].shape)
+    total_cos = np.zeros(grids[0].shape)
+    weight = np.zeros(grids[0].shape)
+
+    for grid, w in zip(grids, weights):
+        w = w * ~np.ma.getmaskarray(grid)
+        values = np.ma.filled(grid, 0)
+
+        if angle:
+            total_sin += w * np.sin(np.radians(values))
+            total_cos += w * np.cos(np.radians(values))
+        else:
+            total += w * values
+        weight += w
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if angle:
+            result = np.mod(np.degrees(np.arctan2(total_sin, total_cos)),
+                            360)
+        else:
+            result = total / weight
+
+    return np.ma.masked_array(result, mask=weight == 0)
+
+
+def mosaic_outputs(tiles, tile_dirs, out_dir, prefix, overlap,
+                   nodata=-9999):
+    """Mosaic the WindNinja ascii outputs of the tiles onto one grid.
+    The grid covers all the tile outputs at their cell size, each tile
+    output is placed by its lower left corner. Speed and other values
+    are blended with the feathered tile weights, `_ang` outputs are
+    blended as unit vectors. The mosaic has the name the output of the
+    whole domain would have and the `.prj` of the first tile.
+
+    Arguments:
+        tiles {list} -- list of `Tile`
+        tile_dirs {list} -- WindNinja output folder of each tile
+        out_dir {str} -- folder for the mosaicked outputs
+        prefix {str} -- WindNinja output prefix of the whole domain
+        overlap {float} -- width of the overlap between tiles
+
+    Keyword Arguments:
+        nodata {float} -- value for cells without data
+            (default: {-9999})
+
+    Returns:
+        list -- paths of the mosaicked outputs
+    """
+
+    logger = logging.getLogger(__name__)
+
+    # outputs by the name after the tile prefix
+    outputs = {}
+    for tile, tile_dir in zip(tiles, tile_dirs):
+        for fp in glob(os.path.join(
+                tile_dir, '{}_*.asc'.format(tile.windnina_filenames))):
+            name = os.path.basename(fp)[len(tile.windnina_filenames):]
+            outputs.setdefault(name, []).append((tile, fp))
+
+    mosaics = []
+    for name, files in sorted(outputs.items()):
+        if len(files) != len(tiles):
+            raise IOError('Only {} of {} tiles have the output {}'.format(
+                len(files), len(tiles), name))
+
+        grids = [(tile, ) + read_ascii_grid(fp) for tile, fp in files]
+        cell_size = grids[0][1]['cellsize']
+
+        xll = min([h['xllcorner'] for _, h, _ in grids])
+        yll = min([h['yllcorner'] for _, h, _ in grids])
+        xur = max([h['xllcorner'] + h['ncols'] * cell_size
+                   for _, h, _ in grids])
+        yur = max([h['yllcorner'] + h['nrows'] * cell_size
+                   for _, h, _ in grids])
+        ncols = int(round((xur - xll) / cell_size))
+        nrows = int(round((yur - yll) / cell_size))
+
+        # cell centers of the mosaic, rows from north to south
+        x = xll + (np.arange(ncols) + 0.5) * cell_size
+        y = yll + (nrows - np.arange(nrows) - 0.5) * cell_size
+
+        layers = []
+        weights = []
+        for tile, header, data in grids:
+            col = int(round((header['xllcorner'] - xll) / cell_size))
+            row = nrows - data.shape[0] - int(round(
+                (header['yllcorner'] - yll) / cell_size))
+
+            layer = np.ma.masked_all((nrows, ncols))
+            layer[row:row + data.shape[0], col:col + data.shape[1]] = data
+            layers.append(layer)
+            weights.append(tile.weights(x, y, overlap))
+
+        mosaic = blend(layers, weights,
+                       angle=ANGLE_PATTERN.search(name) is not None)
+
+        header = 'ncols\t{}\nnrows\t{}\nxllcorner\t{:f}\nyllcorner\t{:f}' \
+            '\ncellsize\t{:f}\nNODATA_value\t{:f}'.format(
+                ncols, nrows, xll, yll, cell_size, nodata)
+
+        fp_out = os.path.join(out_dir, prefix + name)
+        write_ascii_grid(fp_out, mosaic, header, nodata)
+        mosaics.append(fp_out)
+
+        # projection of the output
+        prj = os.path.splitext(files[0][1])[0] + '.prj'
+        if os.path.isfile(prj):
+            shutil.copyfile(prj, os.path.splitext(fp_out)[0] + '.prj')
+
+        logger.debug('Mosaicked {} tiles into {}'.format(
+            len(files), fp_out))
+
+    return mosaics
@@ -0,0 +1,242 @@
+import os
+import re
+from datetime import datetime
+
+import netCDF4 as nc
+import numpy as np
+
+from katana.mosaic import read_ascii_grid, read_ascii_header
+
+# WindNinja output name after the prefix, `_03-05-2019_1300_200m_vel.asc`
+OUTPUT_PATTERN = re.compile(
+    r'_(?P<time>\d{2}-\d{2}-\d{4}_\d{4})_[^_]+_(?P<kind>vel|ang)\.asc$')
+TIME_FORMAT = '%m-%d-%Y_%H%M'
+
+# compression level of the cube variables
+COMPLEVEL = 4
+
+# target size in bytes of a chunk, chunks hold all the times of the day
+CHUNK_BYTES = 2**20
+
+# largest chunk cache in bytes for a variable
+CHUNK_CACHE = 2**28
+
+FILL_VALUE = -9999.0
+
+VARIABLES = {
+    'wind_speed': {
+        'long_name': 'wind speed',
+        'standard_name': 'wind_speed'
+    },
+    'wind_direction': {
+        'long_name': 'direction the wind is coming from',
+        'standard_name': 'wind_from_direction',
+        'units': 'degrees'
+    },
+    'u': {
+        'long_name': 'eastward wind',
+        'standard_name': 'eastward_wind'
+    },
+    'v': {
+        'long_name': 'northward wind',
+        'standard_name': 'northward_wind'
+    }
+}
+
+# header values that every output grid of the cube has to share
+GRID_KEYS = ['ncols', 'nrows', 'xllcorner', 'yllcorner', 'cellsize']
+
+# WindNinja output speed units
+SPEED_UNITS = {
+    'mps': 'm s-1',
+    'mph': 'mi h-1',
+    'kph': 'km h-1',
+    'kts': 'knot'
+}
+
+
+def output_times(file_names, prefix):
+    """Pair the WindNinja speed and direction outputs by time
+
+    Arguments:
+        file_names {list} -- WindNinja output files
+        prefix {str} -- prefix of the WindNinja outputs
+
+    Returns:
+        list -- sorted list of (datetime, speed file, direction file)
+
+    Raises:
+        IOError: if a time is missing its speed or direction
+    """
+
+    times = {}
+    for file_name in file_names:
+        fname = os.path.basename(file_name)
+        if not fname.startswith(prefix):
+            continue
+
+        match = OUTPUT_PATTERN.match(fname[len(prefix):])
+        if match is None:
+            continue
+
+        dt = datetime.strptime(match.group('time'), TIME_FORMAT)
+        times.setdefault(dt, {})[match.group('kind')] = file_name
+
+    for dt, kinds in times.items():
+        if len(kinds) != 2:
+            raise IOError('WindNinja output for {} is missing its {} '
+                          'file'.format(dt, 'vel' if 'vel' not in kinds
+                                        else 'ang'))
+
+    return [(dt, times[dt]['vel'], times[dt]['ang']) for dt in sorted(times)]
+
+
+def chunk_shape(num_times, ny, nx, itemsize=4, chunk_bytes=CHUNK_BYTES):
+    """Chunks that hold all the times of a square block of the grid, so
+    the time series of a cell is contiguous
+
+    Arguments:
+        num_times {int} -- number of times
+        ny {int} -- number of rows
+        nx {int} -- number of columns
+
+    Keyword Arguments:
+        itemsize {int} -- bytes of a value (default: {4})
+        chunk_bytes {int} -- target size of a chunk
+            (default: {CHUNK_BYTES})
+
+    Returns:
+        tuple -- chunk size of the time, y and x dimensions
+    """
+
+    side = max(1, int(np.sqrt(chunk_bytes / (itemsize * num_times))))
+    return (num_times, min(side, ny), min(side, nx))
+
+
+def write_cube(out_file, file_names, prefix, topo_stats,
+               speed_units='mps', time_zone=None, uv=False):
+    """Write the WindNinja speed and direction ascii outputs of a day
+    into a NetCDF4 file with a `time` dimension. The grids are read one
+    time at a time and freed after they are written. The x and y
+    coordinates are the cell centers of the output grid from the
+    header of the first output, every output has to be on that grid.
+    The file is written to a temporary file that replaces `out_file`
+    when complete.
+
+    Arguments:
+        out_file {str} -- NetCDF file to write
+        file_names {list} -- WindNinja output files of the day
+        prefix {str} -- prefix of the WindNinja outputs
+        topo_stats {dict} -- `Topo.topo_stats` for the units of the
+            coordinates
+
+    Keyword Arguments:
+        speed_units {str} -- WindNinja output speed units
+            (default: {'mps'})
+        time_zone {str} -- time zone of the WindNinja outputs
+            (default: {None})
+        uv {bool} -- also write the `u` and `v` components
+            (default: {False})
+
+    Returns:
+        int -- number of times written
+
+    Raises:
+        IOError: if there are no WindNinja outputs
+        ValueError: if the output grids are not on the same grid
+    """
+
+    times = output_times(file_names, prefix)
+    if len(times) == 0:
+        raise IOError('No WindNinja outputs to write to {}'.format(out_file))
+
+    header = read_ascii_header(times[0][1])
+    grid = [header[key] for key in GRID_KEYS]
+    nx = int(header['ncols'])
+    ny = int(header['nrows'])
+    cell_size = header['cellsize']
+
+    # cell centers from the lower left corner of the output grid
+    x = header['xllcorner'] + (np.arange(nx) + 0.5) * cell_size
+    y = header['yllcorner'] + (ny - np.arange(ny) - 0.5) * cell_size
+
+    names = ['wind_speed', 'wind_direction']
+    if uv:
+        names.extend(['u', 'v'])
+
+    chunks = chunk_shape(len(times), ny, nx)
+
+    # hold all the chunks of a variable so a chunk is only compressed
+    # once it has every time
+    cache = min(len(times) * ny * nx * 4, CHUNK_CACHE)
+
+    start = times[0][0]
+    time_units = 'hours since {}'.format(
+        start.strftime('%Y-%m-%d 00:00:00'))
+
+    tmp_file = '{}.tmp'.format(out_file)
+    try:
+        with nc.Dataset(tmp_file, 'w', format='NETCDF4') as ds:
+            ds.createDimension('time', len(times))
+            ds.createDimension('y', ny)
+            ds.createDimension('x', nx)
+
+            t = ds.createVariable('time', 'f8', ('time',))
+            t.setncatts({'units': time_units, 'calendar': 'standard',
+                         'long_name': 'time'})
+            if time_zone is not None:
+                t.time_zone = time_zone
+            t[:] = nc.date2num([dt for dt, _, _ in times], time_units,
+                               calendar='standard')
+
+            for name, values in (('x', x), ('y', y)):
+                c = ds.createVariable(name, 'f8', (name,))
+                c.setncatts({
+                    'units': topo_stats['units'],
+                    'standard_name': 'projection_{}_coordinate'.format(
+                        name)})
+                c[:] = values
+
+            variables = {}
+            for name in names:
+                var = ds.createVariable(
+                    name, 'f4', ('time', 'y', 'x'), zlib=True,
+                    complevel=COMPLEVEL, chunksizes=chunks,
+                    fill_value=FILL_VALUE)
+                var.setncatts(VARIABLES[name])
+                if name != 'wind_direction':
+                    var.units = SPEED_UNITS.get(speed_units, speed_units)
+                var.set_var_chunk_cache(size=cache)
+                variables[name] = var
+
+            for idx, (dt, vel_file, ang_file) in enumerate(times):
+                grids = {}
+                for name, file_name in (('wind_speed', vel_file),
+                                        ('wind_direction', ang_file)):
+                    h, data = read_ascii_grid(file_name)
+                    if [h[key] for key in GRID_KEYS] != grid or \
+                            data.shape != (ny, nx):
+                        raise ValueError(
+                            '{} is not on the grid of {}'.format(
+                                file_name, times[0][1]))
+                    grids[name] = data
+
+                if uv:
+                    # the direction is where the wind is coming from
+                    rad = np.radians(grids['wind_direction'])
+                    grids['u'] = -grids['wind_speed'] * np.sin(rad)
+                    grids['v'] = -grids['wind_speed'] * np.cos(rad)
+
+                for name in names:
+                    variables[name][idx] = grids[name]
+
+                del grids
+
+        os.replace(tmp_file, out_file)
+
+    except BaseException:
+        if os.path.isfile(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    return len(times)
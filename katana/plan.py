@@ -0,0 +1,259 @@
+import heapq
+
+import numpy as np
+
+from katana.execution import CoreScheduler
+from katana.grib_index import index_current
+
+# rough WindNinja cost of one horizontal mesh cell for one hour on one
+# thread, only used when there are no past timings in the manifest
+SECONDS_PER_MESH_CELL = 1e-3
+
+# ascii grids WindNinja writes for each hour
+OUTPUT_GRIDS = ['vel', 'ang', 'cld']
+
+
+def seconds_per_hour(manifest):
+    """Average seconds that WindNinja took for an hour in the past
+    runs recorded in the manifest
+
+    Arguments:
+        manifest {Manifest} -- manifest of the Katana output
+
+    Returns:
+        float -- seconds per hour or None without past timings
+    """
+
+    elapsed = 0
+    hours = 0
+    for entry in manifest.entries():
+        if entry.get('elapsed') is not None and len(entry['hours']) > 0:
+            elapsed += entry['elapsed']
+            hours += len(entry['hours'])
+
+    if hours == 0:
+        return None
+
+    return elapsed / hours
+
+
+def wall_time(task_seconds, num_workers):
+    """Wall time to run tasks in order on a number of workers, each
+    task starts on the first worker that is free
+
+    Arguments:
+        task_seconds {list} -- seconds for each task
+        num_workers {int} -- number of concurrent workers
+
+    Returns:
+        float -- wall time in seconds
+    """
+
+    workers = [0.0] * max(1, num_workers)
+    for seconds in task_seconds:
+        heapq.heappush(workers, heapq.heappop(workers) + seconds)
+
+    return max(workers)
+
+
+def build_plan(katana):
+    """Build the task graph for a Katana run without running anything.
+    Every HRRR hour is resolved to the file and forecast hour that will
+    be cropped, the WindNinja runs and output files are counted and the
+    wall time is estimated from past timings in the manifest or from
+    the WindNinja mesh size.
+
+    Arguments:
+        katana {Katana} -- initialized Katana instance
+
+    Returns:
+        dict -- plan that can be written as JSON
+    """
+
+    config = katana.config
+    input_data = katana.input_data
+    execution = config['execution']
+    resume = config['output']['resume']
+
+    mesh_cells = CoreScheduler.from_topo(
+        1, katana.topo.topo_stats,
+        config['wind_ninja']['mesh_resolution']).mesh_cells
+
+    grids_per_hour = len(OUTPUT_GRIDS) \
+        if config['wind_ninja'].get('write_ascii_output', True) else 0
+
+    # HRRR runs WindNinja on each tile of the dem
+    runs_per_day = 1
+    if katana.data_type == 'hrrr':
+        runs_per_day = max(1, len(katana.topo.tiles))
+
+    days = []
+    for day in katana.day_list:
+        hours = input_data.day_hours(day)
+        completed = resume and input_data.manifest.is_complete(day, hours)
+
+        task = {
+            'day': day.isoformat(),
+            'completed': completed,
+            'num_hours': len(hours),
+            'wind_ninja_runs': 0 if completed else runs_per_day,
+            'output_files': 0 if completed else len(hours) * grids_per_hour
+        }
+
+        if katana.data_type == 'hrrr':
+            task.update(plan_hrrr_hours(
+                input_data.archive, hours,
+                config['output']['make_new_gribs'] and not completed,
+                backend=input_data.backend,
+                batch=config['input']['hrrr_batch_crop'],
+                byte_ranges=config['input']['hrrr_byte_ranges'],
+                num_tiles=len(katana.topo.tiles)))
+
+        days.append(task)
+
+    # WindNinja runs for the days that are left
+    todo = [task for task in days if not task['completed']]
+    if katana.data_type == 'wrf_out':
+        num_runs = min(input_data.num_chunks,
+                       len(input_data.wrf_times)) if todo else 0
+        run_hours = [len(c) for c in np.array_split(
+            np.arange(len(input_data.wrf_times)), max(1, num_runs))
+            if len(c) > 0] if todo else []
+        num_runs = len(run_hours)
+    else:
+        run_hours = [task['num_hours'] for task in todo
+                     for _ in range(runs_per_day)]
+        num_runs = len(run_hours)
+
+    # workers and threads for the runs
+    scheduler = input_data.scheduler
+    if scheduler is not None:
+        num_workers, num_threads = scheduler.allocate(max(1, num_runs))
+    elif katana.data_type == 'wrf_out':
+        num_workers = max(1, num_runs)
+        num_threads = config['wind_ninja']['num_threads']
+    else:
+        num_workers = execution['num_workers']
+        num_threads = config['wind_ninja']['num_threads']
+
+    per_hour = seconds_per_hour(input_data.manifest)
+    if per_hour is not None:
+        basis = 'manifest'
+    else:
+        basis = 'mesh'
+        threads = min(num_threads, max(1, int(
+            mesh_cells // CoreScheduler.MESH_CELLS_PER_THREAD)))
+        per_hour = mesh_cells * SECONDS_PER_MESH_CELL / threads
+
+    run_seconds = [hours * per_hour for hours in run_hours]
+
+    plan = {
+        'config_file': katana.config_file,
+        'data_type': katana.data_type,
+        'out_location': katana.out_dir,
+        'start_date': str(katana.start_date),
+        'end_date': str(katana.end_date),
+        'domain': {
+            'nx': int(katana.topo.topo_stats['nx']),
+            'ny': int(katana.topo.topo_stats['ny']),
+            'mesh_resolution': config['wind_ninja']['mesh_resolution'],
+            'mesh_cells': int(mesh_cells)
+        },
+        'execution': {
+            'num_workers': int(num_workers),
+            'num_threads': int(num_threads),
+            'total_cores': execution['total_cores']
+        },
+        'days': days,
+        'totals': {
+            'days': len(days),
+            'completed_days': len(days) - len(todo),
+            'hours': sum([task['num_hours'] for task in todo]),
+            'wind_ninja_runs': num_runs,
+            'output_files': sum([task['output_files'] for task in todo]),
+            'estimate_basis': basis,
+            'seconds_per_hour': float(per_hour),
+            'estimated_wall_seconds': float(
+                wall_time(run_seconds, num_workers))
+        }
+    }
+
+    if katana.data_type == 'hrrr':
+        plan['totals'].update({
+            'missing_hours': sum([len(task['missing_hours'])
+                                  for task in days]),
+            'fallback_hours': sum([task['fallback_hours']
+                                   for task in days]),
+            'wgrib2_calls': sum([task['wgrib2_calls'] for task in days])
+        })
+
+    return plan
+
+
+def plan_hrrr_hours(archive, hours, crop, backend='wgrib2', batch=False,
+                    byte_ranges=False, num_tiles=0):
+    """Resolve the HRRR file for each hour in a day from the index
+    of the archive and count the wgrib2 calls that cropping them makes
+
+    Arguments:
+        archive {HRRRArchive} -- index of the HRRR archive
+        hours {list} -- datetimes in the day
+        crop {bool} -- the hours will be cropped
+
+    Keyword Arguments:
+        backend {str} -- crop backend, `eccodes` crops without wgrib2
+            (default: {'wgrib2'})
+        batch {bool} -- the hours of the day are cropped by one wgrib2
+            process (default: {False})
+        byte_ranges {bool} -- the records are read from the `.idx`
+            inventories, a missing or old inventory is made with
+            `wgrib2 -s` (default: {False})
+        num_tiles {int} -- number of tiles the crop is cropped again
+            for (default: {0})
+
+    Returns:
+        dict -- hours with their files, the missing hours, the number
+            of hours that need a forecast hour fallback and the number
+            of wgrib2 calls
+    """
+
+    resolved = []
+    missing = []
+    fallbacks = 0
+    cropped = []
+
+    for dt in hours:
+        fx_hr, fp = archive.resolve(dt)
+        resolved.append({
+            'time': str(dt),
+            'forecast_hour': fx_hr,
+            'file': fp
+        })
+
+        if fp is None:
+            missing.append(str(dt))
+            continue
+
+        if fx_hr > 0:
+            fallbacks += 1
+
+        # only files in the archive are cropped
+        if crop:
+            cropped.append(fp)
+
+    wgrib2_calls = 0
+    if backend == 'wgrib2' and len(cropped) > 0:
+        # one process for the day or one for each hour and tile
+        wgrib2_calls += 1 if batch else len(cropped)
+        wgrib2_calls += len(cropped) * num_tiles
+
+    if byte_ranges:
+        wgrib2_calls += len([fp for fp in cropped
+                             if not index_current(fp)])
+
+    return {
+        'hours': resolved,
+        'missing_hours': missing,
+        'fallback_hours': fallbacks,
+        'wgrib2_calls': wgrib2_calls
+    }
@@ -0,0 +1,189 @@
+import numpy as np
+
+# input cells read at a time when resampling
+BLOCK_CELLS = 2**22
+
+# conversion of the WindNinja mesh resolution units to meters
+UNITS = {
+    'm': 1.0,
+    'ft': 0.3048,
+    'km': 1000.0
+}
+
+
+def resample_factor(cell_size, resolution):
+    """Number of dem cells in each direction of a resampled cell. The
+    resampled cell is the largest multiple of the dem cell that is not
+    larger than the resolution.
+
+    Arguments:
+        cell_size {float} -- dem cell size
+        resolution {float} -- resolution to resample to, in the same
+            units as the cell size
+
+    Returns:
+        int -- resample factor, 1 if the dem is not finer than the
+            resolution
+    """
+
+    return max(1, int(np.floor(resolution / cell_size + 1e-6)))
+
+
+class ResampledGrid():
+    """A 2D grid resampled by an integer factor. Rows are resampled when
+    they are sliced, like a netCDF variable, so the grid can be written
+    in blocks by `write_ascii_grid` or `write_geotiff` without the full
+    grid in memory. The resampled cells cover the whole grid, the last
+    row and column use the cells that are left.
+
+    The `mean` method averages the unmasked cells in each block. The
+    `bilinear` method interpolates the grid at the center of each
+    resampled cell from the unmasked neighboring cells. A resampled cell
+    without any unmasked cells is masked.
+    """
+
+    METHODS = ['mean', 'bilinear']
+
+    def __init__(self, variable, factor, method='mean',
+                 block_cells=BLOCK_CELLS):
+        """Init the ResampledGrid
+
+        Arguments:
+            variable {netCDF4.Variable} -- 2D grid, anything that returns
+                a masked or plain array for a slice of rows
+            factor {int} -- number of grid cells in each direction of a
+                resampled cell
+
+        Keyword Arguments:
+            method {str} -- `mean` or `bilinear` (default: {'mean'})
+            block_cells {int} -- grid cells read at a time
+                (default: {BLOCK_CELLS})
+        """
+
+        if method not in self.METHODS:
+            raise ValueError('Unknown resample method {}'.format(method))
+
+        self.variable = variable
+        self.factor = int(factor)
+        self.method = method
+
+        self.source_shape = variable.shape
+        nrows, ncols = self.source_shape
+        self.shape = (-(-nrows // self.factor), -(-ncols // self.factor))
+        self.dtype = np.dtype(np.float64)
+
+        # resampled rows made at a time to read at most block_cells
+        self.block_rows = max(
+            1, block_cells // (ncols * (self.factor + 1)))
+
+    def __getitem__(self, key):
+        """Resampled rows for a slice
+
+        Arguments:
+            key {slice} -- rows of the resampled grid
+
+        Returns:
+            numpy.ma.MaskedArray -- resampled rows
+        """
+
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise IndexError('ResampledGrid only supports row slices')
+
+        start, stop, _ = key.indices(self.shape[0])
+        stop = max(start, stop)
+
+        blocks = [self._rows(row, min(row + self.block_rows, stop))
+                  for row in range(start, stop, self.block_rows)]
+
+        if len(blocks) == 0:
+            return np.ma.zeros((0, self.shape[1]))
+
+        return np.ma.concatenate(blocks)
+
+    def _read(self, start, stop):
+        """Grid rows as values with the masked cells set to zero and the
+        valid cells
+        """
+
+        data = np.ma.masked_invalid(
+            np.ma.asarray(self.variable[start:stop], dtype=np.float64))
+        valid = ~np.ma.getmaskarray(data)
+
+        return np.ma.filled(data, 0), valid
+
+    def _rows(self, start, stop):
+        """Resample the rows from start to stop"""
+
+        if self.method == 'mean':
+            return self._mean(start, stop)
+        return self._bilinear(start, stop)
+
+    def _mean(self, start, stop):
+        """Average the unmasked cells in each block"""
+
+        k = self.factor
+        nrows, ncols = self.source_shape
+        values, valid = self._read(start * k, min(stop * k, nrows))
+
+        # pad to whole blocks with cells that are not valid
+        pad = ((0, (stop - start) * k - values.shape[0]),
+               (0, self.shape[1] * k - ncols))
+        values = np.pad(values, pad)
+        valid = np.pad(valid, pad)
+
+        shape = (stop - start, k, self.shape[1], k)
+        total = values.reshape(shape).sum(axis=(1, 3))
+        count = valid.reshape(shape).sum(axis=(1, 3))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+
+        return np.ma.masked_array(mean, mask=count == 0)
+
+    def _bilinear(self, start, stop):
+        """Interpolate at the center of each resampled cell"""
+
+        nrows, ncols = self.source_shape
+
+        i0, i1, wi = self.neighbors(np.arange(start, stop), nrows)
+        j0, j1, wj = self.neighbors(np.arange(self.shape[1]), ncols)
+
+        first = int(i0[0])
+        values, valid = self._read(first, int(i1[-1]) + 1)
+        i0 = i0 - first
+        i1 = i1 - first
+
+        result = np.zeros((stop - start, self.shape[1]))
+        weight = np.zeros((stop - start, self.shape[1]))
+        for rows, w_row in ((i0, 1 - wi), (i1, wi)):
+            for cols, w_col in ((j0, 1 - wj), (j1, wj)):
+                w = np.outer(w_row, w_col) * valid[np.ix_(rows, cols)]
+                result += w * values[np.ix_(rows, cols)]
+                weight += w
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = result / weight
+
+        return np.ma.masked_array(result, mask=weight == 0)
+
+    def neighbors(self, index, size):
+        """Grid indices on each side of the centers of resampled cells
+        and the weight of the second index
+
+        Arguments:
+            index {array} -- resampled cell indices
+            size {int} -- number of grid cells
+
+        Returns:
+            tuple -- first index, second index and weight arrays
+        """
+
+        center = (index + 0.5) * self.factor - 0.5
+        first = np.clip(np.floor(center), 0, max(size - 2, 0)).astype(int)
+        second = np.minimum(first + 1, size - 1)
+        weight = np.clip(center - first, 0, 1)
+
+        # a single cell has no second neighbor
+        weight[first == second] = 0
+
+        return first, second, weight
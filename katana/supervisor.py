@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import os
+import shlex
+import sys
+import threading
+
+# Task.current_task was removed in Python 3.9
+current_task = getattr(asyncio, 'current_task', None) or \
+    asyncio.Task.current_task
+
+
+def quote(args):
+    """Command line of the arguments for the logs"""
+
+    return ' '.join(shlex.quote(arg) for arg in args)
+
+
+class CommandTimeout(TimeoutError):
+    """A command ran longer than its timeout or stopped writing output
+    """
+
+    def __init__(self, message, output):
+        super().__init__(message)
+        self.output = output
+
+
+if sys.version_info < (3, 8):
+    # AbstractChildWatcher was removed in Python 3.14
+    class ThreadedChildWatcher(asyncio.AbstractChildWatcher):
+        """Child watcher that waits for each process in its own thread, the
+        default from Python 3.8. Before 3.8 the watcher handles SIGCHLD
+        with the event loop of the main thread, so processes could not be
+        started from the event loop in the supervisor thread.
+        """
+
+        def add_child_handler(self, pid, callback, *args):
+            threading.Thread(
+                target=self._wait, args=(pid, callback, args),
+                name='katana-waitpid-{}'.format(pid), daemon=True).start()
+
+        def _wait(self, pid, callback, args):
+            try:
+                _, status = os.waitpid(pid, 0)
+            except ChildProcessError:
+                # the process was already waited for
+                return_code = 255
+            else:
+                if os.WIFSIGNALED(status):
+                    return_code = -os.WTERMSIG(status)
+                elif os.WIFEXITED(status):
+                    return_code = os.WEXITSTATUS(status)
+                else:
+                    return_code = status
+
+            callback(pid, return_code, *args)
+
+        def remove_child_handler(self, pid):
+            return True
+
+        def attach_loop(self, loop):
+            pass
+
+        def close(self):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+
+class ProcessSupervisor():
+    """Run external programs like `wgrib2` and `WindNinja_cli` without a
+    shell on an asyncio event loop in a background thread. Commands can
+    be submitted from any thread and many can be in flight at once, the
+    number of processes for each program is limited by a semaphore.
+    The output is streamed to the logger as it is written.
+
+    The event loop and the lock are created on first use and again
+    after a fork, so a supervisor can be used in the workers of a
+    process pool. A forked child never uses the lock of its parent,
+    which the parent's loop thread may have held at the fork. Limits
+    apply to the processes started from one Katana process.
+    """
+
+    def __init__(self, limits=None):
+        """Init the ProcessSupervisor
+
+        Keyword Arguments:
+            limits {dict} -- dictionary of program name to the most
+                processes that can run at once, programs without a
+                limit are not limited (default: {None})
+        """
+
+        self._logger = logging.getLogger(__name__)
+
+        self.limits = dict(limits or {})
+
+        self._lock = None
+        self._lock_pid = None
+        self._loop = None
+        self._pid = None
+        self._semaphores = {}
+        self._tasks = set()
+
+    def set_limit(self, program, limit):
+        """Set the most processes of a program that can run at once
+
+        Arguments:
+            program {str} -- program name, e.g. `wgrib2`
+            limit {int} -- number of processes or None for no limit
+        """
+
+        with self.lock():
+            self.limits[program] = limit
+            self._semaphores.pop(program, None)
+
+    def submit(self, args, logger=None, timeout=None, idle_timeout=None,
+               input_files=None):
+        """Start a command without waiting for it to finish
+
+        Arguments:
+            args {list} -- program and arguments
+
+        Keyword Arguments:
+            logger {logger} -- logger for the output (default: {None})
+            timeout {float} -- seconds the command can run before it is
+                killed (default: {None})
+            idle_timeout {float} -- seconds the command can go without
+                writing any output before it is killed (default: {None})
+            input_files {list} -- files to stream to the standard input
+                of the command one after the other. Each is a path or
+                a path and a list of offset and length byte ranges
+                (default: {None})
+
+        Returns:
+            Future -- `concurrent.futures.Future` with the return code
+                and the output lines, cancelling the future terminates
+                the process. A killed command raises `CommandTimeout`.
+        """
+
+        if logger is None:
+            logger = self._logger
+
+        args = [str(arg) for arg in args]
+
+        return asyncio.run_coroutine_threadsafe(
+            self._run(args, logger, timeout, idle_timeout, input_files),
+            self.loop())
+
+    def run(self, args, logger=None, timeout=None, idle_timeout=None,
+            input_files=None):
+        """Run a command and wait for it to finish
+
+        Arguments:
+            args {list} -- program and arguments
+
+        Keyword Arguments:
+            logger {logger} -- logger for the output (default: {None})
+            timeout {float} -- seconds the command can run before it is
+                killed (default: {None})
+            idle_timeout {float} -- seconds the command can go without
+                writing any output before it is killed (default: {None})
+            input_files {list} -- files to stream to the standard input,
+                see `ProcessSupervisor.submit` (default: {None})
+
+        Raises:
+            CommandTimeout: if the command was killed by a timeout
+
+        Returns:
+            tuple -- return code and the list of output lines
+        """
+
+        future = self.submit(args, logger, timeout, idle_timeout,
+                             input_files)
+
+        try:
+            return future.result()
+
+        except KeyboardInterrupt:
+            self.cancel_all()
+            raise
+
+    def cancel_all(self, timeout=10):
+        """Cancel all commands and wait for their processes to exit
+
+        Keyword Arguments:
+            timeout {float} -- seconds to wait (default: {10})
+        """
+
+        if self._loop is None or self._pid != os.getpid():
+            return
+
+        asyncio.run_coroutine_threadsafe(
+            self._cancel_all(), self._loop).result(timeout)
+
+    def lock(self):
+        """Lock of this process, made again after a fork
+
+        Returns:
+            Lock -- the lock
+        """
+
+        if self._lock_pid != os.getpid():
+            self._lock = threading.Lock()
+            self._lock_pid = os.getpid()
+
+        return self._lock
+
+    def loop(self):
+        """Event loop running in the background thread, started if this
+        process does not have one yet
+
+        Returns:
+            AbstractEventLoop -- the event loop
+        """
+
+        with self.lock():
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                self._semaphores = {}
+                self._tasks = set()
+
+                if sys.version_info < (3, 8):
+                    asyncio.set_child_watcher(ThreadedChildWatcher())
+
+                thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='katana-supervisor',
+                    daemon=True)
+                thread.start()
+
+            return self._loop
+
+    def _semaphore(self, program):
+        with self.lock():
+            limit = self.limits.get(program)
+            if limit is None:
+                return None
+
+            if program not in self._semaphores:
+                self._semaphores[program] = asyncio.Semaphore(limit)
+
+            return self._semaphores[program]
+
+    async def _run(self, args, logger, timeout, idle_timeout, input_files):
+        program = os.path.basename(args[0])
+        semaphore = self._semaphore(program)
+
+        task = current_task()
+        self._tasks.add(task)
+
+        try:
+            if semaphore is None:
+                return await self._exec(
+                    args, logger, timeout, idle_timeout, input_files)
+
+            async with semaphore:
+                return await self._exec(
+                    args, logger, timeout, idle_timeout, input_files)
+
+        finally:
+            self._tasks.discard(task)
+
+    async def _exec(self, args, logger, timeout, idle_timeout,
+                    input_files=None):
+        logger.debug('Running "{}"'.format(quote(args)))
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE if input_files else None,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE)
+
+        except FileNotFoundError:
+            # same return code as a shell for a missing program
+            return 127, ['{}: command not found'.format(args[0])]
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        state = {'last_output': start}
+        output = []
+
+        streams = [
+            self._stream(process.stdout, logger, output, state),
+            self._stream(process.stderr, logger, output, state)]
+        if input_files:
+            streams.append(self._feed(process.stdin, input_files, logger))
+
+        streams = asyncio.ensure_future(asyncio.gather(*streams))
+
+        try:
+            while not streams.done():
+                now = loop.time()
+                deadlines = []
+                if timeout is not None:
+                    deadlines.append((start + timeout - now, (
+                        '"{}" did not finish in {} sec').format(
+                            args[0], timeout)))
+                if idle_timeout is not None:
+                    deadlines.append((
+                        state['last_output'] + idle_timeout - now, (
+                            '"{}" wrote no output for {} sec').format(
+                                args[0], idle_timeout)))
+
+                wait, message = min(deadlines, default=(None, None))
+                if wait is not None and wait <= 0:
+                    logger.warning('Killing {}'.format(message))
+                    await self._terminate(process, streams)
+                    raise CommandTimeout(message, output)
+
+                await asyncio.wait([streams], timeout=wait)
+
+            await streams
+            return_code = await process.wait()
+
+        except asyncio.CancelledError:
+            logger.warning('Cancelling "{}"'.format(quote(args)))
+            await self._terminate(process, streams)
+            raise
+
+        return return_code, output
+
+    async def _stream(self, stream, logger, output, state):
+        async for line in stream:
+            state['last_output'] = asyncio.get_event_loop().time()
+            line = line.decode(errors='replace').rstrip()
+            logger.debug(line)
+            output.append(line)
+
+    async def _feed(self, stdin, input_files, logger, block_size=2**20):
+        loop = asyncio.get_event_loop()
+
+        try:
+            for input_file in input_files:
+                if isinstance(input_file, str):
+                    input_file = (input_file, [(0, None)])
+
+                fp, ranges = input_file
+                with open(fp, 'rb') as f:
+                    for offset, length in ranges:
+                        f.seek(offset)
+                        while length is None or length > 0:
+                            size = block_size if length is None \
+                                else min(block_size, length)
+                            block = await loop.run_in_executor(
+                                None, f.read, size)
+                            if not block:
+                                break
+
+                            stdin.write(block)
+                            await stdin.drain()
+                            if length is not None:
+                                length -= len(block)
+
+        except (BrokenPipeError, ConnectionResetError):
+            # the command stopped reading, its return code tells why
+            logger.debug('The command closed its input')
+
+        finally:
+            stdin.close()
+
+    async def _terminate(self, process, streams, timeout=5):
+        streams.cancel()
+        await asyncio.wait([streams])
+        if not streams.cancelled():
+            streams.exception()
+
+        if process.returncode is not None:
+            return
+
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def _cancel_all(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# supervisor shared by everything in a Katana process
+supervisor = ProcessSupervisor()
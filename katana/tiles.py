@@ -0,0 +1,204 @@
+import os
+
+import numpy as np
+
+# weight of the cells outside the tile dem, only used where no other
+# tile covers the cell
+EDGE_WEIGHT = 1e-6
+
+
+def split_axis(size, tile_cells, overlap_cells, align=1):
+    """Split an axis into overlapping ranges. The ranges start at a
+    multiple of `align` cells so the grids of the tiles line up with a
+    coarser output grid. The last range ends at the end of the axis.
+
+    Arguments:
+        size {int} -- number of cells on the axis
+        tile_cells {int} -- number of cells in a range
+        overlap_cells {int} -- minimum number of cells that neighboring
+            ranges share
+
+    Keyword Arguments:
+        align {int} -- ranges start at a multiple of this
+            (default: {1})
+
+    Returns:
+        list -- start and stop of each range
+    """
+
+    align = max(1, int(align))
+    step = (tile_cells - overlap_cells) // align * align
+    if step < align:
+        raise ValueError('The tile overlap must be smaller than the tile')
+
+    starts = [0]
+    while starts[-1] + tile_cells < size:
+        starts.append(starts[-1] + step)
+
+    return [(start, min(start + tile_cells, size)) for start in starts]
+
+
+class GridWindow():
+    """A window of a 2D grid that is sliced by rows like a netCDF
+    variable, so a tile of the dem can be written without reading the
+    rest of the dem.
+    """
+
+    def __init__(self, variable, rows, cols):
+        """Init the GridWindow
+
+        Arguments:
+            variable {netCDF4.Variable} -- 2D grid
+            rows {tuple} -- start and stop row of the window
+            cols {tuple} -- start and stop column of the window
+        """
+
+        self.variable = variable
+        self.rows = rows
+        self.cols = cols
+        self.shape = (rows[1] - rows[0], cols[1] - cols[0])
+        self.dtype = variable.dtype
+
+    def __getitem__(self, key):
+        """Rows of the window
+
+        Arguments:
+            key {slice} -- rows of the window
+
+        Returns:
+            array -- rows of the grid in the window
+        """
+
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise IndexError('GridWindow only supports row slices')
+
+        start, stop, _ = key.indices(self.shape[0])
+        return self.variable[self.rows[0] + start:self.rows[0] + stop,
+                             self.cols[0]:self.cols[1]]
+
+
+class Tile():
+    """An overlapping tile of the dem that WindNinja runs on by itself.
+    The tile has its own elevation file next to the WindNinja topo and
+    its outputs are mosaicked back onto the grid of the whole domain.
+    """
+
+    def __init__(self, name, rows, cols, x, y, cell_size, interior,
+                 file_base):
+        """Init the Tile
+
+        Arguments:
+            name {str} -- name of the tile
+            rows {tuple} -- start and stop row in the dem
+            cols {tuple} -- start and stop column in the dem
+            x {array} -- x coordinates of the tile
+            y {array} -- y coordinates of the tile
+            cell_size {float} -- dem cell size
+            interior {dict} -- True for the `west`, `east`, `south` and
+                `north` edges that overlap another tile
+            file_base {str} -- path of the elevation file without the
+                extension
+        """
+
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self.x = x
+        self.y = y
+        self.cell_size = cell_size
+        self.interior = interior
+
+        # outer edges of the tile cells
+        self.extent = (float(np.min(x) - cell_size / 2),
+                       float(np.max(x) + cell_size / 2),
+                       float(np.min(y) - cell_size / 2),
+                       float(np.max(y) + cell_size / 2))
+
+        # prefix that WindNinja will use for the tile outputs
+        self.windnina_filenames = os.path.basename(file_base)
+        self.windninja_topo = '{}.asc'.format(file_base)
+        self.windninja_topo_prj = '{}.prj'.format(file_base)
+        self.windninja_topo_tif = '{}.tif'.format(file_base)
+        self.elevation_file = self.windninja_topo
+
+    def weights(self, x, y, overlap):
+        """Feathered weights of the tile on a grid. The weight ramps from
+        zero to one across the overlap at the edges shared with other
+        tiles, the edges of the domain are not feathered.
+
+        Arguments:
+            x {array} -- x coordinates of the grid cell centers
+            y {array} -- y coordinates of the grid cell centers
+            overlap {float} -- width of the overlap
+
+        Returns:
+            array -- weights with rows from north to south
+        """
+
+        xmin, xmax, ymin, ymax = self.extent
+
+        def ramp(c, low, high, low_interior, high_interior):
+            w = np.where((c >= low) & (c <= high), 1.0, 0.0)
+            if low_interior:
+                w = np.minimum(w, np.clip((c - low) / overlap, 0, 1))
+            if high_interior:
+                w = np.minimum(w, np.clip((high - c) / overlap, 0, 1))
+            return w
+
+        wx = ramp(x, xmin, xmax, self.interior['west'],
+                  self.interior['east'])
+        wy = ramp(y, ymin, ymax, self.interior['south'],
+                  self.interior['north'])
+
+        return np.outer(wy, wx) + EDGE_WEIGHT
+
+
+def make_tiles(x, y, tile_size, overlap, file_base, align=1):
+    """Split the dem into overlapping tiles
+
+    Arguments:
+        x {array} -- x coordinates of the dem
+        y {array} -- y coordinates of the dem, north to south
+        tile_size {float} -- width and height of a tile
+        overlap {float} -- width of the overlap between tiles
+        file_base {str} -- path of the WindNinja topo without the
+            extension, the tiles add `_tile<n>`
+
+    Keyword Arguments:
+        align {int} -- tiles start at a multiple of this many cells
+            from the lower left corner (default: {1})
+
+    Returns:
+        list -- list of `Tile`, empty if the dem fits in one tile
+    """
+
+    cell_size = float(np.abs(x[1] - x[0]))
+    tile_cells = int(np.ceil(tile_size / cell_size))
+    overlap_cells = int(np.ceil(overlap / cell_size))
+
+    ny, nx = len(y), len(x)
+    if tile_cells >= nx and tile_cells >= ny:
+        return []
+
+    cols = split_axis(nx, tile_cells, overlap_cells, align)
+
+    # rows are split from the south edge so the lower left corner of
+    # every tile is aligned
+    rows = [(ny - stop, ny - start) for start, stop in
+            split_axis(ny, tile_cells, overlap_cells, align)]
+
+    tiles = []
+    for r, (r0, r1) in enumerate(rows):
+        for c, (c0, c1) in enumerate(cols):
+            interior = {
+                'west': c > 0,
+                'east': c < len(cols) - 1,
+                'south': r > 0,
+                'north': r < len(rows) - 1
+            }
+            tiles.append(Tile(
+                'tile{}'.format(len(tiles)), (r0, r1), (c0, c1),
+                x[c0:c1], y[r0:r1], cell_size, interior,
+                '{}_tile{}'.format(file_base, len(tiles))))
+
+    return tiles
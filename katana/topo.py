@@ -1,12 +1,71 @@
+import json
 import logging
 import os
 
 import numpy as np
 from netCDF4 import Dataset
 
+from katana import topo_geotiff
+from katana.geometry import utm_wkt
+from katana.resample import UNITS, ResampledGrid, resample_factor
+from katana.tiles import GridWindow, make_tiles
+
+# cells formatted at a time when writing an ascii grid
+BLOCK_CELLS = 2**16
+
+# size of the write buffer for an ascii grid
+BUFFER_SIZE = 2**24
+
+
+def write_ascii_grid(fp, variable, header, nodata, block_cells=BLOCK_CELLS):
+    """Write a 2D netCDF variable as an ascii grid. The variable is read
+    in blocks of rows and each block is formatted with a single format
+    operation, so the whole grid is never in memory. Values are written
+    with 17 significant digits so they read back exactly and masked
+    cells are written as `nodata`. The grid is written to a temporary
+    file that replaces `fp` when complete.
+
+    Arguments:
+        fp {str} -- path of the ascii grid
+        variable {netCDF4.Variable} -- 2D variable to write
+        header {str} -- ascii grid header without the last new line
+        nodata {float} -- value for masked cells
+
+    Keyword Arguments:
+        block_cells {int} -- number of cells formatted at a time
+            (default: {BLOCK_CELLS})
+    """
+
+    nrows, ncols = variable.shape
+    block_rows = max(1, block_cells // ncols)
+    row_format = ' '.join(['%.17g'] * ncols)
+
+    tmp_file = '{}.tmp'.format(fp)
+    try:
+        with open(tmp_file, 'w', buffering=BUFFER_SIZE) as f:
+            f.write(header + '\n')
+
+            for start in range(0, nrows, block_rows):
+                block = variable[start:start + block_rows]
+                block = np.ma.filled(block.astype(np.float64), nodata)
+
+                block_format = '\n'.join([row_format] * block.shape[0])
+                f.write(block_format % tuple(block.ravel().tolist()))
+                f.write('\n')
+
+        os.replace(tmp_file, fp)
+
+    except BaseException:
+        if os.path.isfile(tmp_file):
+            os.remove(tmp_file)
+        raise
+
 
 class Topo():
-    """Class for working with and storing topo information
+    """Class for working with and storing topo information. The WindNinja
+    elevation file is an ascii dem with a prj or a GeoTIFF. It is only
+    written when the topo file, the suffix, the format or the fill value
+    changed, a sidecar next to it records what it was made from.
     """
 
     FILLVAL = -9999
@@ -24,6 +83,13 @@ class Topo():
         self.topo_filename = self.config['topo']['filename']
         self.zone_letter = self.config['topo']['zone_letter']
         self.zone_number = self.config['topo']['zone_number']
+        self.elevation_format = self.config['topo']['elevation_format']
+        self.resample_method = self.config['topo']['resample_method']
+
+        if self.elevation_format == 'geotiff' and \
+                not topo_geotiff.gdal_available():
+            raise ImportError('elevation_format is geotiff but the '
+                              'GDAL package is not installed')
 
         # prefix that wind ninja will use in the file naming convention
         self.windninja_prefix = os.path.splitext(
@@ -44,76 +110,348 @@ class Topo():
             self.windnina_filenames
         ))
 
-        # get info about model domain
-        self.get_topo_stats()
-        self.x1 = self.topo_stats['x']
-        self.y1 = self.topo_stats['y']
+        self.windninja_topo_tif = os.path.join(dir_topo, '{}.tif'.format(
+            self.windnina_filenames
+        ))
+
+        self.windninja_topo_sidecar = os.path.join(
+            dir_topo, '{}.json'.format(self.windnina_filenames))
+
+        # elevation file that WindNinja is given
+        if self.elevation_format == 'geotiff':
+            self.elevation_file = self.windninja_topo_tif
+        else:
+            self.elevation_file = self.windninja_topo
+
+        with Dataset(self.topo_filename, 'r') as ds:
+
+            # get info about model domain
+            self.get_topo_stats(ds)
+            self.x1 = self.topo_stats['x']
+            self.y1 = self.topo_stats['y']
 
-        # write new files
-        self.netcdf_dem_to_ascii()
+            # overlapping tiles that WindNinja runs on separately
+            self.tiles = self.make_tiles(
+                os.path.join(dir_topo, self.windnina_filenames))
+
+            # write new files if the dem changed
+            if self.windninja_topo_current():
+                self._logger.debug(
+                    'Using the existing WindNinja topo {}'.format(
+                        self.elevation_file))
+            else:
+                for tile in [None] + self.tiles:
+                    if self.elevation_format == 'geotiff':
+                        self.netcdf_dem_to_geotiff(ds, tile)
+                    else:
+                        self.netcdf_dem_to_ascii(ds, tile)
+                self.write_sidecar()
 
         self._logger.debug('Topo initialized')
 
-    def netcdf_dem_to_ascii(self):
+    def topo_source(self):
+        """Identity of the topo file and the options the WindNinja topo
+        is made with
+
+        Returns:
+            dict -- topo file with its size and modification time, the
+                suffix, the format and the fill value
+        """
+
+        stat = os.stat(self.topo_filename)
+        return {
+            'file': os.path.abspath(self.topo_filename),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'suffix': self.config['topo']['wind_ninja_topo_suffix'],
+            'format': self.elevation_format,
+            'resample': [self.resample_method, self.resample_resolution()],
+            'tiles': [[t.rows, t.cols] for t in self.tiles],
+            'fillval': self.FILLVAL
+        }
+
+    def make_tiles(self, file_base):
+        """Split the dem into overlapping tiles if `tile_size` is set.
+        The tiles start at a multiple of the WindNinja mesh resolution
+        so their outputs line up.
+
+        Arguments:
+            file_base {str} -- path of the WindNinja topo without the
+                extension
+
+        Returns:
+            list -- list of `katana.tiles.Tile`
+        """
+
+        tile_size = self.config['topo']['tile_size']
+        if tile_size is None:
+            return []
+
+        wn = self.config['wind_ninja']
+        mesh_resolution = wn['mesh_resolution'] * \
+            UNITS[wn['units_mesh_resolution']]
+
+        tiles = make_tiles(
+            self.x1, self.y1, tile_size, self.config['topo']['tile_overlap'],
+            file_base, align=resample_factor(
+                np.abs(self.topo_stats['dv']), mesh_resolution))
+
+        for tile in tiles:
+            if self.elevation_format == 'geotiff':
+                tile.elevation_file = tile.windninja_topo_tif
+
+        self._logger.info('Split the dem into {} tiles'.format(len(tiles)))
+
+        return tiles
+
+    def topo_outputs(self):
+        """Size and modification time of the WindNinja topo files
+
+        Returns:
+            dict -- size and modification time by file name
+        """
+
+        files = []
+        for item in [self] + self.tiles:
+            if self.elevation_format == 'geotiff':
+                files.append(item.windninja_topo_tif)
+            else:
+                files.extend([item.windninja_topo, item.windninja_topo_prj])
+
+        outputs = {}
+        for fp in files:
+            stat = os.stat(fp)
+            outputs[os.path.basename(fp)] = [stat.st_size, stat.st_mtime_ns]
+
+        return outputs
+
+    def windninja_topo_current(self):
+        """Check the sidecar to see if the WindNinja topo files were made
+        from the current topo file and have not changed since
+
+        Returns:
+            bool -- True if the files can be used
+        """
+
+        try:
+            with open(self.windninja_topo_sidecar, 'r') as f:
+                sidecar = json.load(f)
+
+            return sidecar['source'] == self.topo_source() and \
+                sidecar['outputs'] == self.topo_outputs()
+
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+    def write_sidecar(self):
+        """Record the topo file and the WindNinja topo files in the
+        sidecar
+        """
+
+        sidecar = {
+            'source': self.topo_source(),
+            'outputs': self.topo_outputs()
+        }
+
+        tmp_file = '{}.tmp'.format(self.windninja_topo_sidecar)
+        with open(tmp_file, 'w') as f:
+            json.dump(sidecar, f, indent=2)
+        os.replace(tmp_file, self.windninja_topo_sidecar)
+
+    def netcdf_dem_to_ascii(self, ds=None, tile=None):
         """
         Write a geotagged ascii dem for use with WindNinja
         Writes the ascii and prj files
 
+        Keyword Arguments:
+            ds {netCDF4.Dataset} -- open topo file, the topo file is
+                opened if not provided (default: {None})
+            tile {Tile} -- write the files of a tile instead of the
+                whole dem (default: {None})
+
         Returns:
             None
         """
 
-        # get the prj file name
-        asc_dir = os.path.dirname(self.windninja_topo)
-        bn = os.path.splitext(os.path.basename(self.windninja_topo))[0]
-        fp_prj = os.path.join(asc_dir, bn+'.prj')
+        if ds is None:
+            with Dataset(self.topo_filename, 'r') as ds:
+                return self.netcdf_dem_to_ascii(ds, tile)
 
-        # get the netcdf
-        ds = Dataset(self.topo_filename, 'r')
-        dem = ds.variables['dem'][:]
+        target = self if tile is None else tile
 
         # create header for projection
-        if hasattr(ds.variables['dem'], 'grid_mapping'):
-            gridmap = ds.variables['dem'].grid_mapping
-            prj_head = ds.variables[gridmap].spatial_ref
-        else:
-            self._logger.error('No projection info in topo file')
+        prj_head = self.projection(ds)
 
-        ds.close()
+        dem, xll, yll, cell_size = self.elevation_grid(ds, tile)
 
-        cell_size = np.abs(self.topo_stats['dv'])
         # write the header
         asc_head = "ncols {}\nnrows {}\nxllcorner {}\nyllcorner \
             {}\ncellsize {}\nNODATA_value {}"
         asc_head = asc_head.format(
-            self.topo_stats['nx'],
-            self.topo_stats['ny'],
-            np.min(self.topo_stats['x']) - cell_size/2.0,
-            np.min(self.topo_stats['y']) - cell_size/2.0,
-            np.abs(self.topo_stats['dv']),
+            dem.shape[1],
+            dem.shape[0],
+            xll,
+            yll,
+            cell_size,
             self.FILLVAL)
 
-        # write files
-        np.savetxt(self.windninja_topo, dem, header=asc_head, comments='')
+        # write files, the dem is streamed from the netcdf
+        write_ascii_grid(target.windninja_topo, dem, asc_head, self.FILLVAL)
 
         # write prj
-        with open(fp_prj, 'w') as prj_file:
+        with open(target.windninja_topo_prj, 'w') as prj_file:
             prj_file.write(prj_head)
 
-    def get_topo_stats(self):
+    def netcdf_dem_to_geotiff(self, ds=None, tile=None):
+        """
+        Write a tiled and compressed GeoTIFF dem with the projection
+        for use with WindNinja
+
+        Keyword Arguments:
+            ds {netCDF4.Dataset} -- open topo file, the topo file is
+                opened if not provided (default: {None})
+            tile {Tile} -- write the file of a tile instead of the
+                whole dem (default: {None})
+
+        Returns:
+            None
+        """
+
+        if ds is None:
+            with Dataset(self.topo_filename, 'r') as ds:
+                return self.netcdf_dem_to_geotiff(ds, tile)
+
+        target = self if tile is None else tile
+
+        # the same corner and cell size as the ascii dem
+        dem, xll, yll, cell_size = self.elevation_grid(ds, tile)
+        geotransform = (
+            float(xll),
+            float(cell_size),
+            0.0,
+            float(yll + dem.shape[0] * cell_size),
+            0.0,
+            -float(cell_size))
+
+        topo_geotiff.write_geotiff(
+            target.windninja_topo_tif, dem, geotransform,
+            self.projection(ds), self.FILLVAL)
+
+    def resample_resolution(self):
+        """
+        Resolution in meters to resample the dem to for WindNinja, the
+        WindNinja mesh resolution if `resample_resolution` is not set
+
+        Returns:
+            float -- resolution or None if the dem is not resampled
+        """
+
+        # inicheck reads the none option as None
+        if self.resample_method is None:
+            return None
+
+        resolution = self.config['topo']['resample_resolution']
+        if resolution is None:
+            wn = self.config['wind_ninja']
+            resolution = wn['mesh_resolution'] * \
+                UNITS[wn['units_mesh_resolution']]
+
+        return float(resolution)
+
+    def elevation_grid(self, ds, tile=None):
+        """
+        Dem for the WindNinja elevation file, resampled to
+        `resample_resolution` if it is finer. The first row is the
+        north edge.
+
+        Arguments:
+            ds {netCDF4.Dataset} -- open topo file
+
+        Keyword Arguments:
+            tile {Tile} -- only the dem in the tile (default: {None})
+
+        Returns:
+            tuple -- dem variable, `GridWindow` or `ResampledGrid`, the
+                lower left corner x and y and the cell size
+        """
+
+        dem = ds.variables['dem']
+        x = self.topo_stats['x']
+        y = self.topo_stats['y']
+
+        if tile is not None:
+            dem = GridWindow(dem, tile.rows, tile.cols)
+            x = tile.x
+            y = tile.y
+
+        cell_size = np.abs(self.topo_stats['dv'])
+        xll = np.min(x) - cell_size/2.0
+        yll = np.min(y) - cell_size/2.0
+
+        resolution = self.resample_resolution()
+        if resolution is None:
+            return dem, xll, yll, cell_size
+
+        factor = resample_factor(cell_size, resolution)
+        if factor == 1:
+            return dem, xll, yll, cell_size
+
+        self._logger.info(
+            'Resampling the dem for WindNinja from {} to {} with the '
+            '{} method'.format(cell_size, cell_size * factor,
+                               self.resample_method))
+
+        # the resampled rows start at the north edge
+        dem = ResampledGrid(dem, factor, method=self.resample_method)
+        ytop = np.max(y) + cell_size/2.0
+        cell_size = cell_size * factor
+
+        return dem, xll, ytop - dem.shape[0] * cell_size, cell_size
+
+    def projection(self, ds):
+        """
+        Projection of the dem from its grid mapping variable, or the
+        WGS84 projection of the `zone_number` and `zone_letter` UTM zone
+        if the topo file has no projection info
+
+        Arguments:
+            ds {netCDF4.Dataset} -- open topo file
+
+        Returns:
+            str -- WKT of the projection
+        """
+
+        if hasattr(ds.variables['dem'], 'grid_mapping'):
+            gridmap = ds.variables['dem'].grid_mapping
+            spatial_ref = getattr(ds.variables[gridmap], 'spatial_ref', '')
+            if spatial_ref:
+                return spatial_ref
+
+        self._logger.warning(
+            'No projection info in topo file, using UTM zone {}{}'.format(
+                self.zone_number, self.zone_letter))
+
+        return utm_wkt(self.zone_number, self.zone_letter)
+
+    def get_topo_stats(self, ds=None):
         """
         Get stats about topo from the topo file
+
+        Keyword Arguments:
+            ds {netCDF4.Dataset} -- open topo file, the topo file is
+                opened if not provided (default: {None})
+
         Returns:
             ts - dictionary of topo header data
         """
 
-        fp = os.path.abspath(self.topo_filename)
+        if ds is None:
+            with Dataset(os.path.abspath(self.topo_filename), 'r') as ds:
+                return self.get_topo_stats(ds)
 
-        ds = Dataset(fp, 'r')
         y = ds.variables['y'][:]
         x = ds.variables['x'][:]
         units = ds.variables['y'].units
-        ds.close()
 
         ts = {}
         ts['units'] = units
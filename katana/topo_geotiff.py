@@ -0,0 +1,104 @@
+"""
+Write the WindNinja elevation file as a GeoTIFF instead of an ascii
+grid. The GeoTIFF is tiled and compressed with the projection embedded,
+so it is smaller than the ascii grid and WindNinja reads it without
+parsing text.
+
+GDAL is an optional dependency, install it with
+`pip install katana[gdal]`.
+"""
+
+import os
+
+import numpy as np
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+# creation options for a tiled and compressed GeoTIFF, the floating
+# point predictor helps the compression of smooth elevations
+CREATION_OPTIONS = [
+    'TILED=YES',
+    'BLOCKXSIZE=256',
+    'BLOCKYSIZE=256',
+    'COMPRESS=DEFLATE',
+    'PREDICTOR=3',
+    'BIGTIFF=IF_SAFER'
+]
+
+# rows written at a time, a multiple of the tile height
+BLOCK_ROWS = 1024
+
+
+def gdal_available():
+    """Check if the GDAL python bindings can be imported
+
+    Returns:
+        bool -- True if GDAL is installed
+    """
+
+    return gdal is not None
+
+
+def write_geotiff(fp, variable, geotransform, projection, nodata,
+                  block_rows=BLOCK_ROWS):
+    """Write a 2D netCDF variable as a GeoTIFF. The variable is read in
+    blocks of rows so the whole grid is never in memory. Masked cells
+    are written as `nodata`. The GeoTIFF is written to a temporary file
+    that replaces `fp` when complete.
+
+    Arguments:
+        fp {str} -- path of the GeoTIFF
+        variable {netCDF4.Variable} -- 2D variable to write, the first
+            row is the north edge
+        geotransform {tuple} -- GDAL geotransform of the grid
+        projection {str} -- WKT of the projection
+        nodata {float} -- value for masked cells
+
+    Keyword Arguments:
+        block_rows {int} -- number of rows written at a time
+            (default: {BLOCK_ROWS})
+
+    Raises:
+        ValueError: if there is no projection
+    """
+
+    if not projection:
+        raise ValueError('No projection for the GeoTIFF {}'.format(fp))
+
+    if gdal is None:
+        raise ImportError('Writing a GeoTIFF requires GDAL')
+
+    nrows, ncols = variable.shape
+    if np.dtype(variable.dtype) == np.float64:
+        data_type = gdal.GDT_Float64
+    else:
+        data_type = gdal.GDT_Float32
+
+    tmp_file = '{}.tmp'.format(fp)
+    try:
+        driver = gdal.GetDriverByName('GTiff')
+        ds = driver.Create(tmp_file, ncols, nrows, 1, data_type,
+                           options=CREATION_OPTIONS)
+        ds.SetGeoTransform(geotransform)
+        ds.SetProjection(projection)
+
+        band = ds.GetRasterBand(1)
+        band.SetNoDataValue(nodata)
+
+        for start in range(0, nrows, block_rows):
+            block = np.ma.filled(variable[start:start + block_rows], nodata)
+            band.WriteArray(block, 0, start)
+
+        band.FlushCache()
+        band = None
+        ds = None
+
+        os.replace(tmp_file, fp)
+
+    except BaseException:
+        if os.path.isfile(tmp_file):
+            os.remove(tmp_file)
+        raise
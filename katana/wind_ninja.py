@@ -1,5 +1,8 @@
 import logging
-import subprocess
+import os
+import time
+
+from katana.supervisor import CommandTimeout, supervisor
 
 
 class WindNinja:
@@ -7,7 +10,8 @@ class WindNinja:
     a single run of WindNinja
     """
 
-    def __init__(self, config, wn_cfg_file):
+    def __init__(self, config, wn_cfg_file, timeout=None, idle_timeout=None,
+                 attempts=1, retry_delay=60, retry_reduce_threads=True):
         """[summary]
 
         Arguments:
@@ -16,12 +20,32 @@ class WindNinja:
             wn_cfg_file {str} -- name of the configuration
                                 file that will be passed to
                                 the `WindNinja_cli`
+
+        Keyword Arguments:
+            timeout {float} -- seconds a run can take before it is
+                                killed (default: {None})
+            idle_timeout {float} -- seconds a run can go without any
+                                output before it is killed
+                                (default: {None})
+            attempts {int} -- number of times to run WindNinja before
+                                giving up (default: {1})
+            retry_delay {float} -- seconds to wait before the first
+                                retry, doubled for every retry after
+                                (default: {60})
+            retry_reduce_threads {bool} -- halve the `num_threads` for
+                                every retry (default: {True})
         """
         self._logger = logging.getLogger(__name__)
 
         self.config = config
         self.wn_cfg_file = wn_cfg_file
 
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.attempts = max(1, attempts)
+        self.retry_delay = retry_delay
+        self.retry_reduce_threads = retry_reduce_threads
+
         self.make_wn_cfg()
 
     def make_wn_cfg(self):
@@ -40,39 +64,116 @@ class WindNinja:
 
     def run_wind_ninja(self):
         """
-        Create the command line call to run the WindNinja_cli
+        Create the command line call to run the WindNinja_cli. A failed,
+        timed out or hung run has its partial output removed and is ran
+        again up to `attempts` times.
+        """
+
+        for attempt in range(1, self.attempts + 1):
+            existing = self.output_files()
+
+            if self.call_wind_ninja():
+                return True
+
+            self.remove_partial_output(existing)
+
+            if attempt == self.attempts:
+                break
+
+            delay = self.retry_delay * 2**(attempt - 1)
+            self._logger.warning(
+                'WindNinja attempt {} of {} failed, retrying in {} sec'.format(
+                    attempt, self.attempts, delay))
+            time.sleep(delay)
+
+            if self.retry_reduce_threads and \
+                    self.config.get('num_threads', 1) > 1:
+                self.config['num_threads'] = self.config['num_threads'] // 2
+                self._logger.info('Retrying WindNinja with {} threads'.format(
+                    self.config['num_threads']))
+                self.make_wn_cfg()
+
+        raise Exception('WindNinja has an error')
+
+    def call_wind_ninja(self):
+        """Run the WindNinja_cli once
+
+        Returns:
+            bool -- True if WindNinja ran successfully
         """
 
         # construct call
-        action = 'WindNinja_cli {}'.format(self.wn_cfg_file)
-
-        # run command line using Popen
-        self._logger.info('Running "{}"'.format(action))
-
-        with subprocess.Popen(
-            action,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        ) as s:
-
-            # WindNinja may not push errors to stderr so it's
-            # hard to capture them properly and stream the results
-            # Here, we will stream to the debug and store all the
-            # output. Then write to error if WindNinja exits without
-            # a 0 code.
-            output = []
-            for line in iter(s.stdout.readline, ""):
-                self._logger.debug(line.rstrip())
-                output.append(line.rstrip())
-
-            # if errors then create an exception
-            return_code = s.wait()
-            if return_code:
-                for line in output:
-                    self._logger.error(line)
-                raise Exception('WindNinja has an error')
-                return False
-
-            return True
+        action = ['WindNinja_cli', self.wn_cfg_file]
+
+        self._logger.info('Running "{}"'.format(' '.join(action)))
+
+        # WindNinja may not push errors to stderr so it's
+        # hard to capture them properly and stream the results
+        # Here, the supervisor streams to the debug and stores all the
+        # output. Then write to error if WindNinja exits without
+        # a 0 code.
+        try:
+            return_code, output = supervisor.run(
+                action, self._logger,
+                timeout=self.timeout, idle_timeout=self.idle_timeout)
+
+        except CommandTimeout as e:
+            for line in e.output:
+                self._logger.error(line)
+            self._logger.error(str(e))
+            return False
+
+        # if errors then log the output
+        if return_code:
+            for line in output:
+                self._logger.error(line)
+            return False
+
+        return True
+
+    def output_files(self):
+        """Files and folders in the WindNinja `output_path` with the
+        modification time and size of each file
+
+        Returns:
+            dict -- path to a tuple of modification time and size for
+                the files or None for the folders
+        """
+
+        output_path = self.config.get('output_path')
+        if output_path is None or not os.path.isdir(output_path):
+            return {}
+
+        paths = {}
+        for root, dirs, files in os.walk(output_path):
+            paths.update([(os.path.join(root, d), None) for d in dirs])
+            for f in files:
+                path = os.path.join(root, f)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                paths[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return paths
+
+    def remove_partial_output(self, existing):
+        """Remove the files and folders that a failed run left in the
+        `output_path`. Files that were there before the run but were
+        written by the run are removed as well, they can't be trusted
+        by a later resume.
+
+        Arguments:
+            existing {dict} -- paths from `output_files` before the run
+        """
+
+        partial = [path for path, stat in self.output_files().items()
+                   if path not in existing or existing[path] != stat]
+
+        # deepest paths first so folders are empty when removed
+        for path in sorted(partial, key=len, reverse=True):
+            self._logger.debug('Removing partial output {}'.format(path))
+            if os.path.isdir(path):
+                os.rmdir(path)
+            else:
+                os.remove(path)
@@ -0,0 +1,441 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+class WorkQueue():
+    """Queue of tasks shared between processes or nodes through lock
+    files in a directory on a shared filesystem. A task is claimed by
+    atomically creating its lock file. The owner touches its lock files
+    as a heartbeat and a lock that has not been touched within the
+    heartbeat timeout can be taken over by another worker. A lock is
+    stale when its modification time has not changed for the heartbeat
+    timeout as seen by the clock of the worker that watches it, so the
+    clocks of the nodes and the file server do not have to agree. A
+    worker has to watch a lock for the whole timeout before taking it
+    over. The owner checks its locks with each heartbeat and notices
+    when a task was taken over.
+
+    Each task ends up with either a `.done` or `.failed` marker. The
+    `.failed` marker is kept for the run that wrote it, a worker of a
+    run with another `run_id` claims the task again.
+    """
+
+    def __init__(self, directory, heartbeat_timeout=600, worker_id=None,
+                 run_id=None, on_lost=None):
+        """Init the WorkQueue
+
+        Arguments:
+            directory {str} -- shared directory for the lock files
+
+        Keyword Arguments:
+            heartbeat_timeout {float} -- seconds without a heartbeat
+                before a task can be taken over (default: {600})
+            worker_id {str} -- name of the worker, defaults to the
+                hostname, pid and a random string (default: {None})
+            run_id {str} -- name shared by the workers of one run
+                (default: {None})
+            on_lost {function} -- called with the task name when the
+                heartbeat finds that a claimed task was taken over
+                (default: {None})
+        """
+
+        self._logger = logging.getLogger(__name__)
+
+        self.directory = directory
+        self.heartbeat_timeout = heartbeat_timeout
+        self.heartbeat_interval = heartbeat_timeout / 4.0
+
+        if worker_id is None:
+            worker_id = '{}-{}-{}'.format(
+                socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self.worker_id = worker_id
+        self.run_id = run_id
+        self.on_lost = on_lost
+
+        # lock token of each claimed task
+        self.claimed = {}
+        self.lost = set()
+
+        # lock token, modification time and the time it was first seen
+        # for the locks of other workers
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread = None
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def task_file(self, task, kind):
+        """Path to one of the task's files
+
+        Arguments:
+            task {str} -- task name
+            kind {str} -- lock, done or failed
+
+        Returns:
+            str -- path to the file
+        """
+
+        return os.path.join(self.directory, '{}.{}'.format(task, kind))
+
+    def is_finished(self, task):
+        """Task has been completed or has failed
+
+        Arguments:
+            task {str} -- task name
+
+        Returns:
+            bool -- True if the task is finished
+        """
+
+        return os.path.isfile(self.task_file(task, 'done')) or \
+            self.failure(task) is not None
+
+    def failure(self, task):
+        """Error message of a task that failed in this run
+
+        Arguments:
+            task {str} -- task name
+
+        Returns:
+            str -- error message or None if the task has not failed
+        """
+
+        marker = self._read_marker(task, 'failed')
+        if marker is None or marker.get('run') != self.run_id:
+            return None
+
+        return marker.get('error')
+
+    def owns(self, task):
+        """This worker still holds the lock of a claimed task
+
+        Arguments:
+            task {str} -- task name
+
+        Returns:
+            bool -- True if the lock is this worker's
+        """
+
+        with self._lock:
+            token = self.claimed.get(task)
+
+        owner = self._read_lock(task)
+        return token is not None and owner is not None and \
+            owner.get('token') == token
+
+    def reset(self, task):
+        """Remove the `.done` and `.failed` markers so the task can be
+        claimed again
+
+        Arguments:
+            task {str} -- task name
+        """
+
+        for kind in ['done', 'failed']:
+            self._remove_marker(task, kind)
+
+    def run_once(self, task, func, poll_interval=1):
+        """Run a function in only one of the workers. The worker that
+        claims the task runs the function and the others wait for the
+        task to finish. A worker that stops sending a heartbeat while
+        running the function is taken over, so the function should be
+        safe to run again.
+
+        Arguments:
+            task {str} -- task name
+            func {function} -- function to run
+
+        Keyword Arguments:
+            poll_interval {float} -- seconds between checks for the task
+                to finish (default: {1})
+
+        Raises:
+            Exception: if the function failed in any worker
+        """
+
+        while not self.is_finished(task):
+            if not self.claim(task):
+                time.sleep(poll_interval)
+                continue
+
+            try:
+                func()
+            except Exception as e:
+                self.fail(task, str(e))
+                raise
+
+            self.complete(task)
+
+        error = self.failure(task)
+        if error is not None:
+            raise Exception('Task {} failed: {}'.format(task, error))
+
+    def claim(self, task):
+        """Try to claim a task. A task can be claimed if it isn't
+        finished and nobody holds its lock or the lock is stale. The
+        `.failed` marker of another run is removed so the task runs
+        again.
+
+        Arguments:
+            task {str} -- task name
+
+        Returns:
+            bool -- True if this worker now owns the task
+        """
+
+        if self.is_finished(task):
+            return False
+
+        token = self._create_lock(task)
+        if token is None:
+            owner = self._read_lock(task)
+            if owner is None or not self._is_stale(task, owner):
+                return False
+
+            token = self._take_over(task, owner)
+            if token is None:
+                return False
+
+        with self._lock:
+            self.claimed[task] = token
+            self.lost.discard(task)
+            self._seen.pop(task, None)
+
+        # finished between the check and the claim
+        if self.is_finished(task):
+            self.release(task)
+            return False
+
+        if self._read_marker(task, 'failed') is not None:
+            self._logger.info('Running task {} that failed in another '
+                              'run'.format(task))
+            self._remove_marker(task, 'failed')
+
+        self._logger.debug('{} claimed task {}'.format(self.worker_id, task))
+        return True
+
+    def complete(self, task):
+        """Mark a task as done and release its lock
+
+        Arguments:
+            task {str} -- task name
+        """
+
+        self._write_marker(task, 'done', {})
+        self.release(task)
+
+    def fail(self, task, message):
+        """Mark a task as failed and release its lock. Failed tasks are
+        not claimed again in the same run until the `.failed` marker is
+        removed.
+
+        Arguments:
+            task {str} -- task name
+            message {str} -- description of the failure
+        """
+
+        self._write_marker(task, 'failed', {'error': message})
+        self.release(task)
+
+    def release(self, task):
+        """Release the lock on a task
+
+        Arguments:
+            task {str} -- task name
+        """
+
+        with self._lock:
+            token = self.claimed.pop(task, None)
+
+        owner = self._read_lock(task)
+        if owner is not None and token is not None and \
+                owner.get('token') == token:
+            try:
+                os.remove(self.task_file(task, 'lock'))
+            except FileNotFoundError:
+                pass
+
+    def heartbeat(self):
+        """Touch the lock files of all the claimed tasks. A task whose
+        lock is gone or belongs to another worker has been taken over,
+        it is moved to `lost` and `on_lost` is called.
+        """
+
+        with self._lock:
+            tasks = list(self.claimed)
+
+        for task in tasks:
+            if self.owns(task):
+                try:
+                    os.utime(self.task_file(task, 'lock'))
+                    continue
+                except FileNotFoundError:
+                    pass
+
+            with self._lock:
+                if self.claimed.pop(task, None) is None:
+                    continue
+                self.lost.add(task)
+
+            self._logger.warning('{} lost the lock of task {}'.format(
+                self.worker_id, task))
+            if self.on_lost is not None:
+                self.on_lost(task)
+
+    def start_heartbeat(self):
+        """Start a thread that sends a heartbeat for the claimed tasks
+        """
+
+        self._stop.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        """Stop the heartbeat thread
+        """
+
+        self._stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+
+    def __enter__(self):
+        self.start_heartbeat()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.stop_heartbeat()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+    def _create_lock(self, task):
+        """Atomically create the lock file for a task
+
+        Returns:
+            str -- token of the lock or None if another worker holds
+                the lock
+        """
+
+        try:
+            fd = os.open(self.task_file(task, 'lock'),
+                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+
+        token = uuid.uuid4().hex
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'worker': self.worker_id,
+                'token': token,
+                'claimed': time.time()
+            }, f)
+
+        return token
+
+    def _read_lock(self, task):
+        """Read the owner of a task's lock
+
+        Returns:
+            dict -- owner information with the lock's modification
+                time or None if there is no readable lock
+        """
+
+        lock_file = self.task_file(task, 'lock')
+        try:
+            mtime = os.path.getmtime(lock_file)
+            with open(lock_file, 'r') as f:
+                owner = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        owner['mtime'] = mtime
+        return owner
+
+    def _is_stale(self, task, owner):
+        """The lock has not changed for the heartbeat timeout since this
+        worker first saw it. Only the worker's own clock is used.
+        """
+
+        key = (owner.get('token'), owner['mtime'])
+        now = time.monotonic()
+
+        with self._lock:
+            seen = self._seen.get(task)
+            if seen is None or seen[0] != key:
+                self._seen[task] = (key, now)
+                return False
+
+        return now - seen[1] > self.heartbeat_timeout
+
+    def _take_over(self, task, owner):
+        """Take over a stale lock. The stale lock is renamed so only one
+        worker can win and then a new lock is created. If the renamed
+        lock turns out to be a newer lock than the one that was judged
+        stale, it is put back.
+
+        Returns:
+            str -- token of the new lock or None if another worker owns
+                the lock
+        """
+
+        lock_file = self.task_file(task, 'lock')
+        stale_file = '{}.stale.{}'.format(lock_file, self.worker_id)
+
+        try:
+            os.rename(lock_file, stale_file)
+        except FileNotFoundError:
+            return None
+
+        try:
+            with open(stale_file, 'r') as f:
+                renamed = json.load(f)
+        except (OSError, ValueError):
+            renamed = {}
+
+        if renamed.get('token') != owner['token']:
+            # another worker took over first, restore its lock
+            try:
+                os.link(stale_file, lock_file)
+            except FileExistsError:
+                pass
+            os.remove(stale_file)
+            return None
+
+        os.remove(stale_file)
+        self._logger.warning('{} taking over task {} from {}'.format(
+            self.worker_id, task, owner['worker']))
+
+        return self._create_lock(task)
+
+    def _read_marker(self, task, kind):
+        try:
+            with open(self.task_file(task, kind), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove_marker(self, task, kind):
+        try:
+            os.remove(self.task_file(task, kind))
+        except FileNotFoundError:
+            pass
+
+    def _write_marker(self, task, kind, content):
+        content.update({'worker': self.worker_id, 'run': self.run_id,
+                        'time': time.time()})
+
+        marker = self.task_file(task, kind)
+        tmp_file = '{}.{}.tmp'.format(marker, self.worker_id)
+        with open(tmp_file, 'w') as f:
+            json.dump(content, f)
+
+        os.replace(tmp_file, marker)
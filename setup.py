@@ -28,6 +28,10 @@ setup(
     test_suite='tests',
     url='https://github.com/usdaarsnwrc/katana',
     zip_safe=False,
+    extras_require={
+        'eccodes': ['eccodes'],
+        'gdal': ['gdal'],
+    },
     entry_points={
         'console_scripts': [
             'run_katana=katana.framework:cli',
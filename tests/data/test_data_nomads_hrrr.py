@@ -8,6 +8,11 @@ test_katana
 Tests for an entire Katana run.
 """
 
+import os
+from copy import deepcopy
+from datetime import date
+
+from katana.framework import Katana
 from tests.test_base import KatanaTestCase
 
 
@@ -34,6 +39,61 @@ class TestNomadsHRRR(KatanaTestCase):
 
         self.assertGold(assert_true=False)
 
+    def test_gold_concurrent(self):
+        """Run the days concurrently and check against the gold standard
+        """
+
+        config = self.change_config_option(
+            'execution', 'num_workers', 2)
+
+        self.assertTrue(self.run_katana(config))
+        self.assertGold()
+
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.out_dir, 'wn_cfg_20190305.txt')))
+
+    def test_gold_total_cores(self):
+        """Run with a core budget and check against the gold standard
+        """
+
+        config = self.change_config_option(
+            'execution', 'total_cores', 4)
+
+        self.assertTrue(self.run_katana(config))
+        self.assertGold()
+
+    def test_gold_pipeline(self):
+        """Crop and run WindNinja in a pipeline and check against
+        the gold standard
+        """
+
+        config = self.change_config_option(
+            'execution', 'pipeline', True)
+
+        self.assertTrue(self.run_katana(config))
+        self.assertGold()
+
+    def test_resume(self):
+        """Rerun skips the completed days unless they are forced
+        """
+
+        config = self.change_config_option('output', 'resume', True)
+        self.assertTrue(self.run_katana(deepcopy(config)))
+
+        k = Katana(deepcopy(config))
+        entry = k.input_data.manifest.load(date(2019, 3, 5))
+        self.assertTrue(len(entry['outputs']) > 0)
+
+        k.run_katana()
+        self.assertEqual(k.input_data.day_list, [])
+        self.assertEqual(
+            entry, k.input_data.manifest.load(date(2019, 3, 5)))
+
+        k = Katana(deepcopy(config), force_days=[date(2019, 3, 5)])
+        k.run_katana()
+        self.assertEqual(k.input_data.day_list, [date(2019, 3, 5)])
+        self.assertGold()
+
     def test_make_new_gribs(self):
         """
         Test if the full Katana suite can run
@@ -1,5 +1,15 @@
 
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
 
+import netCDF4 as nc
+import numpy as np
+
+from katana.data.wrf_out import slice_wrf_file
+from katana.framework import Katana
 from tests.test_base import KatanaTestCase
 
 
@@ -41,3 +51,137 @@ class TestWRFout(KatanaTestCase):
         self.assertTrue(self.run_katana(config))
 
         self.assertGold(data_type='wrf_out', assert_true=False)
+
+    def test_gold_chunks(self):
+        """Run the WRF file in chunks and check against the gold standard
+        """
+
+        adj_config = {
+            'input': {
+                'data_type': 'wrf_out',
+                'wrf_filename': './Lakes/input/wrfout_d02_2019-03-05_12_00_00_small.nc',  # noqa
+                'wrf_num_chunks': 2
+            }
+        }
+        config = self.update_config(adj_config)
+
+        self.assertTrue(self.run_katana(config))
+        self.assertGold(data_type='wrf_out')
+
+    def test_stale_chunks(self):
+        """Chunk folders left by an interrupted run are replaced
+        """
+
+        adj_config = {
+            'input': {
+                'data_type': 'wrf_out',
+                'wrf_filename': './Lakes/input/wrfout_d02_2019-03-05_12_00_00_small.nc',  # noqa
+                'wrf_num_chunks': 2
+            }
+        }
+        config = self.update_config(adj_config)
+
+        stale = os.path.join(self.out_dir, 'tmp', 'chunk0',
+                             'topo_windninja_topo_03-04-2019_1200_vel.asc')
+        os.makedirs(os.path.dirname(stale))
+        open(stale, 'w').close()
+
+        self.assertTrue(self.run_katana(config))
+        self.assertFalse(os.path.isdir(os.path.join(
+            self.out_dir, 'data20190304')))
+
+    def test_chunk_workers(self):
+        """The chunks run on at most num_workers processes
+        """
+
+        adj_config = {
+            'input': {
+                'data_type': 'wrf_out',
+                'wrf_filename': './Lakes/input/wrfout_d02_2019-03-05_12_00_00_small.nc',  # noqa
+                'wrf_num_chunks': 4
+            },
+            'execution': {
+                'num_workers': 2
+            }
+        }
+        config = self.update_config(adj_config)
+
+        k = Katana(config)
+        chunk_files = ['chunk{}.nc'.format(idx) for idx in range(4)]
+        with patch.object(k.input_data, 'split_wrf_file',
+                          return_value=chunk_files), \
+                patch('katana.data.wrf_out.execution.run_concurrent',
+                      return_value={}) as run:
+            k.input_data.run_chunks()
+
+        tasks, num_workers, _ = run.call_args[0]
+        self.assertEqual(len(tasks), 4)
+        self.assertEqual(num_workers, 2)
+
+
+class TestSliceWRF(unittest.TestCase):
+    """Test slicing a wrfout file along Time
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wrf_file = os.path.join(self.tmp_dir, 'wrfout.nc')
+
+        with nc.Dataset(self.wrf_file, 'w') as ds:
+            ds.TITLE = 'OUTPUT FROM WRF V4.0 MODEL'
+            ds.DX = 1000.0
+            ds.createDimension('Time', None)
+            ds.createDimension('DateStrLen', 19)
+            ds.createDimension('south_north', 3)
+            ds.createDimension('west_east', 4)
+            ds.createDimension('bottom_top', 2)
+
+            times = ds.createVariable('Times', 'S1', ('Time', 'DateStrLen'))
+            times.set_auto_chartostring(False)
+            times[0:6] = np.array(
+                [list('2019-03-05_{:02d}:00:00'.format(12 + idx))
+                 for idx in range(6)], 'S1')
+
+            t2 = ds.createVariable(
+                'T2', 'f4', ('Time', 'south_north', 'west_east'))
+            t2.units = 'K'
+            t2[:] = np.arange(6 * 12).reshape(6, 3, 4)
+
+            qcloud = ds.createVariable(
+                'QCLOUD', 'f4',
+                ('Time', 'bottom_top', 'south_north', 'west_east'))
+            qcloud[:] = np.ones((6, 2, 3, 4))
+
+            xlat = ds.createVariable(
+                'XLAT', 'f4', ('south_north', 'west_east'))
+            xlat[:] = 43.0
+
+            ds.createVariable('NOT_NEEDED', 'f4', ('Time', 'west_east'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_slice_wrf_file(self):
+        """Slice the time steps and keep the attributes
+        """
+
+        out_file = os.path.join(self.tmp_dir, 'chunk.nc')
+        slice_wrf_file(self.wrf_file, out_file, 2, 5)
+
+        with nc.Dataset(out_file) as ds:
+            self.assertEqual(ds.TITLE, 'OUTPUT FROM WRF V4.0 MODEL')
+            self.assertEqual(ds.DX, 1000.0)
+            self.assertEqual(len(ds.dimensions['Time']), 3)
+            self.assertFalse('NOT_NEEDED' in ds.variables)
+
+            self.assertEqual(ds.variables['T2'].units, 'K')
+            np.testing.assert_array_equal(
+                ds.variables['T2'][:],
+                np.arange(6 * 12).reshape(6, 3, 4)[2:5])
+            self.assertEqual(ds.variables['QCLOUD'].shape, (3, 2, 3, 4))
+            self.assertEqual(ds.variables['XLAT'].shape, (3, 4))
+
+            times = [b''.join(t).decode()
+                     for t in ds.variables['Times'][:]]
+            self.assertEqual(times[0], '2019-03-05_14:00:00')
+            self.assertEqual(times[-1], '2019-03-05_16:00:00')
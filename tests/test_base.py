@@ -133,7 +133,7 @@ class KatanaTestCase(unittest.TestCase):
         if config is None:
             config = deepcopy(self.base_config)
 
-        config.raw_cfg[section][option] = value
+        config.raw_cfg.setdefault(section, {})[option] = value
         config.apply_recipes()
         config = cast_all_variables(config, config.mcfg)
 
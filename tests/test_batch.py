@@ -0,0 +1,68 @@
+import os
+from copy import deepcopy
+
+from katana.framework import KatanaBatch
+from tests.test_base import KatanaTestCase
+
+
+class TestKatanaBatch(KatanaTestCase):
+    """Test running multiple domains that share the HRRR crops
+    """
+
+    def setUp(self):
+        self.out_dir2 = os.path.join(self.out_dir, 'domain2')
+        os.makedirs(self.out_dir2)
+
+        self.config2 = self.update_config({
+            'output': {
+                'out_location': self.out_dir2,
+                'wn_cfg': os.path.join(self.out_dir2, 'wn_cfg.txt'),
+                'make_new_gribs': True
+            }
+        })
+
+    def test_check_domains(self):
+        """Domains must be able to share the HRRR crops
+        """
+
+        with self.assertRaises(Exception) as context:
+            KatanaBatch([deepcopy(self.base_config),
+                         deepcopy(self.base_config)])
+
+        self.assertTrue('Each domain must have its own output'
+                        in str(context.exception))
+
+        config = self.change_config_option(
+            'time', 'end_date', '2019-03-05 15:00', config=self.config2)
+
+        with self.assertRaises(Exception) as context:
+            KatanaBatch([deepcopy(self.base_config), config])
+
+        self.assertTrue('same start and end date'
+                        in str(context.exception))
+
+    def test_union_bounds(self):
+        """Union bounds cover all the domains
+        """
+
+        config = self.change_config_option(
+            'input', 'hrrr_buffer', 12000, config=self.config2)
+
+        kb = KatanaBatch([deepcopy(self.base_config), config])
+        bounds = kb.union_bounds()
+
+        self.assertEqual(bounds, kb.domains[1].input_data.latlon_bounds())
+        self.assertTrue(
+            bounds[0] < kb.domains[0].input_data.latlon_bounds()[0])
+
+    def test_batch_gold(self):
+        """Run two domains and check against the gold standard
+        """
+
+        kb = KatanaBatch([deepcopy(self.base_config), self.config2])
+        self.assertTrue(kb.run_katana())
+        self.assertGold()
+
+        self.assertFalse(os.path.isdir(kb.shared_dir))
+        self.assertTrue(len(kb.domains[1].input_data.day_outputs(
+            kb.domains[1].input_data.day_list[0])) > 0)
@@ -0,0 +1,129 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from katana.crop_cache import CropCache
+from katana.grib_crop_wgrib2 import (WIND_NINJA_VARIABLES, crop_hour,
+                                     hrrr_file_name_finder)
+
+
+class TestCropCache(unittest.TestCase):
+    """Tests for the cache of cropped HRRR files"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = CropCache(os.path.join(self.tmp_dir, 'cache'))
+        self.bounds = (-119.1, -118.9, 37.5, 37.7)
+
+        self.fp_in = self.make_file('in.grib2', 'hrrr')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_file(self, name, content):
+        fp = os.path.join(self.tmp_dir, name)
+        with open(fp, 'w') as f:
+            f.write(content)
+        return fp
+
+    def test_key(self):
+        """The key changes with the source file and the crop
+        """
+
+        key = self.cache.key(self.fp_in, self.bounds, WIND_NINJA_VARIABLES)
+
+        self.assertEqual(key, self.cache.key(
+            self.fp_in, self.bounds, WIND_NINJA_VARIABLES))
+        self.assertNotEqual(key, self.cache.key(
+            self.fp_in, (-119.2, -118.9, 37.5, 37.7), WIND_NINJA_VARIABLES))
+        self.assertNotEqual(key, self.cache.key(
+            self.fp_in, self.bounds, WIND_NINJA_VARIABLES, packing='simple'))
+        self.assertNotEqual(key, self.cache.key(
+            self.fp_in, self.bounds, 'TMP:2 m'))
+
+        # a new file with the same name
+        self.make_file('in.grib2', 'new hrrr')
+        self.assertNotEqual(key, self.cache.key(
+            self.fp_in, self.bounds, WIND_NINJA_VARIABLES))
+
+    def test_fetch(self):
+        """A stored crop is linked into the run
+        """
+
+        key = self.cache.key(self.fp_in, self.bounds, WIND_NINJA_VARIABLES)
+        fp_out = os.path.join(self.tmp_dir, 'out.grib2')
+
+        self.assertFalse(self.cache.fetch(key, fp_out))
+        self.assertFalse(os.path.exists(fp_out))
+
+        crop = self.make_file('crop.grib2', 'crop')
+        self.cache.store(key, crop)
+
+        self.assertTrue(self.cache.fetch(key, fp_out))
+        self.assertTrue(os.path.samefile(fp_out, self.cache.path(key)))
+
+    def test_fetch_copy(self):
+        """The crop is copied if it can not be linked
+        """
+
+        key = 'a' * 64
+        self.cache.store(key, self.make_file('crop.grib2', 'crop'))
+        fp_out = os.path.join(self.tmp_dir, 'out.grib2')
+
+        with patch('katana.crop_cache.os.link', side_effect=OSError):
+            self.assertTrue(self.cache.fetch(key, fp_out))
+
+        self.assertFalse(os.path.samefile(fp_out, self.cache.path(key)))
+        with open(fp_out, 'r') as f:
+            self.assertEqual(f.read(), 'crop')
+
+    def test_evict(self):
+        """The least recently used crops are removed first
+        """
+
+        for n, key in enumerate(['a', 'b', 'c']):
+            fp = self.make_file('{}.grib2'.format(key), '0123456789')
+            self.cache.store(key, fp)
+            os.utime(self.cache.path(key), ns=(n * 10**9, n * 10**9))
+
+        cache = CropCache(self.cache.directory, max_size=20)
+
+        # a was stored first but used last
+        self.assertTrue(cache.fetch('a', os.path.join(self.tmp_dir, 'out')))
+        cache.evict()
+
+        self.assertTrue(os.path.isfile(cache.path('a')))
+        self.assertFalse(os.path.isfile(cache.path('b')))
+        self.assertTrue(os.path.isfile(cache.path('c')))
+
+    def test_crop_hour(self):
+        """A second run uses the cached crop without cropping
+        """
+
+        hrrr_dir = os.path.join(self.tmp_dir, 'hrrr')
+        dt = datetime(2019, 3, 5, 14)
+        fp = hrrr_file_name_finder(hrrr_dir, dt, 0)
+        os.makedirs(os.path.dirname(fp))
+        with open(fp, 'w') as f:
+            f.write('hrrr')
+
+        def cropped(fp_in, fp_out, bounds, logger, **kwargs):
+            with open(fp_out, 'w') as f:
+                f.write('crop')
+            return True
+
+        logger = logging.getLogger(__name__)
+        outputs = []
+        with patch('katana.grib_crop_wgrib2.crop_grib',
+                   side_effect=cropped) as crop:
+            for run in ['run1', 'run2']:
+                outputs.append(crop_hour(
+                    dt, hrrr_dir, os.path.join(self.tmp_dir, run),
+                    self.bounds, logger, cache=self.cache))
+
+        self.assertEqual(crop.call_count, 1)
+        self.assertTrue(os.path.samefile(outputs[0], outputs[1]))
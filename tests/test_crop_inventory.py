@@ -0,0 +1,136 @@
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from katana.crop_inventory import CropInventory, grib_record_count
+from katana.grib_crop_wgrib2 import crop_hour, hrrr_file_name_finder
+
+
+def grib2_message(data=b'data'):
+    """Minimal GRIB2 message with a header, data and end section"""
+
+    length = 16 + len(data) + 4
+    return b'GRIB\x00\x00\x00\x02' + struct.pack('>Q', length) + \
+        data + b'7777'
+
+
+class TestGribRecordCount(unittest.TestCase):
+    """Tests for counting grib records without decoding them"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fp = os.path.join(self.tmp_dir, 'test.grib2')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, content):
+        with open(self.fp, 'wb') as f:
+            f.write(content)
+
+    def test_count(self):
+        """Count the messages in a file
+        """
+
+        self.write(b''.join([grib2_message() for _ in range(4)]))
+        self.assertEqual(grib_record_count(self.fp), 4)
+
+        self.write(b'')
+        self.assertEqual(grib_record_count(self.fp), 0)
+
+    def test_truncated(self):
+        """A truncated or corrupt file has no count
+        """
+
+        content = grib2_message() * 2
+        self.write(content[:-3])
+        self.assertIsNone(grib_record_count(self.fp))
+
+        self.write(b'not a grib file')
+        self.assertIsNone(grib_record_count(self.fp))
+
+    def test_hrrr(self):
+        """Count the records in a HRRR file
+        """
+
+        fp = os.path.join(os.path.dirname(__file__), 'Lakes', 'input',
+                          'hrrr.20190305', 'hrrr.t14z.wrfsfcf00.grib2')
+        self.assertEqual(grib_record_count(fp), 4)
+
+
+class TestCropInventory(unittest.TestCase):
+    """Tests for incremental cropping with the crop inventory"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hrrr_dir = os.path.join(self.tmp_dir, 'hrrr')
+        self.out_dir = os.path.join(self.tmp_dir, 'out')
+        self.bounds = (-119.1, -118.9, 37.5, 37.7)
+        self.logger = logging.getLogger(__name__)
+        self.dt = datetime(2019, 3, 5, 14)
+
+        self.fp_in = hrrr_file_name_finder(self.hrrr_dir, self.dt, 0)
+        os.makedirs(os.path.dirname(self.fp_in))
+        self.write_source(b'hrrr')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_source(self, content):
+        with open(self.fp_in, 'wb') as f:
+            f.write(content)
+
+    def cropped(self, fp_in, fp_out, bounds, logger, **kwargs):
+        with open(fp_out, 'wb') as f:
+            f.write(grib2_message() * 4)
+        return True
+
+    def run_crop(self):
+        with patch('katana.grib_crop_wgrib2.crop_grib',
+                   side_effect=self.cropped) as crop:
+            fp_out = crop_hour(self.dt, self.hrrr_dir, self.out_dir,
+                               self.bounds, self.logger,
+                               inventory=CropInventory(), incremental=True)
+        return fp_out, crop.call_count
+
+    def test_incremental(self):
+        """Only missing or stale crops are made again
+        """
+
+        fp_out, calls = self.run_crop()
+        self.assertEqual(calls, 1)
+        self.assertTrue(os.path.isfile(os.path.join(
+            os.path.dirname(os.path.dirname(fp_out)),
+            CropInventory.FILE_NAME)))
+
+        # the crop is current
+        self.assertEqual(self.run_crop(), (fp_out, 0))
+
+        # a truncated crop
+        with open(fp_out, 'r+b') as f:
+            f.truncate(30)
+        self.assertEqual(self.run_crop(), (fp_out, 1))
+
+        # a new source file
+        self.write_source(b'new hrrr')
+        self.assertEqual(self.run_crop(), (fp_out, 1))
+        self.assertEqual(self.run_crop(), (fp_out, 0))
+
+    def test_stale_options(self):
+        """A crop with other bounds or packing is stale
+        """
+
+        fp_out, _ = self.run_crop()
+        inventory = CropInventory()
+
+        self.assertTrue(inventory.is_current(fp_out, inventory.source(
+            self.fp_in, self.bounds)))
+        self.assertFalse(inventory.is_current(fp_out, inventory.source(
+            self.fp_in, self.bounds, packing='simple')))
+        self.assertFalse(inventory.is_current(fp_out, inventory.source(
+            self.fp_in, (-119.2, -118.9, 37.5, 37.7))))
@@ -0,0 +1,123 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+from katana import execution
+
+
+class TestExecution(unittest.TestCase):
+    """Tests for `katana.execution`"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.logger = logging.getLogger(__name__)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_run_concurrent_failures(self):
+        """Failed tasks are collected instead of stopping the run
+        """
+
+        tasks = OrderedDict()
+        for label in ['day1', 'day2', 'day3']:
+            wn_cfg_file = os.path.join(self.tmp_dir, label + '.cfg')
+            tasks[label] = ({'initialization_method': 'notAMethod'},
+                            wn_cfg_file)
+
+        failures = execution.run_concurrent(tasks, 2, self.logger)
+
+        self.assertEqual(set(failures.keys()), set(tasks.keys()))
+        for label, (_, wn_cfg_file) in tasks.items():
+            self.assertTrue(os.path.isfile(wn_cfg_file))
+
+        with self.assertRaises(Exception) as context:
+            execution.check_failures(failures, len(tasks), self.logger)
+
+        self.assertTrue('3 of 3 WindNinja tasks failed'
+                        in str(context.exception))
+        self.assertTrue('WindNinja has an error' in str(context.exception))
+
+    def test_run_concurrent_iterator(self):
+        """Tasks from an iterator with a core scheduler
+        """
+
+        def task_iterator():
+            for label in ['day1', 'day2']:
+                wn_cfg_file = os.path.join(self.tmp_dir, label + '.cfg')
+                yield label, ({'initialization_method': 'notAMethod'},
+                              wn_cfg_file)
+
+        scheduler = execution.CoreScheduler(2, 10000)
+        failures = execution.run_concurrent(
+            task_iterator(), 1, self.logger, scheduler=scheduler,
+            num_tasks=2)
+
+        self.assertEqual(set(failures.keys()), set(['day1', 'day2']))
+
+        # the scheduler sets the threads in the config file
+        with open(os.path.join(self.tmp_dir, 'day2.cfg')) as f:
+            self.assertTrue('num_threads' in f.read())
+
+    def test_run_concurrent_free_worker(self):
+        """The next task is only taken once a worker is free and the
+        finished tasks have been handled
+        """
+
+        with self.assertLogs(self.logger, 'ERROR') as logs:
+            handled = []
+
+            def task_iterator():
+                for label in ['day1', 'day2', 'day3']:
+                    handled.append(len(logs.records))
+                    wn_cfg_file = os.path.join(self.tmp_dir, label + '.cfg')
+                    yield label, ({'initialization_method': 'notAMethod'},
+                                  wn_cfg_file)
+
+            failures = execution.run_concurrent(
+                task_iterator(), 1, self.logger)
+
+        self.assertEqual(len(failures), 3)
+        self.assertEqual(handled, [0, 1, 2])
+
+    def test_core_scheduler(self):
+        """Split the cores between workers and threads
+        """
+
+        # small domain, one thread per run
+        scheduler = execution.CoreScheduler(48, 10000)
+        self.assertEqual(scheduler.max_threads, 1)
+        self.assertEqual(scheduler.max_workers, 48)
+        self.assertEqual(scheduler.allocate(100), (48, 1))
+
+        # stragglers get more threads
+        self.assertEqual(scheduler.allocate(4), (4, 12))
+        self.assertEqual(scheduler.allocate(1), (1, 48))
+
+        # larger domain with more threads per run
+        scheduler = execution.CoreScheduler(48, 8 * 20000)
+        self.assertEqual(scheduler.max_threads, 8)
+        self.assertEqual(scheduler.allocate(30), (6, 8))
+        self.assertEqual(scheduler.allocate(5), (5, 9))
+
+        # domain larger than the budget
+        scheduler = execution.CoreScheduler(4, 1e7)
+        self.assertEqual(scheduler.allocate(30), (1, 4))
+
+    def test_core_scheduler_from_topo(self):
+        """Mesh cells from the topo stats
+        """
+
+        topo_stats = {'nx': 200, 'ny': 100, 'dv': 50.0, 'du': -50.0}
+        scheduler = execution.CoreScheduler.from_topo(8, topo_stats, 100.0)
+
+        self.assertEqual(scheduler.mesh_cells, 5000)
+
+    def test_check_failures_none(self):
+        """No exception when there are no failures
+        """
+
+        self.assertIsNone(execution.check_failures({}, 3, self.logger))
@@ -0,0 +1,81 @@
+import os
+import unittest
+
+import numpy as np
+import utm
+from netCDF4 import Dataset
+
+from katana.geometry import (DomainGeometry, lcc_ij, utm_to_latlon,
+                             utm_wkt)
+
+
+class TestGeometry(unittest.TestCase):
+    """Tests for the geometry of the domain"""
+
+    def setUp(self):
+        topo = os.path.join(os.path.dirname(__file__), 'Lakes', 'topo',
+                            'topo.nc')
+        with Dataset(topo, 'r') as ds:
+            self.x = ds.variables['x'][:].astype(float)
+            self.y = ds.variables['y'][:].astype(float)
+
+    def test_utm_to_latlon(self):
+        """Convert arrays of points the same as utm
+        """
+
+        easting = np.array([300000., 600000., 450000.])
+        northing = np.array([4150000., 4900000., 3000000.])
+
+        lat, lon = utm_to_latlon(easting, northing, 11, 'N')
+
+        for n in range(len(easting)):
+            expected = utm.to_latlon(easting[n], northing[n], 11, 'N')
+            self.assertAlmostEqual(lat[n], expected[0], places=10)
+            self.assertAlmostEqual(lon[n], expected[1], places=10)
+
+    def test_utm_wkt(self):
+        """WKT of a UTM zone in each hemisphere
+        """
+
+        wkt = utm_wkt(11, 'N')
+        self.assertTrue(wkt.startswith('PROJCS["WGS 84 / UTM zone 11N"'))
+        self.assertIn('PARAMETER["central_meridian",-117]', wkt)
+        self.assertIn('PARAMETER["false_northing",0]', wkt)
+        self.assertTrue(wkt.endswith('AUTHORITY["EPSG","32611"]]'))
+
+        wkt = utm_wkt(56, 'H')
+        self.assertIn('PARAMETER["central_meridian",153]', wkt)
+        self.assertIn('PARAMETER["false_northing",10000000]', wkt)
+        self.assertIn('"EPSG","32756"', wkt)
+
+    def test_latlon_bounds(self):
+        """The bounds cover all the corners of the buffered domain
+        """
+
+        geometry = DomainGeometry(self.x, self.y, 11, buff=6000)
+        lonw, lone, lats, latn = geometry.latlon_bounds
+
+        for x in [np.min(self.x) - 6000, np.max(self.x) + 6000]:
+            for y in [np.min(self.y) - 6000, np.max(self.y) + 6000]:
+                lat, lon = utm.to_latlon(x, y, 11, 'N')
+                self.assertTrue(lonw <= lon <= lone)
+                self.assertTrue(lats <= lat <= latn)
+
+    def test_lcc_ij(self):
+        """The first point of a cropped HRRR file is on the grid
+        """
+
+        # La1 and Lo1 of tests/Lakes/input/hrrr.20190305 files
+        i, j = lcc_ij(37.43687, 240.894271)
+
+        self.assertAlmostEqual(float(i), 269, places=3)
+        self.assertAlmostEqual(float(j), 564, places=3)
+
+    def test_ij_window(self):
+        """Index window of the domain on the HRRR grid
+        """
+
+        geometry = DomainGeometry(self.x, self.y, 11, buff=6000)
+
+        self.assertEqual(geometry.ij_window(), (270, 279, 565, 574))
+        self.assertIs(geometry.ij_window(), geometry.ij_window())
@@ -0,0 +1,287 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from katana import grib_crop_eccodes
+from katana.grib_crop_wgrib2 import (WIND_NINJA_RECORDS,
+                                     WIND_NINJA_VARIABLES, create_new_grib,
+                                     crop_function, crop_grib, hour_match,
+                                     hrrr_file_name_finder)
+from tests.test_crop_inventory import grib2_message
+
+
+class TestCropGrib(unittest.TestCase):
+    """Tests for the single pass wgrib2 crop"""
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.fp_out = os.path.join(self.out_dir, 'out.grib2')
+        self.logger = logging.getLogger(__name__)
+        self.bounds = (-119.1, -118.9, 37.5, 37.7)
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_crop_grib(self):
+        """Match the variables before cropping in one wgrib2 call
+        """
+
+        def cropped(action, logger):
+            open(action[-1], 'w').close()
+            return 0
+
+        with patch('katana.grib_crop_wgrib2.call_wgrib2',
+                   side_effect=cropped) as call:
+            self.assertTrue(crop_grib('in.grib2', self.fp_out, self.bounds,
+                                      self.logger, packing='simple'))
+
+        action = call.call_args[0][0]
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual(action[0:2], ['wgrib2', 'in.grib2'])
+
+        # written to a temporary file then moved into place
+        self.assertEqual(action[-1], self.fp_out + '.tmp')
+        self.assertTrue(os.path.isfile(self.fp_out))
+        self.assertFalse(os.path.isfile(self.fp_out + '.tmp'))
+
+        match = action.index('-match')
+        packing = action.index('-set_grib_type')
+        small_grib = action.index('-small_grib')
+        self.assertEqual(action[match + 1], WIND_NINJA_VARIABLES)
+        self.assertEqual(action[packing + 1], 'simple')
+        self.assertLess(match, packing)
+        self.assertLess(packing, small_grib)
+        self.assertEqual(action[small_grib + 1:small_grib + 3],
+                         ['-119.1:-118.9', '37.5:37.7'])
+
+    def test_crop_grib_window(self):
+        """Crop by the i/j index window
+        """
+
+        def cropped(action, logger):
+            open(action[-1], 'w').close()
+            return 0
+
+        with patch('katana.grib_crop_wgrib2.call_wgrib2',
+                   side_effect=cropped) as call:
+            self.assertTrue(crop_grib('in.grib2', self.fp_out, self.bounds,
+                                      self.logger,
+                                      window=(270, 279, 565, 574)))
+
+        action = call.call_args[0][0]
+        self.assertNotIn('-small_grib', action)
+        ijsmall_grib = action.index('-ijsmall_grib')
+        self.assertEqual(action[ijsmall_grib + 1:ijsmall_grib + 3],
+                         ['270:279', '565:574'])
+
+    def test_crop_grib_failed(self):
+        """A failed crop removes the partial output
+        """
+
+        def failed(action, logger):
+            open(action[-1], 'w').close()
+            return 8
+
+        with patch('katana.grib_crop_wgrib2.call_wgrib2', side_effect=failed):
+            self.assertFalse(crop_grib('in.grib2', self.fp_out, self.bounds,
+                                       self.logger))
+
+        self.assertEqual(os.listdir(self.out_dir), [])
+
+
+class TestCreateNewGrib(unittest.TestCase):
+    """Tests for cropping the hours on a pool of workers"""
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.hrrr_dir = tempfile.mkdtemp()
+        self.logger = logging.getLogger(__name__)
+        self.bounds = (-119.1, -118.9, 37.5, 37.7)
+        self.date_list = [datetime(2019, 3, 5, h) for h in range(10, 16)] + \
+            [datetime(2019, 3, 6, h) for h in range(0, 3)]
+
+        # analysis files for every hour and a forecast hour for 13z
+        for dt in self.date_list:
+            self.make_file(hrrr_file_name_finder(self.hrrr_dir, dt, 0))
+        self.make_file(hrrr_file_name_finder(
+            self.hrrr_dir, datetime(2019, 3, 5, 13), 1))
+
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+        shutil.rmtree(self.hrrr_dir)
+
+    def make_file(self, fp):
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        with open(fp, 'w') as f:
+            f.write('grib')
+
+    def fake_crop(self, fp_in, fp_out, bounds, logger, **kwargs):
+        """Only forecast hour 1 files exist for 13z
+        """
+
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        time.sleep(0.05)
+
+        with self.lock:
+            self.running -= 1
+
+        if 't13z' in fp_out and not fp_in.endswith('f01.grib2'):
+            return False
+
+        open(fp_out, 'w').close()
+        return True
+
+    def test_create_new_grib(self):
+        """Crop the hours at the same time with the fallbacks
+        """
+
+        with patch('katana.grib_crop_wgrib2.crop_grib',
+                   side_effect=self.fake_crop) as crop:
+            out_files = create_new_grib(
+                self.date_list, self.hrrr_dir, self.out_dir, None, None,
+                self.logger, bounds=self.bounds, num_workers=4)
+
+        self.assertEqual(out_files, {date(2019, 3, 5): 6,
+                                     date(2019, 3, 6): 3})
+        self.assertEqual(crop.call_count, len(self.date_list) + 1)
+        self.assertGreater(self.max_running, 1)
+        self.assertLessEqual(self.max_running, 4)
+
+        # each hour writes its own file
+        outputs = [c[0][1] for c in crop.call_args_list]
+        self.assertEqual(len(set(outputs)), len(self.date_list))
+
+    def test_create_new_grib_batch(self):
+        """Crop each day with one wgrib2 process and fall back to
+        single hours
+        """
+
+        def batch(action, logger, input_files=None):
+            # the 13z analysis file can not be cropped
+            for n, option in enumerate(action):
+                if option == '-if' and 't13z' not in action[n + 5]:
+                    with open(action[n + 5], 'wb') as f:
+                        for _ in range(WIND_NINJA_RECORDS):
+                            f.write(grib2_message())
+            return 0
+
+        with patch('katana.grib_crop_wgrib2.call_wgrib2',
+                   side_effect=batch) as call, \
+                patch('katana.grib_crop_wgrib2.crop_grib',
+                      side_effect=self.fake_crop) as crop:
+            out_files = create_new_grib(
+                self.date_list, self.hrrr_dir, self.out_dir, None, None,
+                self.logger, bounds=self.bounds, num_workers=2, batch=True)
+
+        self.assertEqual(out_files, {date(2019, 3, 5): 6,
+                                     date(2019, 3, 6): 3})
+        self.assertEqual(call.call_count, 2)
+
+        # the files of a day are streamed to a single wgrib2
+        actions = sorted([c[0][0] for c in call.call_args_list], key=len)
+        self.assertEqual(actions[0][0:2], ['wgrib2', '-'])
+        self.assertEqual(actions[0].count('-if'), 3)
+        self.assertEqual(actions[1].count('-if'), 6)
+        self.assertIn(hour_match(datetime(2019, 3, 6, 1), 0), actions[0])
+        self.assertEqual(
+            len(call.call_args_list[0][1]['input_files']) +
+            len(call.call_args_list[1][1]['input_files']),
+            len(self.date_list))
+
+        # only 13z is cropped by itself, with the forecast hour fallback
+        self.assertEqual(crop.call_count, 2)
+        self.assertTrue(crop.call_args[0][0].endswith('f01.grib2'))
+
+        for dt in self.date_list:
+            self.assertTrue(os.path.isfile(os.path.join(
+                self.out_dir, 'data{}'.format(dt.strftime('%Y%m%d')),
+                'wind_ninja_data', 'hrrr.{}'.format(dt.strftime('%Y%m%d')),
+                'hrrr.t{}z.wrfsfcf00.grib2'.format(dt.strftime('%H')))))
+
+        self.assertEqual(hour_match(datetime(2019, 3, 6, 1), 2),
+                         ':d=2019030523:[^:]*:[^:]*:2 hour fcst:')
+
+    def test_create_new_grib_failed(self):
+        """An hour without a good file stops the cropping
+        """
+
+        with patch('katana.grib_crop_wgrib2.crop_grib',
+                   return_value=False) as crop:
+            with self.assertRaises(IOError) as context:
+                create_new_grib(
+                    self.date_list, self.hrrr_dir, self.out_dir, None, None,
+                    self.logger, bounds=self.bounds, num_workers=2)
+
+        self.assertTrue('No good grib file for 2019-03-05 10'
+                        in str(context.exception))
+        self.assertLess(crop.call_count, 7 * len(self.date_list))
+
+    def test_create_new_grib_missing(self):
+        """Hours without a HRRR file are reported before cropping
+        """
+
+        os.remove(hrrr_file_name_finder(
+            self.hrrr_dir, datetime(2019, 3, 6, 1), 0))
+
+        with patch('katana.grib_crop_wgrib2.crop_grib') as crop:
+            with self.assertRaises(IOError) as context:
+                create_new_grib(
+                    self.date_list, self.hrrr_dir, self.out_dir, None, None,
+                    self.logger, bounds=self.bounds)
+
+        self.assertTrue('No good grib file for 2019-03-06 01'
+                        in str(context.exception))
+        crop.assert_not_called()
+
+
+class TestCropBackend(unittest.TestCase):
+    """Tests for selecting the crop backend"""
+
+    def test_crop_function(self):
+        """wgrib2 is the default backend
+        """
+
+        self.assertEqual(crop_function('wgrib2'), crop_grib)
+
+    @unittest.skipIf(grib_crop_eccodes.eccodes_available(),
+                     'eccodes is installed')
+    def test_eccodes_missing(self):
+        """The eccodes backend needs the eccodes package
+        """
+
+        with self.assertRaises(ImportError):
+            crop_function('eccodes')
+
+    @unittest.skipUnless(grib_crop_eccodes.eccodes_available(),
+                         'eccodes is not installed')
+    def test_eccodes_crop(self):
+        """Crop a HRRR file in process with eccodes
+        """
+
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir)
+        fp_in = os.path.join(
+            os.path.dirname(__file__), 'Lakes', 'input', 'hrrr.20190305',
+            'hrrr.t14z.wrfsfcf00.grib2')
+        fp_out = os.path.join(out_dir, 'out.grib2')
+
+        self.assertTrue(grib_crop_eccodes.crop_grib(
+            fp_in, fp_out, (-119.1, -118.9, 37.5, 37.7),
+            logging.getLogger(__name__)))
+
+        import eccodes
+        with open(fp_out, 'rb') as f:
+            self.assertEqual(eccodes.codes_count_in_file(f), 4)
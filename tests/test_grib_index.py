@@ -0,0 +1,148 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from katana.grib_crop_wgrib2 import WIND_NINJA_VARIABLES, crop_source
+from katana.grib_index import extract_records, index_file, parse_index
+from tests.test_crop_inventory import grib2_message
+
+RECORDS = [
+    'REFC:entire atmosphere',
+    'TMP:2 m above ground',
+    'RH:2 m above ground',
+    'UGRD:10 m above ground',
+    'VGRD:10 m above ground',
+    'TCDC:entire atmosphere'
+]
+
+
+class TestGribIndex(unittest.TestCase):
+    """Tests for reading grib records by their byte ranges"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.logger = logging.getLogger(__name__)
+
+        # a grib file with a message for each record and its inventory
+        self.fp_in = os.path.join(self.tmp_dir, 'hrrr.t14z.wrfsfcf00.grib2')
+        self.lines = []
+        offset = 0
+        with open(self.fp_in, 'wb') as f:
+            for n, record in enumerate(RECORDS):
+                message = grib2_message(record.encode())
+                f.write(message)
+                self.lines.append('{}:{}:d=2019030514:{}:anl:'.format(
+                    n + 1, offset, record))
+                offset += len(message)
+
+        self.size = offset
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_index(self, lines):
+        with open(index_file(self.fp_in), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def test_parse_index(self):
+        """Byte range of each record
+        """
+
+        records = parse_index(
+            ['*** warning ***'] + self.lines, self.size)
+
+        self.assertEqual(len(records), len(RECORDS))
+        self.assertEqual(records[0][1], 0)
+        self.assertEqual(sum([r[2] for r in records]), self.size)
+
+        # sub messages are part of their message
+        records = parse_index(
+            ['1:0:d=2019030514:UGRD:10 m above ground:anl:',
+             '1.2:0:d=2019030514:VGRD:10 m above ground:anl:',
+             '2:100:d=2019030514:TMP:2 m above ground:anl:'], 150)
+        self.assertEqual([r[1:] for r in records], [(0, 100), (100, 50)])
+        self.assertTrue('VGRD' in records[0][0])
+
+    def test_extract_records(self):
+        """Copy only the WindNinja records
+        """
+
+        self.write_index(self.lines)
+        fp_out = os.path.join(self.tmp_dir, 'records.grib2')
+
+        self.assertTrue(extract_records(
+            self.fp_in, fp_out, WIND_NINJA_VARIABLES, self.logger))
+
+        with open(fp_out, 'rb') as f:
+            content = f.read()
+
+        self.assertEqual(content, b''.join(
+            [grib2_message(record.encode()) for record in RECORDS
+             if not record.startswith(('REFC', 'RH'))]))
+
+    def test_stale_index(self):
+        """An inventory that does not match the file is not used
+        """
+
+        # offsets from a different version of the file
+        lines = []
+        for line in self.lines:
+            fields = line.split(':')
+            fields[1] = str(int(fields[1]) + 4)
+            lines.append(':'.join(fields))
+        self.write_index(lines)
+        fp_out = os.path.join(self.tmp_dir, 'records.grib2')
+
+        self.assertFalse(extract_records(
+            self.fp_in, fp_out, WIND_NINJA_VARIABLES, self.logger))
+        self.assertFalse(os.path.exists(fp_out))
+
+    def test_make_index(self):
+        """A missing inventory is made with wgrib2 and saved
+        """
+
+        fp_out = os.path.join(self.tmp_dir, 'records.grib2')
+
+        with patch('katana.grib_index.supervisor.run',
+                   return_value=(0, self.lines)) as run:
+            self.assertTrue(extract_records(
+                self.fp_in, fp_out, WIND_NINJA_VARIABLES, self.logger))
+
+        self.assertEqual(run.call_args[0][0], ['wgrib2', self.fp_in, '-s'])
+        with open(index_file(self.fp_in), 'r') as f:
+            self.assertEqual(f.read().splitlines(), self.lines)
+
+        # the saved inventory is used next time
+        with patch('katana.grib_index.supervisor.run') as run:
+            self.assertTrue(extract_records(
+                self.fp_in, fp_out, WIND_NINJA_VARIABLES, self.logger))
+            run.assert_not_called()
+
+    def test_crop_source(self):
+        """Crop from the extracted records
+        """
+
+        fp_out = os.path.join(self.tmp_dir, 'out.grib2')
+        sources = []
+
+        def crop(fp, fp_out, bounds, logger, **kwargs):
+            with open(fp, 'rb') as f:
+                sources.append((fp, len(f.read())))
+            return True
+
+        self.write_index(self.lines)
+        self.assertTrue(crop_source(crop, self.fp_in, fp_out, None,
+                                    self.logger, byte_ranges=True))
+        self.assertEqual(sources[-1][0], fp_out + '.src')
+        self.assertLess(sources[-1][1], self.size)
+        self.assertFalse(os.path.exists(fp_out + '.src'))
+
+        # without an inventory the whole file is cropped
+        os.remove(index_file(self.fp_in))
+        with patch('katana.grib_index.supervisor.run', return_value=(1, [])):
+            self.assertTrue(crop_source(crop, self.fp_in, fp_out, None,
+                                        self.logger, byte_ranges=True))
+        self.assertEqual(sources[-1], (self.fp_in, self.size))
@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from katana.grib_crop_wgrib2 import hrrr_file_name_finder
+from katana.hrrr_archive import HRRRArchive
+
+
+class TestHRRRArchive(unittest.TestCase):
+    """Tests for the index of the HRRR archive"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        # analysis files for 10z and 11z, 12z has a forecast hour 2
+        # from 10z and an empty analysis file
+        self.make_file(datetime(2019, 3, 5, 10), 0)
+        self.make_file(datetime(2019, 3, 5, 11), 0)
+        self.make_file(datetime(2019, 3, 5, 12), 2)
+        self.make_file(datetime(2019, 3, 5, 12), 0, size=0)
+
+        # the first hour of a day from the previous day
+        self.make_file(datetime(2019, 3, 6, 0), 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_file(self, dt, fx_hr, size=4):
+        fp = hrrr_file_name_finder(self.directory, dt, fx_hr)
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        with open(fp, 'w') as f:
+            f.write('g' * size)
+        return fp
+
+    def test_resolve(self):
+        """Find the file and forecast hour for each hour
+        """
+
+        archive = HRRRArchive(self.directory)
+
+        self.assertEqual(
+            archive.resolve(datetime(2019, 3, 5, 10)),
+            (0, hrrr_file_name_finder(
+                self.directory, datetime(2019, 3, 5, 10), 0)))
+
+        # the empty analysis file is skipped
+        self.assertEqual(
+            archive.resolve(datetime(2019, 3, 5, 12)),
+            (2, hrrr_file_name_finder(
+                self.directory, datetime(2019, 3, 5, 12), 2)))
+
+        fx_hr, fp = archive.resolve(datetime(2019, 3, 6, 0))
+        self.assertEqual(fx_hr, 1)
+        self.assertTrue(fp.endswith(
+            'hrrr.20190305/hrrr.t23z.wrfsfcf01.grib2'))
+
+        self.assertEqual(archive.resolve(datetime(2019, 3, 5, 13)),
+                         (None, None))
+
+    def test_resolve_last_forecast_hour(self):
+        """Forecast hour 7 is the last fallback for an hour
+        """
+
+        self.make_file(datetime(2019, 3, 5, 20), 7)
+        self.make_file(datetime(2019, 3, 5, 21), 8)
+
+        archive = HRRRArchive(self.directory)
+
+        self.assertEqual(
+            archive.resolve(datetime(2019, 3, 5, 20)),
+            (7, hrrr_file_name_finder(
+                self.directory, datetime(2019, 3, 5, 20), 7)))
+        self.assertEqual(archive.resolve(datetime(2019, 3, 5, 21)),
+                         (None, None))
+
+    def test_missing_hours(self):
+        """Report the hours without a file
+        """
+
+        archive = HRRRArchive(self.directory)
+        date_list = [datetime(2019, 3, 5, h) for h in range(9, 14)]
+
+        self.assertEqual(archive.missing_hours(date_list),
+                         [datetime(2019, 3, 5, 9), datetime(2019, 3, 5, 13)])
+
+    def test_scan_once(self):
+        """A folder is only scanned again after it changes
+        """
+
+        archive = HRRRArchive(self.directory)
+
+        with patch('katana.hrrr_archive.os.scandir',
+                   side_effect=os.scandir) as scandir:
+            for h in range(10, 14):
+                archive.candidates(datetime(2019, 3, 5, h))
+            self.assertEqual(scandir.call_count, 1)
+
+            # a new file changes the folder
+            fp = self.make_file(datetime(2019, 3, 5, 13), 0)
+            folder = os.path.dirname(fp)
+            stat = os.stat(folder)
+            os.utime(folder, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            self.assertEqual(archive.resolve(datetime(2019, 3, 5, 13)),
+                             (0, fp))
+            self.assertEqual(scandir.call_count, 2)
+
+    def test_cache_file(self):
+        """The index is kept in the cache file between runs
+        """
+
+        cache_file = os.path.join(self.directory, 'index.json')
+        HRRRArchive(self.directory, cache_file).resolve(
+            datetime(2019, 3, 5, 10))
+
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+        self.assertEqual(list(cache['folders'].keys()), ['hrrr.20190305'])
+
+        archive = HRRRArchive(self.directory, cache_file)
+        with patch('katana.hrrr_archive.os.scandir') as scandir:
+            self.assertEqual(archive.resolve(datetime(2019, 3, 5, 11))[0], 0)
+            scandir.assert_not_called()
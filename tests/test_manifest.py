@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from katana.manifest import Manifest
+
+
+class TestManifest(unittest.TestCase):
+    """Tests for `katana.manifest`"""
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.day = date(2019, 3, 5)
+        self.hours = [datetime(2019, 3, 5, 13), datetime(2019, 3, 5, 14)]
+
+        self.input_file = os.path.join(self.out_dir, 'input.grib2')
+        self.output_file = os.path.join(self.out_dir, 'output_vel.asc')
+        for file_name in [self.input_file, self.output_file]:
+            with open(file_name, 'w') as f:
+                f.write('1 2 3 4')
+
+        self.manifest = Manifest(self.out_dir, 'abc')
+        self.manifest.record(self.day, self.hours, [self.input_file],
+                             [self.output_file], elapsed=10.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_record(self):
+        """Record a completed day
+        """
+
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.out_dir, 'katana_manifest', '20190305.json')))
+
+        entry = self.manifest.load(self.day)
+        self.assertEqual(entry['config_hash'], 'abc')
+        self.assertEqual(entry['elapsed'], 10.0)
+        self.assertEqual(entry['outputs'][0]['path'], 'output_vel.asc')
+        self.assertEqual(entry['outputs'][0]['size'], 7)
+
+        self.assertIsNone(self.manifest.load(date(2019, 3, 6)))
+
+    def test_is_complete(self):
+        """Verify a completed day
+        """
+
+        self.assertTrue(self.manifest.is_complete(self.day, self.hours))
+
+        # different hours for the day
+        self.assertFalse(
+            self.manifest.is_complete(self.day, self.hours[:1]))
+
+        # different config
+        manifest = Manifest(self.out_dir, 'def')
+        self.assertFalse(manifest.is_complete(self.day, self.hours))
+
+    def test_is_complete_output_changed(self):
+        """Output with the same size but different content
+        """
+
+        with open(self.output_file, 'w') as f:
+            f.write('1 2 3 5')
+
+        self.assertFalse(self.manifest.is_complete(self.day, self.hours))
+
+        os.remove(self.output_file)
+        self.assertFalse(self.manifest.is_complete(self.day, self.hours))
+
+    def test_is_complete_input_changed(self):
+        """Input that has changed size
+        """
+
+        with open(self.input_file, 'w') as f:
+            f.write('1 2 3 4 5')
+
+        self.assertFalse(self.manifest.is_complete(self.day, self.hours))
+
+    def test_force(self):
+        """Force a day to run again
+        """
+
+        self.manifest.force([self.day])
+        self.assertFalse(self.manifest.is_complete(self.day, self.hours))
+
+    def test_hash_config(self):
+        """Config hash changes with the options that change the output
+        """
+
+        config = {
+            'topo': {'filename': os.path.join(self.out_dir, 'topo.nc')},
+            'input': {'hrrr_buffer': 6000, 'hrrr_num_wgrib_threads': 1},
+            'wind_ninja': {'mesh_resolution': 200.0, 'num_threads': 2},
+            'output': {'out_location': self.out_dir, 'resume': True,
+                       'netcdf_cube': False}
+        }
+        config_hash = Manifest.hash_config(config)
+
+        config['wind_ninja']['num_threads'] = 8
+        config['output']['resume'] = False
+        self.assertEqual(config_hash, Manifest.hash_config(config))
+
+        # a new output product is written for the completed days
+        config['output']['netcdf_cube'] = True
+        output_hash = Manifest.hash_config(config)
+        self.assertNotEqual(config_hash, output_hash)
+
+        config['wind_ninja']['mesh_resolution'] = 100.0
+        self.assertNotEqual(output_hash, Manifest.hash_config(config))
@@ -0,0 +1,165 @@
+import os
+import shutil
+import unittest
+from datetime import date, datetime
+from glob import glob
+from unittest.mock import patch
+
+import netCDF4 as nc
+import numpy as np
+
+from katana.framework import Katana
+from katana.mosaic import read_ascii_grid
+from katana.netcdf_cube import chunk_shape, output_times
+from katana.topo import write_ascii_grid
+from tests.test_base import KatanaTestCase
+
+
+class TestOutputTimes(unittest.TestCase):
+    """Tests for pairing the WindNinja outputs by time"""
+
+    def test_output_times(self):
+        """Speed and direction files are paired and sorted by time
+        """
+
+        file_names = [
+            '/out/topo_windninja_topo_03-05-2019_1400_200m_ang.asc',
+            '/out/topo_windninja_topo_03-05-2019_1300_200m_vel.asc',
+            '/out/topo_windninja_topo_03-05-2019_1400_200m_vel.asc',
+            '/out/topo_windninja_topo_03-05-2019_1300_200m_ang.asc',
+            '/out/topo_windninja_topo_03-05-2019_1300_200m_cld.asc',
+            '/out/topo_windninja_topo_03-05-2019_1300_200m_vel.prj'
+        ]
+
+        times = output_times(file_names, 'topo_windninja_topo')
+
+        self.assertEqual(
+            [dt for dt, _, _ in times],
+            [datetime(2019, 3, 5, 13), datetime(2019, 3, 5, 14)])
+        self.assertEqual(times[0][1], file_names[1])
+        self.assertEqual(times[0][2], file_names[3])
+
+        with self.assertRaises(IOError):
+            output_times(file_names[:3], 'topo_windninja_topo')
+
+    def test_chunk_shape(self):
+        """Chunks hold every time of a block of the grid
+        """
+
+        self.assertEqual(chunk_shape(24, 44, 41), (24, 44, 41))
+        self.assertEqual(chunk_shape(16, 1000, 1000), (16, 128, 128))
+
+
+class TestNetcdfCube(KatanaTestCase):
+    """Tests for writing the WindNinja outputs of a day to NetCDF"""
+
+    def setUp(self):
+        config = self.change_config_option('output', 'netcdf_cube', True)
+        config = self.change_config_option(
+            'output', 'netcdf_cube_uv', True, config)
+
+        self.katana = Katana(config)
+        self.day = date(2019, 3, 5)
+
+        # the gold speeds with a wind from the east
+        out_dir = self.katana.input_data.make_output_day_folder(self.day)
+        self.out_dir = out_dir
+        self.gold = sorted(glob(os.path.join(
+            self.test_dir, 'gold', 'hrrr', '*_vel.asc')))
+        for fp in self.gold:
+            shutil.copy(fp, out_dir)
+
+            header, data = read_ascii_grid(fp)
+            header = '\n'.join(['{} {}'.format(k, v) for k, v in
+                                header.items()])
+            write_ascii_grid(
+                os.path.join(out_dir, os.path.basename(fp).replace(
+                    '_vel', '_ang')),
+                np.ma.masked_array(np.full(data.shape, 90.0), data.mask),
+                header, -9999)
+
+    def test_write_netcdf_cube(self):
+        """The cube has every time of the day on the output grid
+        """
+
+        input_data = self.katana.input_data
+        input_data.write_netcdf_cube(self.day)
+
+        out_file = input_data.netcdf_cube_file(self.day)
+        self.assertTrue(out_file.endswith(
+            os.path.join('data20190305', 'wind_ninja_20190305.nc')))
+
+        with nc.Dataset(out_file) as ds:
+            self.assertEqual(ds.variables['wind_speed'].shape,
+                             (len(self.gold), 44, 41))
+            self.assertEqual(ds.variables['wind_speed'].chunking(),
+                             [len(self.gold), 44, 41])
+            self.assertTrue(
+                ds.variables['wind_speed'].filters()['zlib'])
+
+            times = nc.num2date(ds.variables['time'][:],
+                                ds.variables['time'].units)
+            self.assertEqual(times[0].hour, 13)
+            self.assertEqual(
+                ds.variables['time'].time_zone,
+                self.katana.config['wind_ninja']['time_zone'])
+
+            # cell centers from the lower left corner of the dem
+            self.assertEqual(ds.variables['x'][0], 320075)
+            self.assertEqual(ds.variables['y'][-1], 4158375)
+
+            for idx, fp in enumerate(self.gold):
+                gold = np.loadtxt(fp, skiprows=6)
+                np.testing.assert_allclose(
+                    ds.variables['wind_speed'][idx], gold, rtol=1e-6)
+                np.testing.assert_allclose(
+                    ds.variables['u'][idx], -gold, rtol=1e-6)
+                np.testing.assert_allclose(
+                    ds.variables['v'][idx], 0, atol=1e-5)
+                np.testing.assert_allclose(
+                    ds.variables['wind_direction'][idx], 90)
+
+    def move_grids(self, xll, yll, cell_size, file_names):
+        """Write the outputs again on another grid of the same size
+        """
+
+        for fp in file_names:
+            header, data = read_ascii_grid(fp)
+            header.update(
+                {'xllcorner': xll, 'yllcorner': yll, 'cellsize': cell_size})
+            header = '\n'.join(['{} {}'.format(k, v) for k, v in
+                                header.items()])
+            write_ascii_grid(fp, data, header, -9999)
+
+    def test_output_grid(self):
+        """The coordinates are from the grid of the outputs and not the
+        dem, every output has to be on that grid
+        """
+
+        input_data = self.katana.input_data
+        outputs = sorted(glob(os.path.join(self.out_dir, '*.asc')))
+        self.move_grids(321000, 4159000, 100, outputs)
+
+        input_data.write_netcdf_cube(self.day)
+        with nc.Dataset(input_data.netcdf_cube_file(self.day)) as ds:
+            self.assertEqual(ds.variables['x'][0], 321050)
+            self.assertEqual(ds.variables['y'][-1], 4159050)
+            self.assertEqual(ds.variables['x'][1] - ds.variables['x'][0],
+                             100)
+
+        self.move_grids(321200, 4159000, 100, outputs[-1:])
+        with self.assertRaises(ValueError):
+            input_data.write_netcdf_cube(self.day)
+
+    def test_day_complete(self):
+        """A finished day is written to NetCDF before it is recorded
+        """
+
+        input_data = self.katana.input_data
+
+        with patch.object(input_data, 'record_day') as record:
+            input_data.task_complete(self.day, 1)
+
+        record.assert_called_once_with(self.day, 1)
+        self.assertTrue(os.path.isfile(
+            input_data.netcdf_cube_file(self.day)))
@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import sys
+from copy import deepcopy
+from datetime import date, datetime
+from unittest.mock import patch
+
+from katana.framework import Katana, cli
+from katana.plan import wall_time
+from tests.test_base import KatanaTestCase
+
+
+class TestPlan(KatanaTestCase):
+    """Tests for the `run_katana --plan` dry run"""
+
+    def test_plan_hrrr(self):
+        """Resolve the HRRR hours and count the tasks
+        """
+
+        k = Katana(deepcopy(self.base_config))
+        plan_file = os.path.join(self.out_dir, 'plan.json')
+        k.plan(plan_file)
+
+        with open(plan_file, 'r') as f:
+            plan = json.load(f)
+
+        self.assertEqual(len(plan['days']), 1)
+        day = plan['days'][0]
+        self.assertEqual(day['num_hours'], 4)
+
+        # there is no 13z file so the 11z forecast hour 2 is used
+        self.assertEqual(day['hours'][0]['forecast_hour'], 2)
+        self.assertEqual(os.path.basename(day['hours'][0]['file']),
+                         'hrrr.t11z.wrfsfcf02.grib2')
+        self.assertEqual(day['fallback_hours'], 1)
+        self.assertEqual(day['missing_hours'], [])
+
+        totals = plan['totals']
+        self.assertEqual(totals['wind_ninja_runs'], 1)
+        self.assertEqual(totals['output_files'], 12)
+        self.assertEqual(totals['wgrib2_calls'], 4)
+        self.assertEqual(totals['estimate_basis'], 'mesh')
+        self.assertGreater(totals['estimated_wall_seconds'], 0)
+
+        # nothing was cropped or ran
+        self.assertFalse(os.path.isdir(
+            os.path.join(self.out_dir, 'data20190305')))
+
+    def test_plan_wgrib2_calls(self):
+        """Count the wgrib2 calls of the crop options
+        """
+
+        def wgrib2_calls(section, option, value):
+            config = self.change_config_option(section, option, value)
+            return Katana(config).plan(
+                os.path.join(self.out_dir, 'plan.json'))[
+                    'totals']['wgrib2_calls']
+
+        # one process for the day
+        self.assertEqual(wgrib2_calls('input', 'hrrr_batch_crop', True), 1)
+
+        # an inventory is made for each file without one
+        self.assertEqual(
+            wgrib2_calls('input', 'hrrr_byte_ranges', True), 8)
+
+        # each hour is cropped again for each tile
+        self.assertEqual(wgrib2_calls('topo', 'tile_size', 4000), 4 * 13)
+
+    def test_plan_stdout(self):
+        """Only the plan is written to stdout
+        """
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        test_args = ['run_katana', self.test_config, '--plan', '-']
+        with patch.object(sys, 'argv', test_args), \
+                patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'stderr', stderr):
+            cli()
+
+        plan = json.loads(stdout.getvalue())
+        self.assertEqual(plan['totals']['wgrib2_calls'], 4)
+        self.assertIn('Configuration File Status Report', stderr.getvalue())
+
+    def test_plan_missing_hours(self):
+        """Hours without any HRRR file are reported
+        """
+
+        config = self.change_config_option(
+            'time', 'end_date', '2019-03-05 18:00')
+
+        plan = Katana(config).plan(os.path.join(self.out_dir, 'plan.json'))
+
+        self.assertEqual(plan['days'][0]['missing_hours'],
+                         ['2019-03-05 17:00:00+00:00',
+                          '2019-03-05 18:00:00+00:00'])
+        self.assertEqual(plan['totals']['missing_hours'], 2)
+
+    def test_plan_history(self):
+        """Estimate the wall time from past timings in the manifest
+        """
+
+        k = Katana(deepcopy(self.base_config))
+        k.input_data.manifest.record(
+            date(2019, 3, 4),
+            [datetime(2019, 3, 4, h) for h in range(4)],
+            [], [], elapsed=40.0)
+
+        plan = k.plan(os.path.join(self.out_dir, 'plan.json'))
+
+        self.assertEqual(plan['totals']['estimate_basis'], 'manifest')
+        self.assertEqual(plan['totals']['seconds_per_hour'], 10.0)
+        self.assertEqual(plan['totals']['estimated_wall_seconds'], 40.0)
+
+    def test_wall_time(self):
+        """Tasks start on the first free worker
+        """
+
+        self.assertEqual(wall_time([10, 10, 10], 2), 20)
+        self.assertEqual(wall_time([30, 10, 10, 10], 2), 30)
+        self.assertEqual(wall_time([], 4), 0)
@@ -1,7 +1,9 @@
+from collections import OrderedDict
 from copy import deepcopy
 
 from inicheck.tools import cast_all_variables
 
+from katana.framework import Katana
 from tests.test_base import KatanaTestCase
 
 
@@ -24,6 +26,22 @@ class TestRecipes(KatanaTestCase):
 
         return config
 
+    def add_optional_sections(self, config):
+        """Add the optional sections that Katana adds when they are
+        missing from the users config
+
+        Arguments:
+            config {UserConfig} -- UserConfig object to modify
+
+        Returns:
+            UserConfig -- Modified UserConfig object
+        """
+
+        for section in Katana.OPTIONAL_SECTIONS:
+            config.raw_cfg.setdefault(section, OrderedDict())
+
+        return self.cast_recipes(config)
+
     def master_config(self, config):
         """Create a master config dictionary with a
         list of the keys
@@ -68,7 +86,7 @@ class TestRecipes(KatanaTestCase):
         """
 
         # no changes to the base config
-        config = deepcopy(self.base_config)
+        config = self.add_optional_sections(deepcopy(self.base_config))
 
         # get the master config list
         master_config = self.master_config(config)
@@ -78,7 +96,15 @@ class TestRecipes(KatanaTestCase):
             'data_type',
             'hrrr_directory',
             'hrrr_buffer',
-            'hrrr_num_wgrib_threads'
+            'hrrr_num_wgrib_threads',
+            'hrrr_grib_packing',
+            'hrrr_crop_backend',
+            'hrrr_crop_window',
+            'hrrr_byte_ranges',
+            'hrrr_batch_crop',
+            'hrrr_index_file',
+            'hrrr_crop_cache',
+            'hrrr_crop_cache_size'
         ]
 
         self.check_config(config, master_config)
@@ -91,6 +117,7 @@ class TestRecipes(KatanaTestCase):
             'input', 'data_type', 'wrf_out')
         config = self.change_config_option(
             'input', 'wrf_filename', './RME/input/WRF_test.nc', config)
+        config = self.add_optional_sections(config)
 
         # get the master config list
         master_config = self.master_config(config)
@@ -98,8 +125,10 @@ class TestRecipes(KatanaTestCase):
         # make changes
         master_config['input'] = [
             'data_type',
-            'wrf_filename'
+            'wrf_filename',
+            'wrf_num_chunks'
         ]
         master_config['output'].remove('make_new_gribs')
+        master_config['output'].remove('incremental_gribs')
 
         self.check_config(config, master_config)
@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+
+from katana.resample import ResampledGrid, resample_factor
+
+
+class TestResample(unittest.TestCase):
+    """Tests for resampling the dem in blocks of rows"""
+
+    def setUp(self):
+        self.dem = np.random.default_rng(0).random((13, 11)) * 3000
+
+    def test_resample_factor(self):
+        """Largest multiple of the cell size within the resolution
+        """
+
+        self.assertEqual(resample_factor(50., 200.), 4)
+        self.assertEqual(resample_factor(30., 200.), 6)
+        self.assertEqual(resample_factor(10., 100.), 10)
+        self.assertEqual(resample_factor(200., 100.), 1)
+
+    def test_mean(self):
+        """Average of each block including the partial edge blocks
+        """
+
+        grid = ResampledGrid(self.dem, 4)
+        self.assertEqual(grid.shape, (4, 3))
+
+        result = grid[0:4]
+        self.assertEqual(result.shape, (4, 3))
+        self.assertAlmostEqual(result[0, 0], np.mean(self.dem[0:4, 0:4]))
+        self.assertAlmostEqual(result[3, 2], np.mean(self.dem[12:, 8:]))
+        self.assertFalse(np.ma.is_masked(result))
+
+    def test_mean_masked(self):
+        """Masked cells are not averaged and an empty block is masked
+        """
+
+        dem = np.ma.masked_array(self.dem, mask=False)
+        dem[0, 0] = np.ma.masked
+        dem[4:8, 4:8] = np.ma.masked
+
+        result = ResampledGrid(dem, 4)[:]
+
+        self.assertAlmostEqual(result[0, 0],
+                               np.ma.mean(dem[0:4, 0:4]))
+        self.assertTrue(result.mask[1, 1])
+        self.assertEqual(np.sum(result.mask), 1)
+
+    def test_bilinear(self):
+        """A plane is reproduced at the resampled cell centers
+        """
+
+        rows, cols = np.mgrid[0:13, 0:11]
+        dem = 2.0 * rows + 3.0 * cols + 1000.0
+
+        result = ResampledGrid(dem, 2, method='bilinear')[:]
+
+        # centers of the resampled cells in dem cell indices
+        center_rows = np.arange(result.shape[0]) * 2 + 0.5
+        center_cols = np.arange(result.shape[1]) * 2 + 0.5
+        expected = 2.0 * center_rows[:, None] + \
+            3.0 * center_cols[None, :] + 1000.0
+
+        # the partial last row and column are clamped to the edge
+        np.testing.assert_allclose(result[:-1, :-1], expected[:-1, :-1])
+
+    def test_blocks(self):
+        """Reading in small blocks gives the same grid
+        """
+
+        for method in ResampledGrid.METHODS:
+            full = ResampledGrid(self.dem, 3, method=method)[:]
+            blocks = ResampledGrid(self.dem, 3, method=method,
+                                   block_cells=1)
+
+            self.assertEqual(blocks.block_rows, 1)
+            np.testing.assert_array_equal(
+                np.ma.concatenate([blocks[0:2], blocks[2:]]), full)
+
+    def test_unknown_method(self):
+        """Only mean and bilinear are supported
+        """
+
+        with self.assertRaises(ValueError):
+            ResampledGrid(self.dem, 2, method='cubic')
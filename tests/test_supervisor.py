@@ -0,0 +1,203 @@
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from katana.supervisor import CommandTimeout, ProcessSupervisor, supervisor
+
+
+def run_in_child():
+    """Run a command with the shared supervisor in a pool worker
+    """
+
+    return supervisor.run([sys.executable, '-c', 'print("child")'])
+
+
+class TestProcessSupervisor(unittest.TestCase):
+    """Tests for `katana.supervisor`"""
+
+    def setUp(self):
+        self.supervisor = ProcessSupervisor()
+        self.logger = logging.getLogger(__name__)
+
+    def tearDown(self):
+        self.supervisor.cancel_all()
+
+    def python(self, code):
+        return [sys.executable, '-c', code]
+
+    def test_run(self):
+        """Run a command without a shell and collect the output
+        """
+
+        return_code, output = self.supervisor.run(
+            self.python('import sys; print("a b"); print("err", '
+                        'file=sys.stderr)'),
+            self.logger)
+
+        self.assertEqual(return_code, 0)
+        self.assertIn('a b', output)
+        self.assertIn('err', output)
+
+    def test_return_code(self):
+        """Failed and missing programs return a non zero code
+        """
+
+        return_code, _ = self.supervisor.run(
+            self.python('import sys; sys.exit(3)'))
+        self.assertEqual(return_code, 3)
+
+        return_code, output = self.supervisor.run(
+            ['katana_program_that_does_not_exist'])
+        self.assertEqual(return_code, 127)
+
+    def test_input_files(self):
+        """Stream files and byte ranges to the standard input
+        """
+
+        fd, fp = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'0123456789')
+
+        try:
+            return_code, output = self.supervisor.run(
+                self.python('import sys; print(sys.stdin.read())'),
+                self.logger,
+                input_files=[fp, (fp, [(2, 3), (8, 2)])])
+        finally:
+            os.remove(fp)
+
+        self.assertEqual(return_code, 0)
+        self.assertEqual(output, ['012345678923489'])
+
+    def test_limit(self):
+        """Processes of a program wait for the limit
+        """
+
+        program = sys.executable.split('/')[-1]
+        self.supervisor.set_limit(program, 2)
+
+        start = time.time()
+        futures = [self.supervisor.submit(
+            self.python('import time; time.sleep(0.5)'))
+            for _ in range(4)]
+        for future in futures:
+            self.assertEqual(future.result()[0], 0)
+
+        self.assertGreaterEqual(time.time() - start, 1.0)
+
+    def test_concurrent(self):
+        """Processes without a limit run at the same time
+        """
+
+        start = time.time()
+        futures = [self.supervisor.submit(
+            self.python('import time; time.sleep(0.5)'))
+            for _ in range(4)]
+        for future in futures:
+            self.assertEqual(future.result()[0], 0)
+
+        self.assertLess(time.time() - start, 1.5)
+
+    def test_cancel(self):
+        """Cancelling a command terminates the process
+        """
+
+        future = self.supervisor.submit(
+            self.python('import time; time.sleep(30)'))
+        time.sleep(0.5)
+
+        start = time.time()
+        self.supervisor.cancel_all()
+
+        self.assertLess(time.time() - start, 5)
+        with self.assertRaises(CancelledError):
+            future.result()
+
+    def test_fork(self):
+        """The shared supervisor works in the workers of a process pool
+        """
+
+        supervisor.run(self.python('pass'))
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return_code, output = executor.submit(run_in_child).result()
+
+        self.assertEqual(return_code, 0)
+        self.assertEqual(output, ['child'])
+
+    def test_fork_lock(self):
+        """A child forked while the lock is held does not deadlock
+        """
+
+        supervisor.run(self.python('pass'))
+
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as \
+                executor:
+            with supervisor.lock():
+                future = executor.submit(run_in_child)
+                time.sleep(0.5)
+
+            return_code, output = future.result(timeout=30)
+
+        self.assertEqual(output, ['child'])
+
+    @unittest.skipIf(sys.version_info >= (3, 8),
+                     'the default child watcher is threaded')
+    def test_child_watcher(self):
+        """The threaded child watcher reports the return code
+        """
+
+        from katana.supervisor import ThreadedChildWatcher
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(3)
+
+        result = []
+        done = threading.Event()
+
+        def callback(pid, return_code):
+            result.append(return_code)
+            done.set()
+
+        ThreadedChildWatcher().add_child_handler(pid, callback)
+        self.assertTrue(done.wait(10))
+        self.assertEqual(result, [3])
+
+    def test_timeout(self):
+        """Kill a command that runs longer than the timeout
+        """
+
+        start = time.time()
+        with self.assertRaises(CommandTimeout) as context:
+            self.supervisor.run(
+                self.python('import time; print("start", flush=True); '
+                            'time.sleep(30)'),
+                timeout=0.5)
+
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(context.exception.output, ['start'])
+
+    def test_idle_timeout(self):
+        """Kill a command that stops writing output
+        """
+
+        return_code, _ = self.supervisor.run(
+            self.python('import time\n'
+                        'for i in range(4):\n'
+                        '    print(i, flush=True)\n'
+                        '    time.sleep(0.2)'),
+            idle_timeout=1)
+        self.assertEqual(return_code, 0)
+
+        with self.assertRaises(CommandTimeout):
+            self.supervisor.run(
+                self.python('import time; time.sleep(30)'),
+                idle_timeout=0.5)
@@ -0,0 +1,236 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import netCDF4 as nc
+import numpy as np
+
+from katana.framework import Katana
+from katana.mosaic import blend, mosaic_outputs, read_ascii_grid
+from katana.tiles import make_tiles, split_axis
+from katana.topo import write_ascii_grid
+from tests.test_base import KatanaTestCase
+
+
+class TestSplit(unittest.TestCase):
+    """Tests for splitting the dem into tiles"""
+
+    def test_split_axis(self):
+        """Overlapping ranges that cover the axis
+        """
+
+        ranges = split_axis(100, 30, 8, align=4)
+
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 100)
+        for (start, stop), (next_start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(next_start % 4, 0)
+            self.assertGreaterEqual(stop - next_start, 8)
+
+        self.assertEqual(split_axis(20, 30, 8), [(0, 20)])
+
+        with self.assertRaises(ValueError):
+            split_axis(100, 8, 8)
+
+    def test_make_tiles(self):
+        """Tiles line up with the lower left corner of the dem
+        """
+
+        x = 320000. + 50 * np.arange(156)
+        y = 4166650. - 50 * np.arange(168)
+
+        tiles = make_tiles(x, y, 4000, 1000, '/tmp/topo', align=4)
+
+        self.assertEqual(len(tiles), 9)
+        self.assertEqual(tiles[0].windninja_topo, '/tmp/topo_tile0.asc')
+
+        covered = np.zeros((168, 156), dtype=int)
+        for tile in tiles:
+            r0, r1 = tile.rows
+            c0, c1 = tile.cols
+            covered[r0:r1, c0:c1] += 1
+
+            self.assertEqual(c0 % 4, 0)
+            self.assertEqual((168 - r1) % 4, 0)
+
+        self.assertTrue(np.all(covered >= 1))
+
+        # the first tile is the south west corner
+        self.assertEqual(tiles[0].rows[1], 168)
+        self.assertEqual(tiles[0].interior, {
+            'west': False, 'east': True, 'south': False, 'north': True})
+
+        self.assertEqual(make_tiles(x, y, 10000, 1000, '/tmp/topo'), [])
+
+
+class TestMosaic(unittest.TestCase):
+    """Tests for mosaicking the tile outputs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+        # a dem at 50 m and outputs at 200 m
+        self.x = 50 * np.arange(96) + 25.
+        self.y = 50 * np.arange(64)[::-1] + 25.
+        self.tiles = make_tiles(self.x, self.y, 3200, 800,
+                                os.path.join(self.tmp_dir, 'topo'),
+                                align=4)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_outputs(self, field, suffix):
+        """Write a 200 m output for each tile with a field of x and y
+        and two cells of padding to the north and east like WindNinja
+        """
+
+        tile_dirs = []
+        for tile in self.tiles:
+            tile_dir = os.path.join(self.tmp_dir, tile.name)
+            os.makedirs(tile_dir, exist_ok=True)
+            tile_dirs.append(tile_dir)
+
+            xll, _, yll, _ = tile.extent
+            ncols = len(tile.x) // 4 + 2
+            nrows = len(tile.y) // 4 + 2
+            x = xll + (np.arange(ncols) + 0.5) * 200
+            y = yll + (nrows - np.arange(nrows) - 0.5) * 200
+
+            header = 'ncols {}\nnrows {}\nxllcorner {}\nyllcorner {}\n' \
+                'cellsize 200\nNODATA_value -9999'.format(
+                    ncols, nrows, xll, yll)
+            write_ascii_grid(
+                os.path.join(tile_dir, '{}_03-05-2019_1300_200m{}'.format(
+                    tile.windnina_filenames, suffix)),
+                field(*np.meshgrid(x, y)), header, -9999)
+
+        return tile_dirs
+
+    def test_mosaic_outputs(self):
+        """Tiles that agree give the same field on the whole grid
+        """
+
+        tile_dirs = self.write_outputs(
+            lambda x, y: 2 + x / 1000 + y / 2000, '_vel.asc')
+
+        mosaics = mosaic_outputs(self.tiles, tile_dirs, self.tmp_dir,
+                                 'topo_windninja_topo', 800)
+
+        self.assertEqual([os.path.basename(m) for m in mosaics],
+                         ['topo_windninja_topo_03-05-2019_1300_200m_vel.asc'])
+
+        header, data = read_ascii_grid(mosaics[0])
+        self.assertEqual(header['xllcorner'], 0)
+        self.assertEqual(header['yllcorner'], 0)
+        self.assertEqual(header['ncols'], 96 // 4 + 2)
+        self.assertEqual(header['nrows'], 64 // 4 + 2)
+
+        x = (np.arange(data.shape[1]) + 0.5) * 200
+        y = (data.shape[0] - np.arange(data.shape[0]) - 0.5) * 200
+        xx, yy = np.meshgrid(x, y)
+        np.testing.assert_allclose(data, 2 + xx / 1000 + yy / 2000)
+
+    def test_mosaic_angles(self):
+        """Angles are blended as unit vectors across north
+        """
+
+        angles = [np.ma.masked_array(np.full((1, 3), 350.)),
+                  np.ma.masked_array(np.full((1, 3), 10.))]
+        weights = [np.array([[1, 0.5, 0]]), np.array([[0, 0.5, 1]])]
+
+        result = blend(angles, weights, angle=True)
+        np.testing.assert_allclose(result[0, [0, 2]], [350, 10])
+        self.assertAlmostEqual(min(result[0, 1], 360 - result[0, 1]), 0)
+
+        # speeds are a weighted mean
+        result = blend([np.ma.masked_array(np.full((1, 3), 2.)),
+                        np.ma.masked_array(np.full((1, 3), 4.))], weights)
+        np.testing.assert_allclose(result, [[2, 3, 4]])
+
+    def test_mosaic_missing_tile(self):
+        """Every tile needs each output
+        """
+
+        tile_dirs = self.write_outputs(lambda x, y: x * 0 + 1, '_vel.asc')
+        os.remove(os.path.join(
+            tile_dirs[1], '{}_03-05-2019_1300_200m_vel.asc'.format(
+                self.tiles[1].windnina_filenames)))
+
+        with self.assertRaises(IOError):
+            mosaic_outputs(self.tiles, tile_dirs, self.tmp_dir,
+                           'topo_windninja_topo', 800)
+
+
+class TestTiledRun(KatanaTestCase):
+    """Tests for running WindNinja on tiles of the dem"""
+
+    def setUp(self):
+        self.config = self.change_config_option('topo', 'tile_size', 4000)
+
+    def test_tile_elevation_files(self):
+        """Each tile has the dem in its window
+        """
+
+        k = Katana(self.config)
+        tiles = k.topo.tiles
+
+        self.assertEqual(len(tiles), 12)
+
+        with nc.Dataset(k.topo.topo_filename) as ds:
+            dem = ds.variables['dem'][:]
+
+        for tile in tiles:
+            data = np.loadtxt(tile.elevation_file, skiprows=6)
+            self.assertTrue(np.array_equal(
+                data, dem[slice(*tile.rows), slice(*tile.cols)]))
+            self.assertTrue(os.path.isfile(tile.windninja_topo_prj))
+
+    def test_tile_tasks(self):
+        """A task for each tile and the day is mosaicked once all the
+        tiles finish
+        """
+
+        k = Katana(self.config)
+        input_data = k.input_data
+        day = date(2019, 3, 5)
+
+        tasks = input_data.day_tasks(
+            day, input_data.wind_ninja_cfg_file(day))
+        self.assertEqual(len(tasks), len(k.topo.tiles))
+
+        label, (wn_cfg, wn_cfg_file) = tasks[0]
+        self.assertEqual(label, (day, 'tile0'))
+        self.assertEqual(wn_cfg['elevation_file'],
+                         k.topo.tiles[0].elevation_file)
+        self.assertTrue(wn_cfg['output_path'].startswith(
+            input_data.tile_dir(k.topo.tiles[0])))
+        self.assertTrue(wn_cfg_file.endswith('wn_cfg_20190305_tile0.txt'))
+
+        with patch.object(input_data, 'mosaic_day') as mosaic, \
+                patch.object(input_data, 'record_day') as record:
+            for label, _ in tasks:
+                input_data.task_complete(label, 1)
+
+        mosaic.assert_called_once_with(day)
+        record.assert_called_once_with(day, len(tasks))
+
+    def test_crop_tiles(self):
+        """The tile crops are made from the crop of the whole domain
+        """
+
+        k = Katana(self.config)
+
+        with patch('katana.data.nomads_hrrr.sub_crop_grib') as crop:
+            k.input_data.crop_tiles(k.input_data.date_list)
+
+        self.assertEqual(crop.call_count, len(k.topo.tiles))
+        self.assertEqual(crop.call_args[0][1], k.input_data.out_dir)
+
+        # the tile is inside the bounds of the whole domain
+        lonw, lone, lats, latn = crop.call_args[0][3]
+        bounds = k.input_data.latlon_bounds()
+        self.assertTrue(bounds[0] <= lonw < lone <= bounds[1])
+        self.assertTrue(bounds[2] <= lats < latn <= bounds[3])
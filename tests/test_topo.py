@@ -1,7 +1,15 @@
+import os
+import shutil
+import tempfile
+import unittest
+from copy import deepcopy
+from unittest.mock import patch
+
 import netCDF4 as nc
 import numpy as np
 
-from katana.topo import Topo
+from katana import topo_geotiff
+from katana.topo import Topo, write_ascii_grid
 from tests.test_base import KatanaTestCase
 
 
@@ -12,6 +20,7 @@ class TestTopo(KatanaTestCase):
         """
 
         t = Topo(self.base_config.cfg)
+        self.assertEqual(t.elevation_file, t.windninja_topo)
 
         nt = nc.Dataset(t.topo_filename)
         na = np.loadtxt(t.windninja_topo, skiprows=6)
@@ -19,3 +28,162 @@ class TestTopo(KatanaTestCase):
         self.assertTrue(np.array_equal(nt.variables['dem'][:], na))
 
         nt.close()
+
+    def test_topo_reuse(self):
+        """The WindNinja topo is only written when the dem changes
+        """
+
+        tmp_dir = tempfile.mkdtemp()
+        config = deepcopy(self.base_config.cfg)
+        config['topo']['filename'] = os.path.join(tmp_dir, 'topo.nc')
+        shutil.copyfile(os.path.join(self.test_dir, 'topo', 'topo.nc'),
+                        config['topo']['filename'])
+
+        try:
+            t = Topo(config)
+            self.assertTrue(os.path.isfile(t.windninja_topo_sidecar))
+            self.assertTrue(os.path.basename(
+                t.windninja_topo_sidecar).startswith('topo_windninja_topo'))
+
+            with patch('katana.topo.write_ascii_grid') as write:
+                Topo(config)
+                write.assert_not_called()
+
+                # a changed ascii dem is written again
+                with open(t.windninja_topo, 'a') as f:
+                    f.write(' ')
+                Topo(config)
+                self.assertEqual(write.call_count, 1)
+
+            # a new dem with the same name
+            Topo(config)
+            os.utime(config['topo']['filename'], ns=(0, 0))
+            with patch('katana.topo.write_ascii_grid') as write:
+                Topo(config)
+                self.assertEqual(write.call_count, 1)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_resample(self):
+        """The ascii dem is resampled to the mesh resolution
+        """
+
+        config = deepcopy(self.base_config.cfg)
+        config['topo']['resample_method'] = 'mean'
+
+        t = Topo(config)
+
+        with open(t.windninja_topo, 'r') as f:
+            header = dict([f.readline().split() for _ in range(6)])
+
+        # 50 m dem and a 200 m mesh
+        self.assertEqual(float(header['cellsize']), 200)
+        self.assertEqual(int(header['ncols']), 39)
+        self.assertEqual(int(header['nrows']), 42)
+        self.assertEqual(float(header['xllcorner']),
+                         np.min(t.topo_stats['x']) - 25)
+        self.assertAlmostEqual(
+            float(header['yllcorner']) + 42 * 200,
+            np.max(t.topo_stats['y']) + 25)
+
+        na = np.loadtxt(t.windninja_topo, skiprows=6)
+        with nc.Dataset(t.topo_filename) as nt:
+            dem = nt.variables['dem'][:]
+        self.assertAlmostEqual(na[0, 0], np.mean(dem[0:4, 0:4], dtype=float))
+
+        # the grid of the domain is not resampled
+        self.assertEqual(len(t.x1), 156)
+
+    def geotiff_config(self):
+        config = deepcopy(self.base_config.cfg)
+        config['topo']['elevation_format'] = 'geotiff'
+        return config
+
+    @unittest.skipIf(topo_geotiff.gdal_available(), 'GDAL is installed')
+    def test_geotiff_missing(self):
+        """A GeoTIFF elevation file needs GDAL
+        """
+
+        with self.assertRaises(ImportError):
+            Topo(self.geotiff_config())
+
+    @unittest.skipUnless(topo_geotiff.gdal_available(),
+                         'GDAL is not installed')
+    def test_geotiff(self):
+        """The GeoTIFF has the dem and the projection
+        """
+
+        t = Topo(self.geotiff_config())
+        self.assertEqual(t.elevation_file, t.windninja_topo_tif)
+
+        ds = topo_geotiff.gdal.Open(t.elevation_file)
+        band = ds.GetRasterBand(1)
+
+        with nc.Dataset(t.topo_filename) as nt:
+            self.assertTrue(np.array_equal(
+                nt.variables['dem'][:], band.ReadAsArray()))
+            self.assertEqual(
+                ds.GetGeoTransform()[0],
+                np.min(nt.variables['x'][:]) - t.topo_stats['dv'] / 2)
+
+        self.assertEqual(band.GetNoDataValue(), Topo.FILLVAL)
+        self.assertNotEqual(ds.GetProjection(), '')
+        ds = None
+
+    def test_no_projection(self):
+        """A topo file without projection info uses the UTM zone
+        """
+
+        t = Topo(self.base_config.cfg)
+
+        with nc.Dataset('no_projection.nc', 'w', diskless=True) as ds:
+            ds.createDimension('y', 2)
+            ds.createDimension('x', 2)
+            ds.createVariable('dem', 'f8', ('y', 'x'))
+
+            wkt = t.projection(ds)
+            self.assertIn('UTM zone {}{}'.format(
+                t.zone_number, 'S' if t.zone_letter < 'N' else 'N'), wkt)
+
+            # the GeoTIFF gets the projection of the zone
+            with patch('katana.topo.topo_geotiff.write_geotiff') as write:
+                t.netcdf_dem_to_geotiff(ds)
+            self.assertEqual(write.call_args[0][3], wkt)
+
+        with self.assertRaises(ValueError):
+            topo_geotiff.write_geotiff('dem.tif', None, None, None, -9999)
+
+    def test_write_ascii_grid(self):
+        """Stream a grid in blocks with the masked cells as no data
+        """
+
+        tmp_dir = tempfile.mkdtemp()
+        fp = os.path.join(tmp_dir, 'grid.asc')
+
+        data = np.random.default_rng(0).random((7, 5)) * 3000
+        data[2, 3] = -9999
+
+        try:
+            with nc.Dataset(os.path.join(tmp_dir, 'grid.nc'), 'w',
+                            diskless=True) as ds:
+                ds.createDimension('y', 7)
+                ds.createDimension('x', 5)
+                dem = ds.createVariable('dem', 'f8', ('y', 'x'),
+                                        fill_value=-9999)
+                dem[:] = data
+
+                write_ascii_grid(fp, dem, 'header', -9999, block_cells=10)
+
+            with open(fp, 'r') as f:
+                lines = f.read().splitlines()
+
+            self.assertEqual(lines[0], 'header')
+            self.assertEqual(len(lines), 8)
+            self.assertEqual(lines[3].split()[3], '-9999')
+            self.assertTrue(np.array_equal(
+                np.loadtxt(fp, skiprows=1), data))
+            self.assertFalse(os.path.exists(fp + '.tmp'))
+
+        finally:
+            shutil.rmtree(tmp_dir)
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from katana.supervisor import CommandTimeout
+from katana.wind_ninja import WindNinja
+
+
+class TestWindNinja(unittest.TestCase):
+    """Tests for the WindNinja timeouts and retries"""
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.wn_cfg_file = os.path.join(self.out_dir, 'wn_cfg.txt')
+        self.output_path = os.path.join(self.out_dir, 'output')
+        os.makedirs(self.output_path)
+
+        # output from a previous run that has to be kept
+        self.existing = os.path.join(self.output_path, 'existing_vel.asc')
+        open(self.existing, 'w').close()
+
+        self.config = {
+            'num_threads': 4,
+            'output_path': self.output_path
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def partial_run(self, *args, **kwargs):
+        """Leave partial output behind and fail
+        """
+
+        partial_dir = os.path.join(self.output_path, 'partial')
+        os.makedirs(partial_dir)
+        open(os.path.join(partial_dir, 'partial_vel.asc'), 'w').close()
+
+        return 1, ['solver failed']
+
+    def test_retry(self):
+        """Retry with fewer threads after removing the partial output
+        """
+
+        runs = [self.partial_run, lambda *a, **k: (0, [])]
+
+        wn = WindNinja(self.config, self.wn_cfg_file,
+                       attempts=2, retry_delay=0)
+
+        with patch('katana.wind_ninja.supervisor.run',
+                   side_effect=lambda *a, **k: runs.pop(0)(*a, **k)):
+            self.assertTrue(wn.run_wind_ninja())
+
+        self.assertFalse(os.path.exists(
+            os.path.join(self.output_path, 'partial')))
+        self.assertTrue(os.path.isfile(self.existing))
+
+        self.assertEqual(wn.config['num_threads'], 2)
+        with open(self.wn_cfg_file, 'r') as f:
+            self.assertIn('num_threads = 2', f.read())
+
+    def test_overwritten_output(self):
+        """Output from before the run that a failed run wrote to is
+        removed
+        """
+
+        kept = os.path.join(self.output_path, 'kept_vel.asc')
+        with open(kept, 'w') as f:
+            f.write('1.0')
+
+        def overwrite(*args, **kwargs):
+            with open(self.existing, 'w') as f:
+                f.write('partial')
+            return 1, ['solver failed']
+
+        wn = WindNinja(self.config, self.wn_cfg_file, attempts=1)
+
+        with patch('katana.wind_ninja.supervisor.run',
+                   side_effect=overwrite):
+            with self.assertRaises(Exception):
+                wn.run_wind_ninja()
+
+        self.assertFalse(os.path.exists(self.existing))
+        self.assertTrue(os.path.isfile(kept))
+
+    def test_timeout(self):
+        """A hung run is killed and counts as a failed attempt
+        """
+
+        wn = WindNinja(self.config, self.wn_cfg_file,
+                       timeout=10, idle_timeout=5,
+                       attempts=3, retry_delay=0,
+                       retry_reduce_threads=False)
+
+        with patch('katana.wind_ninja.supervisor.run',
+                   side_effect=CommandTimeout('no output', [])) as run:
+            with self.assertRaises(Exception) as context:
+                wn.run_wind_ninja()
+
+        self.assertEqual(run.call_count, 3)
+        self.assertEqual(run.call_args[1]['timeout'], 10)
+        self.assertEqual(run.call_args[1]['idle_timeout'], 5)
+        self.assertEqual(wn.config['num_threads'], 4)
+        self.assertTrue('WindNinja has an error' in str(context.exception))
@@ -0,0 +1,297 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from copy import deepcopy
+from unittest.mock import patch
+
+from katana.framework import Katana
+from katana.work_queue import WorkQueue
+from tests.test_base import KatanaTestCase
+
+
+def drain_queue(directory, tasks, out_dir):
+    """Claim and run tasks until all are finished, each run appends
+    the worker id to the task's output file
+    """
+
+    work_queue = WorkQueue(directory, heartbeat_timeout=60)
+    with work_queue:
+        for task in tasks:
+            if not work_queue.claim(task):
+                continue
+
+            with open(os.path.join(out_dir, task), 'a') as f:
+                f.write('{}\n'.format(work_queue.worker_id))
+            time.sleep(0.01)
+
+            work_queue.complete(task)
+
+
+def reset_once(directory, out_file):
+    """Run a reset once between the workers, each reset appends the
+    worker id to the output file
+    """
+
+    work_queue = WorkQueue(directory, heartbeat_timeout=60)
+
+    def reset():
+        with open(out_file, 'a') as f:
+            f.write('{}\n'.format(work_queue.worker_id))
+        time.sleep(0.2)
+
+    with work_queue:
+        work_queue.run_once('reset-run1', reset, poll_interval=0.05)
+
+
+class TestWorkQueue(unittest.TestCase):
+    """Tests for `katana.work_queue`"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.queue_dir = os.path.join(self.tmp_dir, 'queue')
+        self.task = '20190305'
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_claim(self):
+        """Only one worker can claim a task
+        """
+
+        q1 = WorkQueue(self.queue_dir, heartbeat_timeout=60)
+        q2 = WorkQueue(self.queue_dir, heartbeat_timeout=60)
+
+        self.assertTrue(q1.claim(self.task))
+        self.assertFalse(q2.claim(self.task))
+
+        q1.complete(self.task)
+        self.assertTrue(q2.is_finished(self.task))
+        self.assertFalse(q2.claim(self.task))
+        self.assertFalse(os.path.isfile(q1.task_file(self.task, 'lock')))
+
+    def test_take_over(self):
+        """Take over a task without a heartbeat
+        """
+
+        q1 = WorkQueue(self.queue_dir, heartbeat_timeout=0.2)
+        q2 = WorkQueue(self.queue_dir, heartbeat_timeout=0.2)
+
+        self.assertTrue(q1.claim(self.task))
+
+        # an old modification time from a clock that is behind is not
+        # stale until the lock stops changing for the timeout
+        old = time.time() - 120
+        os.utime(q1.task_file(self.task, 'lock'), (old, old))
+        self.assertFalse(q2.claim(self.task))
+
+        time.sleep(0.3)
+        self.assertTrue(q2.claim(self.task))
+        self.assertFalse(q1.claim(self.task))
+
+        # the old owner can't release the new owner's lock
+        q1.release(self.task)
+        self.assertTrue(os.path.isfile(q2.task_file(self.task, 'lock')))
+
+    def test_heartbeat(self):
+        """The heartbeat keeps a claimed task from being taken over
+        """
+
+        q1 = WorkQueue(self.queue_dir, heartbeat_timeout=0.4)
+        q2 = WorkQueue(self.queue_dir, heartbeat_timeout=0.4)
+
+        with q1:
+            self.assertTrue(q1.claim(self.task))
+            self.assertFalse(q2.claim(self.task))
+
+            time.sleep(0.6)
+            self.assertFalse(q2.claim(self.task))
+
+    def test_lost(self):
+        """The heartbeat finds a task that was taken over
+        """
+
+        lost = []
+        q1 = WorkQueue(self.queue_dir, heartbeat_timeout=60,
+                       on_lost=lost.append)
+        q2 = WorkQueue(self.queue_dir, heartbeat_timeout=60)
+
+        self.assertTrue(q1.claim(self.task))
+        q1.heartbeat()
+        self.assertTrue(q1.owns(self.task))
+        self.assertEqual(lost, [])
+
+        # another worker took over the lock
+        os.remove(q1.task_file(self.task, 'lock'))
+        self.assertTrue(q2.claim(self.task))
+
+        q1.heartbeat()
+        self.assertFalse(q1.owns(self.task))
+        self.assertEqual(lost, [self.task])
+        self.assertIn(self.task, q1.lost)
+        self.assertTrue(q2.owns(self.task))
+
+    def test_fail(self):
+        """Failed tasks are not claimed again until reset
+        """
+
+        q1 = WorkQueue(self.queue_dir, heartbeat_timeout=60)
+
+        self.assertTrue(q1.claim(self.task))
+        q1.fail(self.task, 'WindNinja has an error')
+
+        self.assertTrue(q1.is_finished(self.task))
+        self.assertEqual(q1.failure(self.task), 'WindNinja has an error')
+        self.assertFalse(q1.claim(self.task))
+
+        q1.reset(self.task)
+        self.assertIsNone(q1.failure(self.task))
+        self.assertTrue(q1.claim(self.task))
+
+    def test_fail_new_run(self):
+        """A task that failed is claimed again in a new run
+        """
+
+        q1 = WorkQueue(self.queue_dir, heartbeat_timeout=60, run_id='run1')
+        q2 = WorkQueue(self.queue_dir, heartbeat_timeout=60, run_id='run1')
+
+        self.assertTrue(q1.claim(self.task))
+        q1.fail(self.task, 'WindNinja has an error')
+        self.assertFalse(q2.claim(self.task))
+
+        q3 = WorkQueue(self.queue_dir, heartbeat_timeout=60, run_id='run2')
+        self.assertFalse(q3.is_finished(self.task))
+        self.assertIsNone(q3.failure(self.task))
+        self.assertTrue(q3.claim(self.task))
+        self.assertFalse(os.path.isfile(q3.task_file(self.task, 'failed')))
+
+        q3.complete(self.task)
+        self.assertTrue(q2.is_finished(self.task))
+        self.assertIsNone(q2.failure(self.task))
+
+    def test_processes(self):
+        """Several processes run each task exactly once
+        """
+
+        tasks = ['201903{:02d}'.format(d) for d in range(1, 21)]
+
+        workers = [multiprocessing.Process(
+            target=drain_queue, args=(self.queue_dir, tasks, self.tmp_dir))
+            for _ in range(4)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        q = WorkQueue(self.queue_dir)
+        for task in tasks:
+            self.assertTrue(q.is_finished(task))
+
+            with open(os.path.join(self.tmp_dir, task), 'r') as f:
+                self.assertEqual(len(f.readlines()), 1)
+
+    def test_run_once(self):
+        """Only the first worker runs the function and the others wait
+        """
+
+        out_file = os.path.join(self.tmp_dir, 'resets')
+        workers = [multiprocessing.Process(
+            target=reset_once, args=(self.queue_dir, out_file))
+            for _ in range(4)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        with open(out_file, 'r') as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        # a worker that starts later does not run it again
+        reset_once(self.queue_dir, out_file)
+        with open(out_file, 'r') as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_run_once_failed(self):
+        """A failure is raised in every worker
+        """
+
+        q1 = WorkQueue(self.queue_dir, heartbeat_timeout=60)
+        q2 = WorkQueue(self.queue_dir, heartbeat_timeout=60)
+
+        def fail():
+            raise ValueError('no reset')
+
+        with self.assertRaises(ValueError):
+            q1.run_once('reset-run1', fail)
+
+        with self.assertRaises(Exception):
+            q2.run_once('reset-run1', lambda: None)
+
+
+class TestRunWorker(KatanaTestCase):
+    """Tests for clearing the finished days in worker mode"""
+
+    def setUp(self):
+        self.config = self.change_config_option('output', 'resume', False)
+
+    def run_worker(self, run_id):
+        """Run a worker without cropping or running WindNinja
+
+        Returns:
+            list -- days the worker ran
+        """
+
+        k = Katana(deepcopy(self.config))
+        with patch.object(k.input_data, 'crop_day'), \
+                patch.object(k.input_data, 'run_day') as run_day:
+            k.run_worker(run_id)
+
+        return [call[0][0] for call in run_day.call_args_list]
+
+    def test_run_id_needed(self):
+        """Clearing the days needs a run id
+        """
+
+        with self.assertRaises(Exception):
+            Katana(self.config).run_worker()
+
+    def test_resume_off(self):
+        """The days of an earlier run are cleared once per run
+        """
+
+        days = self.run_worker('run1')
+        self.assertEqual(len(days), 1)
+
+        # a worker of the same run starting late finds the day finished
+        self.assertEqual(self.run_worker('run1'), [])
+
+        # a new run without resume runs the day again
+        self.assertEqual(self.run_worker('run2'), days)
+
+    def test_failed_day(self):
+        """A day that failed is ran again by a new resumed run
+        """
+
+        config = self.change_config_option('output', 'resume', True)
+
+        k = Katana(deepcopy(config))
+        with patch.object(k.input_data, 'crop_day'), \
+                patch.object(k.input_data, 'run_day',
+                             side_effect=ValueError('WindNinja failed')):
+            with self.assertRaises(Exception):
+                k.run_worker('run1')
+
+        # a worker of the same run does not run the day again
+        k = Katana(deepcopy(config))
+        with patch.object(k.input_data, 'crop_day'), \
+                patch.object(k.input_data, 'run_day') as run_day:
+            with self.assertRaises(Exception):
+                k.run_worker('run1')
+        run_day.assert_not_called()
+
+        self.config = config
+        self.assertEqual(len(self.run_worker('run2')), 1)